@@ -0,0 +1,40 @@
+"""create result_detail
+
+Revision ID: 1345462785fa
+Revises: f452a3df9fde
+Create Date: 2026-10-18 13:05:27.118093
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+import sqlmodel
+
+
+# revision identifiers, used by Alembic.
+revision: str = '1345462785fa'
+down_revision: Union[str, None] = 'f452a3df9fde'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_table('result_detail',
+    sa.Column('result_id', sa.Uuid(), nullable=False),
+    sa.Column('test_id', sa.Uuid(), nullable=False),
+    sa.Column('layout', sa.Integer(), nullable=False),
+    sa.Column('choices', sa.LargeBinary(), nullable=False),
+    sa.Column('correct', sa.LargeBinary(), nullable=False),
+    sa.ForeignKeyConstraint(['result_id'], ['result.id'], ),
+    sa.ForeignKeyConstraint(['test_id'], ['test.id'], ),
+    sa.PrimaryKeyConstraint('result_id')
+    )
+    op.create_index(op.f('ix_result_detail_test_id'), 'result_detail', ['test_id'], unique=False)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index(op.f('ix_result_detail_test_id'), table_name='result_detail')
+    op.drop_table('result_detail')
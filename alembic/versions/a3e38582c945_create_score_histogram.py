@@ -0,0 +1,40 @@
+"""create score_histogram
+
+Revision ID: a3e38582c945
+Revises: 1345462785fa
+Create Date: 2026-10-18 14:21:09.550731
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+import sqlmodel
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'a3e38582c945'
+down_revision: Union[str, None] = '1345462785fa'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_table('score_histogram',
+    sa.Column('test_id', sa.Uuid(), nullable=False),
+    sa.Column('score', sa.Integer(), nullable=False),
+    sa.Column('count', sa.Integer(), nullable=False),
+    sa.ForeignKeyConstraint(['test_id'], ['test.id'], ),
+    sa.PrimaryKeyConstraint('test_id', 'score')
+    )
+    # Заполняем сводку по уже сданным тестам
+    op.execute(
+        'INSERT INTO score_histogram (test_id, score, count) '
+        'SELECT test_id, score, count(*) FROM result GROUP BY test_id, score'
+    )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_table('score_histogram')
@@ -0,0 +1,31 @@
+"""add result.created_at
+
+Revision ID: b48dbc10be9c
+Revises: a3e38582c945
+Create Date: 2026-10-18 15:02:44.871260
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+import sqlmodel
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'b48dbc10be9c'
+down_revision: Union[str, None] = 'a3e38582c945'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    # Для уже существующих результатов время сдачи неизвестно — ставим время миграции
+    op.add_column('result', sa.Column('created_at', sa.DateTime(), server_default=sa.func.now(), nullable=False))
+    op.alter_column('result', 'created_at', server_default=None)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_column('result', 'created_at')
@@ -0,0 +1,47 @@
+"""add foreign key lookup indexes
+
+Revision ID: c7d15e2a9b31
+Revises: b48dbc10be9c
+Create Date: 2026-10-18 16:20:11.504318
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+import sqlmodel
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'c7d15e2a9b31'
+down_revision: Union[str, None] = 'b48dbc10be9c'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+INDEXES = [
+    ('ix_test_author_id_id', 'test', ['author_id', 'id'], {}),
+    ('ix_question_test_id_id', 'question', ['test_id', 'id'], {}),
+    ('ix_answer_question_id_id', 'answer', ['question_id', 'id'], {'postgresql_include': ['is_correct']}),
+    ('ix_result_student_id_created_at_id', 'result', ['student_id', 'created_at', 'id'], {}),
+    ('ix_result_test_id_created_at_id', 'result', ['test_id', 'created_at', 'id'], {}),
+    ('ix_result_created_at_id', 'result', ['created_at', 'id'], {}),
+]
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    # CONCURRENTLY не блокирует запись в таблицы, но не работает внутри транзакции
+    with op.get_context().autocommit_block():
+        for name, table, columns, kwargs in INDEXES:
+            op.create_index(
+                name, table, columns, unique=False,
+                postgresql_concurrently=True, if_not_exists=True, **kwargs,
+            )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    with op.get_context().autocommit_block():
+        for name, table, _, _ in reversed(INDEXES):
+            op.drop_index(name, table_name=table, postgresql_concurrently=True, if_exists=True)
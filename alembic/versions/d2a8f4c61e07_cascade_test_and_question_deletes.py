@@ -0,0 +1,45 @@
+"""cascade test and question deletes
+
+Revision ID: d2a8f4c61e07
+Revises: c7d15e2a9b31
+Create Date: 2026-10-18 17:05:37.219844
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+import sqlmodel
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'd2a8f4c61e07'
+down_revision: Union[str, None] = 'c7d15e2a9b31'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+# Результаты (result.test_id) намеренно не каскадируются: тест со сдачами не удаляется
+FOREIGN_KEYS = [
+    ('question_test_id_fkey', 'question', 'test', ['test_id']),
+    ('answer_question_id_fkey', 'answer', 'question', ['question_id']),
+    ('result_detail_result_id_fkey', 'result_detail', 'result', ['result_id']),
+    ('result_detail_test_id_fkey', 'result_detail', 'test', ['test_id']),
+    ('score_histogram_test_id_fkey', 'score_histogram', 'test', ['test_id']),
+]
+
+
+def _recreate(ondelete: Union[str, None]) -> None:
+    for name, source, referent, columns in FOREIGN_KEYS:
+        op.drop_constraint(name, source, type_='foreignkey')
+        op.create_foreign_key(name, source, referent, columns, ['id'], ondelete=ondelete)
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    _recreate('CASCADE')
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    _recreate(None)
@@ -0,0 +1,35 @@
+"""add test variant settings
+
+Revision ID: e9b3c7a10f42
+Revises: d2a8f4c61e07
+Create Date: 2026-10-18 18:12:09.664127
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+import sqlmodel
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'e9b3c7a10f42'
+down_revision: Union[str, None] = 'd2a8f4c61e07'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.add_column('test', sa.Column('shuffle_questions', sa.Boolean(), server_default=sa.false(), nullable=False))
+    op.add_column('test', sa.Column('shuffle_answers', sa.Boolean(), server_default=sa.false(), nullable=False))
+    op.add_column('test', sa.Column('draw_count', sa.Integer(), nullable=True))
+    op.alter_column('test', 'shuffle_questions', server_default=None)
+    op.alter_column('test', 'shuffle_answers', server_default=None)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_column('test', 'draw_count')
+    op.drop_column('test', 'shuffle_answers')
+    op.drop_column('test', 'shuffle_questions')
@@ -0,0 +1,29 @@
+"""add token user_id/expires_at index
+
+Revision ID: f452a3df9fde
+Revises: 8fa42250a6a9
+Create Date: 2026-10-18 10:12:41.302517
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+import sqlmodel
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'f452a3df9fde'
+down_revision: Union[str, None] = '8fa42250a6a9'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_index('ix_token_user_id_expires_at', 'token', ['user_id', 'expires_at'], unique=False)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index('ix_token_user_id_expires_at', table_name='token')
@@ -0,0 +1,65 @@
+"""add attempts and autosaved answers
+
+Revision ID: f4c1a8d93e27
+Revises: e9b3c7a10f42
+Create Date: 2026-10-18 19:02:41.318205
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+import sqlmodel
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'f4c1a8d93e27'
+down_revision: Union[str, None] = 'e9b3c7a10f42'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+IN_PROGRESS = sa.text("status = 'in_progress'")
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.add_column('test', sa.Column('time_limit_minutes', sa.Integer(), nullable=True))
+    op.create_table('attempt',
+    sa.Column('id', sa.Uuid(), nullable=False),
+    sa.Column('student_id', sa.Uuid(), nullable=False),
+    sa.Column('test_id', sa.Uuid(), nullable=False),
+    sa.Column('status', sa.Enum('in_progress', 'submitted', 'expired', name='attemptstatus'), nullable=False),
+    sa.Column('started_at', sa.DateTime(timezone=True), nullable=False),
+    sa.Column('deadline', sa.DateTime(timezone=True), nullable=True),
+    sa.Column('finished_at', sa.DateTime(timezone=True), nullable=True),
+    sa.Column('result_id', sa.Uuid(), nullable=True),
+    sa.ForeignKeyConstraint(['student_id'], ['user.id'], ),
+    sa.ForeignKeyConstraint(['test_id'], ['test.id'], ondelete='CASCADE'),
+    sa.ForeignKeyConstraint(['result_id'], ['result.id'], ondelete='SET NULL'),
+    sa.PrimaryKeyConstraint('id')
+    )
+    op.create_index(
+        'ux_attempt_student_id_test_id_in_progress', 'attempt', ['student_id', 'test_id'],
+        unique=True, postgresql_where=IN_PROGRESS,
+    )
+    op.create_index('ix_attempt_deadline_in_progress', 'attempt', ['deadline'], postgresql_where=IN_PROGRESS)
+    op.create_table('attempt_answer',
+    sa.Column('attempt_id', sa.Uuid(), nullable=False),
+    sa.Column('question_id', sa.Uuid(), nullable=False),
+    sa.Column('answer_id', sa.Uuid(), nullable=False),
+    sa.Column('updated_at', sa.DateTime(timezone=True), nullable=False),
+    sa.ForeignKeyConstraint(['attempt_id'], ['attempt.id'], ondelete='CASCADE'),
+    sa.ForeignKeyConstraint(['question_id'], ['question.id'], ondelete='CASCADE'),
+    sa.ForeignKeyConstraint(['answer_id'], ['answer.id'], ondelete='CASCADE'),
+    sa.PrimaryKeyConstraint('attempt_id', 'question_id')
+    )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_table('attempt_answer')
+    op.drop_index('ix_attempt_deadline_in_progress', table_name='attempt')
+    op.drop_index('ux_attempt_student_id_test_id_in_progress', table_name='attempt')
+    op.drop_table('attempt')
+    sa.Enum(name='attemptstatus').drop(op.get_bind(), checkfirst=True)
+    op.drop_column('test', 'time_limit_minutes')
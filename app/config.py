@@ -2,6 +2,7 @@ from pydantic import PostgresDsn
 from pydantic_settings import BaseSettings, SettingsConfigDict
 from pathlib import Path
 from datetime import timedelta
+from typing import Literal, Optional
 
 
 BASE_DIR = Path(__file__).resolve().parent.parent
@@ -10,6 +11,17 @@ BASE_DIR = Path(__file__).resolve().parent.parent
 class RunConfig(BaseSettings):
     host: str = "0.0.0.0"
     port: int = 8000
+    # Каждый воркер — отдельный процесс со своим пулом соединений и кэшами.
+    # При workers > 1 автосохранение пишет ответы в БД сразу (attempts.autosave_buffered)
+    workers: int = 1
+    # Для разработки: перезапуск при изменении кода и подробные ошибки
+    reload: bool = False
+    debug: bool = False
+    # Сколько при остановке ждать завершения начатых запросов
+    graceful_timeout: timedelta = timedelta(seconds=30)
+    # Открыть pool_size соединений при старте воркера
+    warm_up: bool = True
+    health_timeout: timedelta = timedelta(seconds=2)
 
 
 class DatabaseSettings(BaseSettings):
@@ -18,12 +30,79 @@ class DatabaseSettings(BaseSettings):
     echo_pool: bool = False
     pool_size: int = 50
     max_overflow: int = 10
+    pool_timeout: timedelta = timedelta(seconds=30)
+    # Серверные prepared statements psycopg: запрос готовится после
+    # prepare_threshold выполнений. Отключать за pgbouncer в режиме transaction
+    prepared_statements: bool = True
+    prepare_threshold: int = 5
+    # Реплики только для чтения; пусто — всё читается с мастера
+    replica_urls: list[PostgresDsn] = []
+    replica_max_lag: timedelta = timedelta(seconds=5)
+    replica_check_interval: timedelta = timedelta(seconds=5)
 
 
 class AccessToken(BaseSettings):
     expires_delta: timedelta = timedelta(hours=2)
 
 
+class TokenCacheSettings(BaseSettings):
+    enabled: bool = True
+    max_size: int = 10_000
+    ttl: timedelta = timedelta(minutes=5)
+
+
+class TestCacheSettings(BaseSettings):
+    enabled: bool = True
+    max_size: int = 1_000
+    ttl: timedelta = timedelta(minutes=1)
+    # Без общего хранилища снимков изменение теста сбрасывает кэш только
+    # принявшего его воркера: при workers > 1 снимки живут не дольше этого
+    unshared_ttl: timedelta = timedelta(seconds=5)
+
+
+class PasswordHashingSettings(BaseSettings):
+    executor: Literal["thread", "process"] = "thread"
+    workers: int = 4
+    max_waiting: int = 256
+
+
+class SubmissionSettings(BaseSettings):
+    batching: bool = False
+    batch_size: int = 100
+    flush_interval: timedelta = timedelta(milliseconds=50)
+    max_pending: int = 5_000
+    enqueue_timeout: timedelta = timedelta(seconds=5)
+
+
+class AttemptSettings(BaseSettings):
+    # Автосохранённые ответы копятся в памяти и пишутся в БД раз в интервал.
+    # Буфер — только для одного воркера: ответ, принятый другим процессом,
+    # при сдаче не виден. None — буферизовать, если run.workers == 1
+    autosave_buffered: Optional[bool] = None
+    autosave_flush_interval: timedelta = timedelta(seconds=2)
+    autosave_max_pending: int = 100_000
+    # Сколько после дедлайна ещё принимаются ответы: задержки сети
+    deadline_grace: timedelta = timedelta(seconds=10)
+    # Как часто искать просроченные попытки, чтобы завершить их без студента
+    sweep_interval: timedelta = timedelta(seconds=30)
+    cache_size: int = 10_000
+
+
+class EventSettings(BaseSettings):
+    # local — события живут в одном процессе; postgres — LISTEN/NOTIFY между воркерами
+    backend: Literal["local", "postgres"] = "local"
+    channel: str = "exam_events"
+    # Сколько событий ждут медленного подписчика, прежде чем его отключить
+    queue_size: int = 1_000
+    keepalive: timedelta = timedelta(seconds=15)
+
+
+class QueryDebugSettings(BaseSettings):
+    enabled: bool = False
+    # Сколько раз одна форма запроса должна повториться, чтобы считаться N+1
+    n_plus_one_threshold: int = 5
+
+
 class Settings(BaseSettings):
     model_config = SettingsConfigDict(
         env_file=BASE_DIR / ".env",
@@ -35,6 +114,13 @@ class Settings(BaseSettings):
 
     run: RunConfig = RunConfig()
     access_token: AccessToken = AccessToken()
+    token_cache: TokenCacheSettings = TokenCacheSettings()
+    password_hashing: PasswordHashingSettings = PasswordHashingSettings()
+    test_cache: TestCacheSettings = TestCacheSettings()
+    submissions: SubmissionSettings = SubmissionSettings()
+    attempts: AttemptSettings = AttemptSettings()
+    events: EventSettings = EventSettings()
+    query_debug: QueryDebugSettings = QueryDebugSettings()
     database: DatabaseSettings
 
 
@@ -1,16 +1,97 @@
-from typing import AsyncGenerator
+import asyncio
+import contextvars
+import itertools
+import logging
+import os
+import time
+import weakref
+from contextlib import asynccontextmanager
+from dataclasses import dataclass, field
+from typing import AsyncGenerator, AsyncIterator, Optional, Sequence
 
+from sqlalchemy import text
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.exc import DBAPIError
 from sqlalchemy.ext.asyncio import (
     create_async_engine,
+    AsyncConnection,
     AsyncEngine,
     async_sessionmaker,
     AsyncSession,
 )
+from sqlalchemy.engine import make_url
 
 from .config import settings
+from .services.db_metrics import InstrumentedAsyncPool, PoolMetrics, instrument_queries
+
+logger = logging.getLogger(__name__)
+
+# Отставание реплики в секундах. Если всё принятое WAL уже применено,
+# реплика догнала мастер, даже если последняя транзакция была давно.
+REPLICA_LAG_QUERY = text(
+    """
+    SELECT CASE
+        WHEN NOT pg_is_in_recovery() THEN 0
+        WHEN pg_last_wal_receive_lsn() = pg_last_wal_replay_lsn() THEN 0
+        ELSE COALESCE(EXTRACT(EPOCH FROM now() - pg_last_xact_replay_timestamp()), 0)
+    END
+    """
+)
+
+
+def dialect_insert(session: AsyncSession):
+    """insert() с ON CONFLICT для диалекта сессии: Postgres или SQLite (стенд для бенчмарков)"""
+    if session.get_bind().dialect.name == "sqlite":
+        return sqlite.insert
+    return postgresql.insert
+
+
+def connect_args(url: str, prepare_threshold: Optional[int]) -> dict:
+    """Параметры драйвера; None в prepare_threshold отключает prepared statements"""
+    if make_url(url).get_driver_name() != "psycopg":
+        return {}
+    return {"prepare_threshold": prepare_threshold}
+
+
+@dataclass(eq=False)
+class Replica:
+    name: str
+    engine: AsyncEngine
+    session_factory: async_sessionmaker[AsyncSession]
+    # До первой проверки реплика считается недоступной, чтение идёт на мастер
+    healthy: bool = False
+    lag: Optional[float] = None
+    checked_at: Optional[float] = None
+    error: Optional[str] = None
+    sessions: int = 0
+    failures: int = 0
+    pool_metrics: PoolMetrics = field(default_factory=PoolMetrics)
+
+    def __post_init__(self) -> None:
+        self.pool_metrics.attach(self.engine)
+
+    def stats(self) -> dict:
+        return {
+            "name": self.name,
+            "healthy": self.healthy,
+            "lag": self.lag,
+            "checked_ago": time.monotonic() - self.checked_at if self.checked_at else None,
+            "error": self.error,
+            "sessions": self.sessions,
+            "failures": self.failures,
+            "pool": self.pool_metrics.stats(self.engine.sync_engine.pool),
+        }
 
 
 class DatabaseHelper:
+    """Движки и пулы соединений с мастером и репликами.
+
+    Движки создаются при первом обращении, а не при импорте: каждый
+    воркер открывает свои соединения уже после fork. Если движок всё же
+    был создан до fork, дочерний процесс получает новые пулы, не трогая
+    соединения родителя.
+    """
+
     def __init__(
         self,
         url: str,
@@ -18,28 +99,245 @@ class DatabaseHelper:
         echo_pool: bool = False,
         pool_size: int = 5,
         max_overflow: int = 10,
+        pool_timeout: float = 30.0,
+        prepare_threshold: Optional[int] = 5,
+        replica_urls: Sequence[str] = (),
+        replica_max_lag: float = 5.0,
+        replica_check_interval: float = 5.0,
+        replica_check_timeout: float = 2.0,
     ) -> None:
-        self.engine: AsyncEngine = create_async_engine(
+        self.url = url
+        self.echo = echo
+        self.echo_pool = echo_pool
+        self.pool_size = pool_size
+        self.max_overflow = max_overflow
+        self.pool_timeout = pool_timeout
+        self.prepare_threshold = prepare_threshold
+        self.replica_urls = list(replica_urls)
+        self.pool_metrics = PoolMetrics()
+        self._engine: Optional[AsyncEngine] = None
+        self._session_factory: Optional[async_sessionmaker[AsyncSession]] = None
+        self._replicas: Optional[list[Replica]] = None
+
+        self.replica_max_lag = replica_max_lag
+        self.replica_check_interval = replica_check_interval
+        self.replica_check_timeout = replica_check_timeout
+        self.primary_reads = 0
+        self._round_robin = itertools.count()
+        self._checker: Optional[asyncio.Task] = None
+
+        helper = weakref.ref(self)
+
+        def after_fork() -> None:
+            instance = helper()
+            if instance is not None:
+                instance._after_fork()
+
+        os.register_at_fork(after_in_child=after_fork)
+
+    def _create_engine(self, url: str, **kwargs) -> AsyncEngine:
+        engine = create_async_engine(
             url=url,
-            echo=echo,
-            echo_pool=echo_pool,
-            pool_size=pool_size,
-            max_overflow=max_overflow,
-        )
-        self.session_factory: async_sessionmaker[AsyncSession] = async_sessionmaker(
-            bind=self.engine,
-            autoflush=False,
-            autocommit=False,
-            expire_on_commit=False,
+            echo=self.echo,
+            echo_pool=self.echo_pool,
+            pool_size=self.pool_size,
+            max_overflow=self.max_overflow,
+            pool_timeout=self.pool_timeout,
+            poolclass=InstrumentedAsyncPool,
+            connect_args=connect_args(url, self.prepare_threshold),
+            **kwargs,
         )
+        instrument_queries(engine)
+        return engine
+
+    @property
+    def engine(self) -> AsyncEngine:
+        if self._engine is None:
+            self._engine = self._create_engine(self.url)
+            self.pool_metrics.attach(self._engine)
+        return self._engine
+
+    @engine.setter
+    def engine(self, engine: AsyncEngine) -> None:
+        self._engine = engine
+
+    @property
+    def session_factory(self) -> async_sessionmaker[AsyncSession]:
+        if self._session_factory is None:
+            self._session_factory = async_sessionmaker(
+                bind=self.engine,
+                autoflush=False,
+                autocommit=False,
+                expire_on_commit=False,
+            )
+        return self._session_factory
+
+    @session_factory.setter
+    def session_factory(self, session_factory: async_sessionmaker[AsyncSession]) -> None:
+        self._session_factory = session_factory
+
+    @property
+    def replicas(self) -> list[Replica]:
+        if self._replicas is None:
+            self._replicas = []
+            for replica_url in self.replica_urls:
+                engine = self._create_engine(replica_url, pool_pre_ping=True)
+                self._replicas.append(
+                    Replica(
+                        name=make_url(replica_url).render_as_string(hide_password=True),
+                        engine=engine,
+                        session_factory=async_sessionmaker(
+                            bind=engine,
+                            autoflush=False,
+                            autocommit=False,
+                            expire_on_commit=False,
+                        ),
+                    )
+                )
+        return self._replicas
+
+    def _after_fork(self) -> None:
+        # Соединения родителя не закрываем и не используем: у ребёнка новые пулы
+        # (close=False), а фоновая проверка реплик осталась в цикле событий родителя
+        self._checker = None
+        for engine in self._engines():
+            engine.sync_engine.dispose(close=False)
+
+    def _engines(self) -> list[AsyncEngine]:
+        engines = [replica.engine for replica in self._replicas or ()]
+        if self._engine is not None:
+            engines.append(self._engine)
+        return engines
+
+    async def warm_up(self, connections: Optional[int] = None) -> int:
+        """Открывает сразу ``connections`` соединений (по умолчанию pool_size),
+        чтобы первые запросы не платили за их установку"""
+        count = self.pool_size if connections is None else connections
+        opened = await asyncio.gather(*(self._open_connection() for _ in range(count)), return_exceptions=True)
+        connected = [conn for conn in opened if isinstance(conn, AsyncConnection)]
+        # Закрытые соединения возвращаются в пул и остаются открытыми
+        await asyncio.gather(*(conn.close() for conn in connected))
+        for error in opened:
+            if isinstance(error, BaseException):
+                raise error
+        return len(connected)
+
+    async def _open_connection(self) -> AsyncConnection:
+        conn = await self.engine.connect().start()
+        try:
+            await conn.exec_driver_sql("SELECT 1")
+        except BaseException:
+            await conn.close()
+            raise
+        return conn
+
+    async def ping(self, timeout: float = 2.0) -> float:
+        """Время ответа мастера на SELECT 1 в секундах; исключение — БД недоступна"""
+        started_at = time.perf_counter()
+        async with asyncio.timeout(timeout):
+            async with self.engine.connect() as conn:
+                await conn.exec_driver_sql("SELECT 1")
+        return time.perf_counter() - started_at
 
     async def dispose(self) -> None:
-        await self.engine.dispose()
+        if self._checker is not None:
+            self._checker.cancel()
+            try:
+                await self._checker
+            except asyncio.CancelledError:
+                pass
+            self._checker = None
+        for engine in self._engines():
+            await engine.dispose()
 
     async def session_getter(self) -> AsyncGenerator[AsyncSession, None]:
         async with self.session_factory() as session:
             yield session
 
+    async def read_session_getter(self) -> AsyncGenerator[AsyncSession, None]:
+        async with self.read_session() as session:
+            yield session
+
+    @asynccontextmanager
+    async def read_session(self) -> AsyncIterator[AsyncSession]:
+        """Сессия только для чтения: реплика по кругу или мастер.
+
+        На мастер чтение уходит, если реплик нет, все недоступны или
+        отстают больше ``replica_max_lag``. Данные с реплики могут быть
+        старше мастера на это время.
+        """
+        replica = self._pick_replica()
+        if replica is None:
+            self.primary_reads += 1
+            async with self.session_factory() as session:
+                yield session
+            return
+
+        replica.sessions += 1
+        async with replica.session_factory() as session:
+            session.info["replica"] = replica.name
+            try:
+                yield session
+            except DBAPIError as exc:
+                # Не ждём следующей проверки: до неё чтение пойдёт на мастер
+                if exc.connection_invalidated or isinstance(exc.orig, OSError):
+                    replica.healthy = False
+                    replica.failures += 1
+                    replica.error = str(exc.orig or exc)
+                raise
+
+    def replica_lagging(self, session: AsyncSession) -> bool:
+        """Сессия читает с реплики, которая при последней проверке отставала"""
+        name = session.info.get("replica")
+        return name is not None and any(
+            replica.name == name and replica.lag != 0 for replica in self.replicas
+        )
+
+    def _pick_replica(self) -> Optional[Replica]:
+        if not self.replicas:
+            return None
+        if self._checker is None or self._checker.done():
+            self._checker = asyncio.create_task(
+                self._check_loop(), name="replica-checker", context=contextvars.Context()
+            )
+
+        healthy = [replica for replica in self.replicas if replica.healthy]
+        if not healthy:
+            return None
+        return healthy[next(self._round_robin) % len(healthy)]
+
+    async def _check_loop(self) -> None:
+        while True:
+            await asyncio.gather(*(self._check(replica) for replica in self.replicas))
+            await asyncio.sleep(self.replica_check_interval)
+
+    async def _check(self, replica: Replica) -> None:
+        try:
+            async with asyncio.timeout(self.replica_check_timeout):
+                async with replica.engine.connect() as conn:
+                    lag = float((await conn.execute(REPLICA_LAG_QUERY)).scalar_one())
+        except Exception as exc:
+            if replica.healthy:
+                logger.warning("Реплика %s недоступна: %r", replica.name, exc)
+            replica.healthy = False
+            replica.lag = None
+            replica.error = repr(exc)
+        else:
+            replica.healthy = lag <= self.replica_max_lag
+            replica.lag = lag
+            replica.error = None if replica.healthy else "Отставание больше допустимого"
+        replica.checked_at = time.monotonic()
+
+    def pool_stats(self) -> dict:
+        return self.pool_metrics.stats(self.engine.sync_engine.pool)
+
+    def replica_stats(self) -> dict:
+        return {
+            "primary_reads": self.primary_reads,
+            "max_lag": self.replica_max_lag,
+            "replicas": [replica.stats() for replica in self.replicas],
+        }
+
 
 db_helper = DatabaseHelper(
     url=str(settings.database.url),
@@ -47,4 +345,9 @@ db_helper = DatabaseHelper(
     echo_pool=settings.database.echo_pool,
     pool_size=settings.database.pool_size,
     max_overflow=settings.database.max_overflow,
+    pool_timeout=settings.database.pool_timeout.total_seconds(),
+    prepare_threshold=settings.database.prepare_threshold if settings.database.prepared_statements else None,
+    replica_urls=[str(url) for url in settings.database.replica_urls],
+    replica_max_lag=settings.database.replica_max_lag.total_seconds(),
+    replica_check_interval=settings.database.replica_check_interval.total_seconds(),
 )
@@ -1,9 +1,10 @@
 from typing import Annotated
 from fastapi import Depends, HTTPException, status, Request
-from app.models import Role, User, Token
-from sqlalchemy.ext.asyncio import AsyncSession
-from sqlmodel import select
+from app.models import Role
 from app.database import db_helper
+from app.schemas import CurrentUser
+from app.services.auth import resolve_token
+from app.services.token_cache import token_cache
 from starlette.status import HTTP_401_UNAUTHORIZED
 
 from app.security import oauth2_scheme
@@ -11,29 +12,30 @@ from app.security import oauth2_scheme
 async def get_current_user(
     request: Request,
     token: Annotated[str, Depends(oauth2_scheme)],
-    session: AsyncSession = Depends(db_helper.session_getter),
-) -> User:
-    
-    stmt = select(Token).where(Token.id == token)
-    result = await session.execute(stmt)
-    token_pg = result.scalar_one_or_none()
+) -> CurrentUser:
 
-    if token_pg is None:
-        raise HTTPException(HTTP_401_UNAUTHORIZED, detail="Недействительный токен")
+    cached = token_cache.get(token)
+    if cached is not None:
+        return cached
 
-    user_stmt = select(User).where(User.id == token_pg.user_id)
-    user_result = await session.execute(user_stmt)
-    user = user_result.scalar_one_or_none()
+    # Своя короткая сессия, а не зависимость: соединение возвращается в пул
+    # до обработчика, и пишущий запрос не держит реплику рядом с мастером
+    async with db_helper.read_session() as session:
+        resolved = await resolve_token(session, token)
+        on_replica = "replica" in session.info
+    if resolved is None and on_replica:
+        # Только что выданный токен мог ещё не дойти до реплики
+        async with db_helper.session_factory() as primary:
+            resolved = await resolve_token(primary, token)
+    if resolved is None:
+        raise HTTPException(HTTP_401_UNAUTHORIZED, detail="Недействительный или просроченный токен")
 
-    if user is None:
-        raise HTTPException(
-            status_code=HTTP_401_UNAUTHORIZED,
-            detail="Неавторизован"
-        )
-
-    return user
+    user, expires_at = resolved
+    current_user = CurrentUser.model_validate(user)
+    token_cache.set(token, current_user, expires_at)
+    return current_user
 
-def require_admin(user: User = Depends(get_current_user)) -> User:
+def require_admin(user: CurrentUser = Depends(get_current_user)) -> CurrentUser:
     if user.role != Role.admin:
         raise HTTPException(
             status_code=status.HTTP_403_FORBIDDEN,
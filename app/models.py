@@ -1,4 +1,5 @@
 import secrets
+from sqlalchemy import DateTime, Index, text
 from sqlmodel import SQLModel, Field, Relationship
 from typing import Optional, List
 from enum import Enum
@@ -12,7 +13,17 @@ class Role(str, Enum):
     student = "student"
 
 
+class AttemptStatus(str, Enum):
+    in_progress = "in_progress"
+    submitted = "submitted"
+    expired = "expired"
+
+
 class Token(SQLModel, table=True):
+    __table_args__ = (
+        Index("ix_token_user_id_expires_at", "user_id", "expires_at"),
+    )
+
     id: str = Field(default_factory=lambda: secrets.token_urlsafe(32), primary_key=True)
     user_id: UUID = Field(foreign_key="user.id")
     created_at: datetime = Field(default_factory=lambda: datetime.now(timezone.utc))
@@ -20,10 +31,6 @@ class Token(SQLModel, table=True):
 
     user: Optional["User"] = Relationship(back_populates="tokens")
 
-    expires_at: Optional[datetime] = None
-
-    user: Optional["User"] = Relationship(back_populates="tokens")
-
 
 class User(SQLModel, table=True):
     id: UUID = Field(default_factory=uuid4, primary_key=True)
@@ -41,25 +48,54 @@ class User(SQLModel, table=True):
 
 
 class Test(SQLModel, table=True):
+    __table_args__ = (
+        # Тесты автора постранично по id (list_tests, экспорт)
+        Index("ix_test_author_id_id", "author_id", "id"),
+    )
+
     id: UUID = Field(default_factory=uuid4, primary_key=True)
     title: str
     author_id: UUID = Field(foreign_key="user.id")
+    # Вариант студента выводится из его id и id теста, отдельно не хранится
+    shuffle_questions: bool = False
+    shuffle_answers: bool = False
+    # Сколько вопросов выдать из банка; None — все
+    draw_count: Optional[int] = None
+    # Время на попытку в минутах; None — без ограничения
+    time_limit_minutes: Optional[int] = None
     author: Optional[User] = Relationship(back_populates="tests")
-    questions: List["Question"] = Relationship(back_populates="test")
+    questions: List["Question"] = Relationship(
+        back_populates="test",
+        sa_relationship_kwargs={"passive_deletes": True},
+    )
 
 
 class Question(SQLModel, table=True):
+    __table_args__ = (
+        # Вопросы теста в порядке id: снимок, ключ ответов, selectinload
+        Index("ix_question_test_id_id", "test_id", "id"),
+    )
+
     id: UUID = Field(default_factory=uuid4, primary_key=True)
-    test_id: UUID = Field(foreign_key="test.id")
+    test_id: UUID = Field(foreign_key="test.id", ondelete="CASCADE")
     text: str
 
     test: Optional[Test] = Relationship(back_populates="questions")
-    answers: List["Answer"] = Relationship(back_populates="question")
+    answers: List["Answer"] = Relationship(
+        back_populates="question",
+        # Ответы удаляет сама БД (ON DELETE CASCADE), без загрузки в сессию
+        sa_relationship_kwargs={"passive_deletes": True},
+    )
 
 
 class Answer(SQLModel, table=True):
+    __table_args__ = (
+        # is_correct в листьях индекса: ключ ответов читается без обращения к таблице
+        Index("ix_answer_question_id_id", "question_id", "id", postgresql_include=["is_correct"]),
+    )
+
     id: UUID = Field(default_factory=uuid4, primary_key=True)
-    question_id: UUID = Field(foreign_key="question.id")
+    question_id: UUID = Field(foreign_key="question.id", ondelete="CASCADE")
     text: str
     is_correct: bool = False
 
@@ -67,9 +103,98 @@ class Answer(SQLModel, table=True):
 
 
 class Result(SQLModel, table=True):
+    __table_args__ = (
+        # Под сортировку списка результатов (created_at desc, id desc) с фильтрами
+        Index("ix_result_student_id_created_at_id", "student_id", "created_at", "id"),
+        Index("ix_result_test_id_created_at_id", "test_id", "created_at", "id"),
+        Index("ix_result_created_at_id", "created_at", "id"),
+    )
+
     id: UUID = Field(default_factory=uuid4, primary_key=True)
     student_id: UUID = Field(foreign_key="user.id")
     test_id: UUID = Field(foreign_key="test.id")
     score: int
+    created_at: datetime = Field(default_factory=lambda: datetime.now(timezone.utc))
 
     student: Optional[User] = Relationship(back_populates="results")
+
+
+class ResultDetail(SQLModel, table=True):
+    """Ответы студента в упакованном виде, по одной строке на результат.
+
+    ``choices`` — массив uint16 (little-endian) по позициям вопросов
+    в ключе ответов: номер выбранного ответа + 1, 0 — без ответа.
+    ``correct`` — битовая маска верных ответов, ``layout`` — контрольная
+    сумма порядка вопросов и их ответов на момент сдачи.
+    """
+    __tablename__ = "result_detail"
+
+    result_id: UUID = Field(foreign_key="result.id", primary_key=True, ondelete="CASCADE")
+    test_id: UUID = Field(foreign_key="test.id", index=True, ondelete="CASCADE")
+    layout: int
+    choices: bytes
+    correct: bytes
+
+
+class ScoreHistogram(SQLModel, table=True):
+    """Сводка баллов по тесту: сколько раз набран каждый балл.
+
+    Обновляется инкрементально при каждой сдаче, из неё считается
+    статистика без чтения всей таблицы result.
+    """
+    __tablename__ = "score_histogram"
+
+    test_id: UUID = Field(foreign_key="test.id", primary_key=True, ondelete="CASCADE")
+    score: int = Field(primary_key=True)
+    count: int = 0
+
+
+class Attempt(SQLModel, table=True):
+    """Попытка прохождения теста.
+
+    Срок сдачи считает сервер: ``deadline`` фиксируется при старте
+    по ограничению времени теста. Ответы сохраняются по ходу попытки
+    в attempt_answer, сдача лишь подводит итог и пишет Result.
+    """
+    __table_args__ = (
+        # Не больше одной незавершённой попытки студента по тесту
+        Index(
+            "ux_attempt_student_id_test_id_in_progress",
+            "student_id",
+            "test_id",
+            unique=True,
+            postgresql_where=text("status = 'in_progress'"),
+            sqlite_where=text("status = 'in_progress'"),
+        ),
+        # Просроченные попытки для фонового завершения
+        Index(
+            "ix_attempt_deadline_in_progress",
+            "deadline",
+            postgresql_where=text("status = 'in_progress'"),
+            sqlite_where=text("status = 'in_progress'"),
+        ),
+    )
+
+    id: UUID = Field(default_factory=uuid4, primary_key=True)
+    student_id: UUID = Field(foreign_key="user.id")
+    test_id: UUID = Field(foreign_key="test.id", ondelete="CASCADE")
+    status: AttemptStatus = AttemptStatus.in_progress
+    # С часовым поясом: дедлайн сравнивается с часами сервера приложения
+    started_at: datetime = Field(
+        default_factory=lambda: datetime.now(timezone.utc), sa_type=DateTime(timezone=True)
+    )
+    deadline: Optional[datetime] = Field(default=None, sa_type=DateTime(timezone=True))
+    finished_at: Optional[datetime] = Field(default=None, sa_type=DateTime(timezone=True))
+    result_id: Optional[UUID] = Field(default=None, foreign_key="result.id", ondelete="SET NULL")
+
+
+class AttemptAnswer(SQLModel, table=True):
+    """Сохранённый ответ попытки: по строке на вопрос, повторное сохранение перезаписывает"""
+    __tablename__ = "attempt_answer"
+
+    attempt_id: UUID = Field(foreign_key="attempt.id", primary_key=True, ondelete="CASCADE")
+    question_id: UUID = Field(foreign_key="question.id", primary_key=True, ondelete="CASCADE")
+    answer_id: UUID = Field(foreign_key="answer.id", ondelete="CASCADE")
+    updated_at: datetime = Field(
+        default_factory=lambda: datetime.now(timezone.utc), sa_type=DateTime(timezone=True)
+    )
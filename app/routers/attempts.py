@@ -0,0 +1,161 @@
+from fastapi import APIRouter, Depends, HTTPException
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.ext.asyncio import AsyncSession
+from uuid import UUID
+
+from app.database import db_helper
+from app.models import Attempt, AttemptStatus, Role
+from app.schemas import (
+    AnswerSubmission,
+    AttemptRead,
+    AttemptStart,
+    AutosaveAck,
+    CurrentUser,
+    ResultRead,
+    TestSubmission,
+)
+from app.dependencies.auth import get_current_user
+from app.services.attempts import (
+    AttemptFinished,
+    AutosaveBusy,
+    as_utc,
+    autosave_buffer,
+    finalize_attempt,
+    load_answers,
+    load_attempt_state,
+    result_read,
+    start_attempt,
+    utcnow,
+)
+from app.services.events import event_broker
+from app.services.grading import GradingError, get_answer_key
+from app.services.variants import drawn_questions
+
+router = APIRouter(tags=["Attempts"])
+
+
+async def attempt_read(session: AsyncSession, attempt: Attempt) -> AttemptRead:
+    answers = await load_answers(session, attempt.id)
+    return AttemptRead(
+        id=attempt.id,
+        test_id=attempt.test_id,
+        student_id=attempt.student_id,
+        status=attempt.status,
+        started_at=as_utc(attempt.started_at),
+        deadline=as_utc(attempt.deadline),
+        finished_at=as_utc(attempt.finished_at),
+        result_id=attempt.result_id,
+        server_time=utcnow(),
+        answers=[
+            AnswerSubmission(question_id=question_id, answer_id=answer_id)
+            for question_id, answer_id in answers.items()
+        ],
+    )
+
+
+# ---------------------------
+# НАЧАТЬ ИЛИ ПРОДОЛЖИТЬ ПОПЫТКУ
+# ---------------------------
+@router.post("/", response_model=AttemptRead)
+async def start(
+    data: AttemptStart,
+    session: AsyncSession = Depends(db_helper.session_getter),
+    current_user: CurrentUser = Depends(get_current_user),
+):
+    try:
+        attempt = await start_attempt(session, data.test_id, current_user.id)
+    except AttemptFinished:
+        raise HTTPException(status_code=409, detail="Попытка уже завершена")
+    if attempt is None:
+        raise HTTPException(status_code=404, detail="Тест не найден")
+    # Вместе с попыткой отдаём сохранённые ответы: клиент восстанавливается после обрыва связи
+    return await attempt_read(session, attempt)
+
+
+@router.get("/{attempt_id}", response_model=AttemptRead)
+async def get_attempt(
+    attempt_id: UUID,
+    session: AsyncSession = Depends(db_helper.session_getter),
+    current_user: CurrentUser = Depends(get_current_user),
+):
+    attempt = await session.get(Attempt, attempt_id)
+    if attempt is None or (attempt.student_id != current_user.id and current_user.role != Role.admin):
+        raise HTTPException(status_code=404, detail="Попытка не найдена")
+    return await attempt_read(session, attempt)
+
+
+# ---------------------------
+# АВТОСОХРАНЕНИЕ (при одном воркере ответы копятся в памяти и пишутся в БД пачками)
+# ---------------------------
+@router.put("/{attempt_id}/answers", response_model=AutosaveAck, status_code=202)
+async def autosave(
+    attempt_id: UUID,
+    submission: TestSubmission,
+    session: AsyncSession = Depends(db_helper.session_getter),
+    current_user: CurrentUser = Depends(get_current_user),
+):
+    # Состояние попытки и ключ ответов берутся из кэшей: обычно в БД не ходим вовсе
+    state = await load_attempt_state(session, attempt_id)
+    if state is None or state.student_id != current_user.id:
+        raise HTTPException(status_code=404, detail="Попытка не найдена")
+    if state.status != AttemptStatus.in_progress:
+        raise HTTPException(status_code=409, detail="Попытка уже завершена")
+    now = utcnow()
+    if state.overdue(now, autosave_buffer.deadline_grace):
+        raise HTTPException(status_code=409, detail="Время на попытку истекло")
+
+    answer_key = await get_answer_key(session, state.test_id)
+    if answer_key is None:
+        raise HTTPException(status_code=404, detail="Тест не найден")
+    drawn = drawn_questions(current_user.id, state.test_id, len(answer_key.questions), answer_key.draw_count)
+    try:
+        for item in submission.answers:
+            answer_key.locate(item.question_id, item.answer_id, drawn)
+    except GradingError as exc:
+        raise HTTPException(status_code=400, detail=str(exc))
+
+    answers = [(item.question_id, item.answer_id) for item in submission.answers]
+    if autosave_buffer.buffered:
+        try:
+            autosave_buffer.save(attempt_id, answers)
+        except AutosaveBusy:
+            raise HTTPException(status_code=503, detail="Сервер перегружен, повторите попытку позже")
+    else:
+        try:
+            status = await autosave_buffer.write(session, state, answers)
+        except IntegrityError:
+            # Вопрос удалили вместе с тестом, пока шла проверка
+            raise HTTPException(status_code=409, detail="Тест изменён, обновите страницу")
+        if status is None:
+            raise HTTPException(status_code=404, detail="Попытка не найдена")
+        if status != AttemptStatus.in_progress:
+            raise HTTPException(status_code=409, detail="Попытка уже завершена")
+    event_broker.publish(state.test_id, "attempt_saved", {
+        "attempt_id": attempt_id,
+        "student_id": current_user.id,
+        "saved": len(submission.answers),
+    })
+    return AutosaveAck(saved=len(submission.answers), deadline=state.deadline, server_time=now)
+
+
+# ---------------------------
+# СДАЧА ПОПЫТКИ (только подводит итог по сохранённым ответам)
+# ---------------------------
+@router.post("/{attempt_id}/submit", response_model=ResultRead)
+async def submit(
+    attempt_id: UUID,
+    session: AsyncSession = Depends(db_helper.session_getter),
+    current_user: CurrentUser = Depends(get_current_user),
+):
+    state = await load_attempt_state(session, attempt_id)
+    if state is None or state.student_id != current_user.id:
+        raise HTTPException(status_code=404, detail="Попытка не найдена")
+
+    # Сданная позже дедлайна попытка засчитывается как просроченная
+    status = AttemptStatus.expired if state.overdue(utcnow(), autosave_buffer.deadline_grace) else AttemptStatus.submitted
+    finalized = await finalize_attempt(session, attempt_id, status)
+    if finalized is None:
+        raise HTTPException(status_code=409, detail="Попытка уже завершена")
+
+    _, result = finalized
+    return result_read(result)
@@ -1,17 +1,16 @@
-from fastapi import APIRouter, Depends, HTTPException, Request
+from fastapi import APIRouter, Depends, HTTPException
 from fastapi.security import OAuth2PasswordRequestForm
 from sqlmodel.ext.asyncio.session import AsyncSession
-from sqlalchemy import select
-from datetime import datetime
-from uuid import UUID
+from sqlalchemy import delete, select
 from typing import Annotated
 
 from app.database import db_helper
-from app.schemas import UserCreate, UserRead
-from app.services.auth import authenticate_user, create_token_for_user
+from app.schemas import CurrentUser, UserCreate, UserRead
+from app.services.auth import authenticate_user, create_token_for_user, resolve_token
 from app.models import Token, User, Role
-from app.services.auth import hash_password
-from app.dependencies.auth import require_admin
+from app.services.passwords import PasswordHasherBusy, password_hasher
+from app.services.token_cache import token_cache
+from app.dependencies.auth import get_current_user, require_admin
 from app.utils import generate_username
 
 from app.security import oauth2_scheme
@@ -20,12 +19,19 @@ from app.security import oauth2_scheme
 router = APIRouter()
 
 
+async def _hash_or_503(password: str) -> str:
+    try:
+        return await password_hasher.hash(password)
+    except PasswordHasherBusy:
+        raise HTTPException(status_code=503, detail="Сервер перегружен, повторите попытку позже")
+
+
 @router.post("/register", response_model=UserRead)
 async def register_user(
     user_data: UserCreate,
     token: Annotated[str, Depends(oauth2_scheme)],
     session: AsyncSession = Depends(db_helper.session_getter),
-    _: User = Depends(require_admin),
+    _: CurrentUser = Depends(require_admin),
 ):
 
     if user_data.role == Role.admin:
@@ -44,7 +50,7 @@ async def register_user(
         first_name=user_data.first_name,
         middle_name=user_data.middle_name,
         last_name=user_data.last_name,
-        password_hash=hash_password(user_data.password),
+        password_hash=await _hash_or_503(user_data.password),
         role=user_data.role,
     )
     session.add(new_user)
@@ -54,7 +60,10 @@ async def register_user(
 
 @router.post("/login")
 async def login(form_data: OAuth2PasswordRequestForm = Depends(), session: AsyncSession = Depends(db_helper.session_getter)):
-    user = await authenticate_user(session, form_data.username, form_data.password)
+    try:
+        user = await authenticate_user(session, form_data.username, form_data.password)
+    except PasswordHasherBusy:
+        raise HTTPException(status_code=503, detail="Сервер перегружен, повторите попытку позже")
     if not user:
         raise HTTPException(status_code=401, detail="Неверные учётные данные")
 
@@ -63,34 +72,19 @@ async def login(form_data: OAuth2PasswordRequestForm = Depends(), session: Async
 
 
 @router.get("/me", response_model=UserRead)
-async def read_current_user(request: Request, token: Annotated[str, Depends(oauth2_scheme)], session: AsyncSession = Depends(db_helper.session_getter)):
-    stmt = select(Token).where(Token.id == token)
-    result = await session.execute(stmt)
-    token = result.scalar_one_or_none()
-    if not token or (token.expires_at and token.expires_at < datetime.utcnow()):
-        raise HTTPException(status_code=401, detail="Недействительный или просроченный токен")
-
-    await session.refresh(token, attribute_names=["user"])
-    return token.user
+async def read_current_user(current_user: CurrentUser = Depends(get_current_user)):
+    return current_user
 
 @router.post("/logout")
-async def logout(request: Request, session: AsyncSession = Depends(db_helper.session_getter)):
-    token_id = request.headers.get("Authorization")
-    if not token_id:
-        raise HTTPException(status_code=401, detail="Требуется токен")
-
-    try:
-        token_uuid = UUID(token_id)
-    except ValueError:
-        raise HTTPException(status_code=400, detail="Неверный формат токена")
-
-    stmt = select(Token).where(Token.id == token_uuid)
-    result = await session.execute(stmt)
-    token = result.scalar_one_or_none()
-    if not token:
+async def logout(
+    token: Annotated[str, Depends(oauth2_scheme)],
+    session: AsyncSession = Depends(db_helper.session_getter),
+):
+    if await resolve_token(session, token) is None:
         raise HTTPException(status_code=401, detail="Токен не найден")
 
-    await session.delete(token)
+    await session.execute(delete(Token).where(Token.id == token))
     await session.commit()
+    token_cache.invalidate(token)
 
     return {"detail": "Выход выполнен успешно"}
@@ -0,0 +1,43 @@
+from fastapi import APIRouter, Response
+
+from app.config import settings
+from app.database import db_helper
+from app.services.lifecycle import lifecycle
+
+router = APIRouter(tags=["Health"])
+
+
+@router.get("/live")
+async def liveness():
+    """Процесс жив и обслуживает цикл событий. Недоступная БД сюда не влияет:
+    перезапуск воркера её не починит, а состояние видно в поле database"""
+    return {
+        "status": "draining" if lifecycle.draining else "alive",
+        "in_flight": lifecycle.in_flight,
+        "database": lifecycle.database,
+    }
+
+
+@router.get("/ready")
+async def readiness(response: Response):
+    """Воркер готов принимать трафик: запущен, не останавливается и БД отвечает"""
+    if lifecycle.draining or not lifecycle.started:
+        response.status_code = 503
+        return {"status": "draining" if lifecycle.draining else "starting"}
+
+    try:
+        latency = await db_helper.ping(settings.run.health_timeout.total_seconds())
+    except Exception as exc:
+        lifecycle.record_database(None, exc)
+        response.status_code = 503
+        return {"status": "unavailable", "database": lifecycle.database}
+
+    lifecycle.record_database(latency)
+    return {
+        "status": "ready",
+        "database": lifecycle.database,
+        "replicas": [
+            {"name": replica.name, "healthy": replica.healthy, "lag": replica.lag}
+            for replica in db_helper.replicas
+        ],
+    }
@@ -0,0 +1,33 @@
+from fastapi import APIRouter, Depends
+
+from app.database import db_helper
+from app.schemas import CurrentUser
+from app.dependencies.auth import require_admin
+from app.services.attempts import autosave_buffer
+from app.services.events import event_broker
+from app.services.db_metrics import route_query_metrics
+from app.services.grading import answer_key_cache
+from app.services.passwords import password_hasher
+from app.services.result_batcher import result_batcher
+from app.services.test_cache import test_cache
+from app.services.token_cache import token_cache
+
+router = APIRouter(tags=["Metrics"])
+
+
+@router.get("/")
+async def read_metrics(_: CurrentUser = Depends(require_admin)):
+    return {
+        "token_cache": token_cache.stats(),
+        "password_hashing": password_hasher.stats(),
+        "test_cache": test_cache.stats(),
+        "answer_key_cache": answer_key_cache.stats(),
+        "result_batcher": result_batcher.stats(),
+        "attempts": autosave_buffer.stats(),
+        "events": event_broker.stats(),
+        "database": {
+            "pool": db_helper.pool_stats(),
+            **db_helper.replica_stats(),
+        },
+        "queries_by_route": route_query_metrics.stats(),
+    }
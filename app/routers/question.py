@@ -1,11 +1,13 @@
 from fastapi import APIRouter, Depends, HTTPException, status
 from uuid import UUID
+from sqlalchemy import delete
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlmodel import select
 from app.database import db_helper
-from app.models import Question, Test, User
-from app.schemas import QuestionCreate, QuestionRead, QuestionUpdate
+from app.models import Question, Test
+from app.schemas import CurrentUser, QuestionCreate, QuestionRead, QuestionUpdate
 from app.dependencies.auth import get_current_user
+from app.services.test_cache import test_cache
 
 router = APIRouter(prefix="/questions", tags=["Questions"])
 
@@ -13,7 +15,7 @@ router = APIRouter(prefix="/questions", tags=["Questions"])
 async def create_question(
     question: QuestionCreate,
     session: AsyncSession = Depends(db_helper.session_getter),
-    current_user: User = Depends(get_current_user),
+    current_user: CurrentUser = Depends(get_current_user),
 ):
     stmt = select(Test).where(Test.id == question.test_id)
     result = await session.execute(stmt)
@@ -27,6 +29,7 @@ async def create_question(
     new_question = Question(text=question.text, test_id=question.test_id)
     session.add(new_question)
     await session.commit()
+    await test_cache.invalidate(new_question.test_id)
     await session.refresh(new_question)
     return new_question
 
@@ -50,7 +53,7 @@ async def update_question(
     question_id: UUID,
     question_update: QuestionUpdate,
     session: AsyncSession = Depends(db_helper.session_getter),
-    current_user: User = Depends(get_current_user),
+    current_user: CurrentUser = Depends(get_current_user),
 ):
     stmt = (
         select(Question)
@@ -69,6 +72,7 @@ async def update_question(
 
     session.add(question)
     await session.commit()
+    await test_cache.invalidate(question.test_id)
     await session.refresh(question)
     return question
 
@@ -77,19 +81,19 @@ async def update_question(
 async def delete_question(
     question_id: UUID,
     session: AsyncSession = Depends(db_helper.session_getter),
-    current_user: User = Depends(get_current_user),
+    current_user: CurrentUser = Depends(get_current_user),
 ):
+    # Один DELETE: права проверяются в условии, ответы удаляет БД каскадом
     stmt = (
-        select(Question)
+        delete(Question)
         .where(Question.id == question_id)
-        .join(Test)
-        .where(Test.author_id == current_user.id)
+        .where(Question.test_id.in_(select(Test.id).where(Test.author_id == current_user.id)))
+        .returning(Question.test_id)
     )
-    result = await session.execute(stmt)
-    question = result.scalar_one_or_none()
+    test_id = await session.scalar(stmt)
 
-    if not question:
+    if test_id is None:
         raise HTTPException(status_code=404, detail="Вопрос не найден или нет доступа")
 
-    await session.delete(question)
     await session.commit()
+    await test_cache.invalidate(test_id)
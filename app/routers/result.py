@@ -1,60 +1,131 @@
-from fastapi import APIRouter, Depends, HTTPException
+from fastapi import APIRouter, Depends, HTTPException, Query, Response
+from fastapi.responses import StreamingResponse
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlmodel import select
-from typing import List
+from typing import List, Literal, Optional
+from datetime import datetime
 from uuid import UUID
 
 from app.database import db_helper
-from app.models import Result, Role, User, Test
-from app.schemas import ResultRead
+from app.models import Result, Role, Test
+from app.schemas import CurrentUser, ItemStats, ResultRead, TestScoreStats
 from app.dependencies.auth import get_current_user
+from app.config import settings
+from app.services.events import stream_events
+from app.services.grading import get_answer_key
+from app.services.result_details import load_choice_matrix
+from app.services.result_stats import load_test_stats
+from app.services.results import (
+    InvalidCursor,
+    ResultFilters,
+    encode_cursor,
+    export_results,
+    results_page_query,
+)
 
 router = APIRouter(prefix="/results", tags=["Results"])
 
+def result_filters(
+    test_id: Optional[UUID] = None,
+    student_id: Optional[UUID] = None,
+    date_from: Optional[datetime] = Query(None, description="Не раньше (включительно)"),
+    date_to: Optional[datetime] = Query(None, description="Раньше (не включительно)"),
+    current_user: CurrentUser = Depends(get_current_user),
+) -> ResultFilters:
+    # Студент видит только свои результаты, какой бы student_id ни передал
+    if current_user.role == Role.student:
+        student_id = current_user.id
+    return ResultFilters(test_id=test_id, student_id=student_id, date_from=date_from, date_to=date_to)
+
 @router.get("/", response_model=List[ResultRead])
 async def list_results(
-    session: AsyncSession = Depends(db_helper.session_getter),
-    current_user: User = Depends(get_current_user),
+    response: Response,
+    limit: int = Query(50, ge=1, le=500),
+    cursor: Optional[str] = Query(None, description="Значение X-Next-Cursor предыдущей страницы"),
+    filters: ResultFilters = Depends(result_filters),
+    session: AsyncSession = Depends(db_helper.read_session_getter),
+):
+    try:
+        stmt = results_page_query(filters, limit + 1, cursor)
+    except InvalidCursor:
+        raise HTTPException(status_code=400, detail="Неверный курсор")
+
+    rows = (await session.execute(stmt)).all()
+    if len(rows) > limit:
+        rows = rows[:limit]
+        response.headers["X-Next-Cursor"] = encode_cursor(rows[-1].created_at, rows[-1].id)
+    return rows
+
+@router.get("/export")
+async def export_results_stream(
+    format: Literal["csv", "ndjson"] = "csv",
+    filters: ResultFilters = Depends(result_filters),
 ):
-    # SQLAlchemy join Result + Test
-    stmt = (
-        select(
-            Result.id,
-            Result.score,
-            Result.test_id,
-            Test.title.label("test_title")
-        )
-        .join(Test, Result.test_id == Test.id)
+    """Журнал целиком в CSV или NDJSON, потоком"""
+    media_type = "text/csv; charset=utf-8" if format == "csv" else "application/x-ndjson"
+    return StreamingResponse(
+        export_results(filters, format),
+        media_type=media_type,
+        headers={"Content-Disposition": f"attachment; filename=results.{format}"},
     )
 
+@router.get("/stats", response_model=List[TestScoreStats])
+async def results_stats(
+    test_id: Optional[UUID] = None,
+    by_student: bool = False,
+    session: AsyncSession = Depends(db_helper.read_session_getter),
+    current_user: CurrentUser = Depends(get_current_user),
+):
+    """Сводная статистика баллов по тестам (по своим тестам для преподавателя)"""
     if current_user.role == Role.student:
-        stmt = stmt.where(Result.student_id == current_user.id)
+        raise HTTPException(status_code=403, detail="Недостаточно прав")
 
-    result = await session.execute(stmt)
-    rows = result.all()
+    author_id = None if current_user.role == Role.admin else current_user.id
+    return await load_test_stats(session, test_id=test_id, author_id=author_id, by_student=by_student)
 
-    # Формируем список словарей для Pydantic
-    results_list = []
-    results_list = [
-        ResultRead(
-            id=r.id,
-            score=r.score,
-            test_id=r.test_id,
-            student_id=current_user.id,
-            test_title=r.test_title,
-        )
-        for r in rows
-    ]
+@router.get("/items/{test_id}", response_model=List[ItemStats])
+async def item_analysis(
+    test_id: UUID,
+    session: AsyncSession = Depends(db_helper.session_getter),
+    current_user: CurrentUser = Depends(get_current_user),
+):
+    """Анализ заданий: доля верных ответов и выбор вариантов по каждому вопросу"""
+    author_id = (await session.execute(select(Test.author_id).where(Test.id == test_id))).scalar_one_or_none()
+    if author_id is None:
+        raise HTTPException(status_code=404, detail="Тест не найден")
+    if current_user.role != Role.admin and author_id != current_user.id:
+        raise HTTPException(status_code=403, detail="Недостаточно прав")
 
-    print(results_list)
+    answer_key = await get_answer_key(session, test_id)
+    matrix = await load_choice_matrix(session, test_id, answer_key)
+    return matrix.item_stats()
 
-    return results_list
+@router.get("/live/{test_id}")
+async def live_results(
+    test_id: UUID,
+    session: AsyncSession = Depends(db_helper.read_session_getter),
+    current_user: CurrentUser = Depends(get_current_user),
+):
+    """Сдачи и попытки по тесту в реальном времени (Server-Sent Events) вместо опроса списка результатов"""
+    author_id = (await session.execute(select(Test.author_id).where(Test.id == test_id))).scalar_one_or_none()
+    if author_id is None:
+        raise HTTPException(status_code=404, detail="Тест не найден")
+    if current_user.role != Role.admin and author_id != current_user.id:
+        raise HTTPException(status_code=403, detail="Недостаточно прав")
+    # Соединение с БД не держим, пока открыт поток
+    await session.close()
+
+    return StreamingResponse(
+        stream_events(test_id, settings.events.keepalive.total_seconds()),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
 
 @router.get("/{result_id}", response_model=ResultRead)
 async def get_result(
     result_id: UUID,
     session: AsyncSession = Depends(db_helper.session_getter),
-    current_user: User = Depends(get_current_user),
+    current_user: CurrentUser = Depends(get_current_user),
 ):
     result = await session.get(Result, result_id)
     if not result:
@@ -1,21 +1,46 @@
-from fastapi import APIRouter, Depends, HTTPException
+from fastapi import APIRouter, Depends, HTTPException, Query, Request, Response
+from fastapi.responses import StreamingResponse
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlmodel import select
+from sqlalchemy import delete, func
+from sqlalchemy.exc import IntegrityError, SQLAlchemyError
 from sqlalchemy.orm import selectinload
 from uuid import UUID
-from typing import List
+from typing import List, Optional, Union
 
 from app.database import db_helper
-from app.models import Test, User, Answer, Question, Result, Role
+from app.models import AttemptStatus, Test, Question, Result, ResultDetail, Role
 from app.schemas import (
     TestCreateFull,
     TestReadFull,
+    TestReadShallow,
+    TestReadStudent,
+    TestImportReport,
     TestUpdate,
     QuestionUpdate,
     TestSubmission,
     ResultRead,
+    CurrentUser,
 )
 from app.dependencies.auth import get_current_user, require_admin
+from app.services.tests import build_student_snapshot, create_test_full
+from app.services.statements import full_test_query
+from app.services.variants import drawn_questions, personalize
+from app.services.test_cache import test_cache
+from app.services.attempts import (
+    AttemptState,
+    active_attempt,
+    autosave_buffer,
+    finalize_attempt,
+    result_read,
+    utcnow,
+)
+from app.services.events import event_broker
+from app.services.grading import GradingError, get_answer_key
+from app.services.result_batcher import ResultBatcherBusy, ResultRejected, result_batcher
+from app.services.result_details import detail_row
+from app.services.result_stats import record_scores
+from app.services.transfer import export_tests, import_tests, iter_json_documents
 
 router = APIRouter(prefix="/tests", tags=["Tests"])
 
@@ -27,80 +52,135 @@ router = APIRouter(prefix="/tests", tags=["Tests"])
 async def create_test(
     test_data: TestCreateFull,
     session: AsyncSession = Depends(db_helper.session_getter),
-    current_user: User = Depends(get_current_user),
+    current_user: CurrentUser = Depends(get_current_user),
 ):
     if current_user.role not in [Role.admin, Role.teacher]:
         raise HTTPException(status_code=403, detail="Недостаточно прав")
 
-    new_test = Test(title=test_data.title, author_id=current_user.id)
-    session.add(new_test)
-    await session.commit()
-    await session.refresh(new_test)
-
-    for question_data in test_data.questions:
-        new_question = Question(text=question_data.text, test_id=new_test.id)
-        session.add(new_question)
-        await session.commit()
-        await session.refresh(new_question)
-
-        for answer_data in question_data.answers:
-            answer = Answer(
-                question_id=new_question.id,
-                text=answer_data.text,
-                is_correct=answer_data.is_correct,
-            )
-            session.add(answer)
-
+    # Весь тест пишется одной транзакцией: при ошибке сессия закрывается без коммита
+    test_id = await create_test_full(session, test_data, current_user.id)
     await session.commit()
 
     # Перезапрашиваем тест с вопросами и ответами через eager loading
-    statement = (
-        select(Test)
-        .where(Test.id == new_test.id)
-        .options(
-            selectinload(Test.questions).selectinload(Question.answers)
-        )
-    )
-    result = await session.execute(statement)
+    result = await session.execute(full_test_query(test_id))
     test_with_relations = result.scalars().first()
 
     return test_with_relations
 
 
 # ---------------------------
-# СПИСОК ВСЕХ ТЕСТОВ (с вопросами и ответами)
+# СПИСОК ТЕСТОВ (постранично, по ключу)
 # ---------------------------
-@router.get("/", response_model=List[TestReadFull])
+@router.get("/", response_model=Union[List[TestReadShallow], List[TestReadFull]])
 async def list_tests(
-    session: AsyncSession = Depends(db_helper.session_getter),
-    current_user: User = Depends(get_current_user),
+    response: Response,
+    limit: int = Query(50, ge=1, le=200),
+    after: Optional[UUID] = Query(None, description="id последнего теста предыдущей страницы"),
+    author_id: Optional[UUID] = None,
+    title: Optional[str] = None,
+    shallow: bool = Query(False, description="Без вопросов, только их количество"),
+    session: AsyncSession = Depends(db_helper.read_session_getter),
+    current_user: CurrentUser = Depends(get_current_user),
     _ = Depends(require_admin)
 ):
-    result = await session.execute(select(Test).options(
-        selectinload(Test.questions).selectinload(Question.answers)
-    ))
-    tests = result.scalars().all()
+    if shallow:
+        stmt = (
+            select(
+                Test.id,
+                Test.title,
+                Test.author_id,
+                Test.shuffle_questions,
+                Test.shuffle_answers,
+                Test.draw_count,
+                Test.time_limit_minutes,
+                func.count(Question.id).label("question_count"),
+            )
+            .outerjoin(Question, Question.test_id == Test.id)
+            .group_by(Test.id)
+        )
+    else:
+        stmt = select(Test).options(
+            selectinload(Test.questions).selectinload(Question.answers)
+        )
+
+    if after is not None:
+        stmt = stmt.where(Test.id > after)
+    if author_id is not None:
+        stmt = stmt.where(Test.author_id == author_id)
+    if title:
+        stmt = stmt.where(Test.title.icontains(title, autoescape=True))
+
+    # Берём на одну запись больше, чтобы понять, есть ли следующая страница
+    result = await session.execute(stmt.order_by(Test.id).limit(limit + 1))
+    tests = result.all() if shallow else result.scalars().all()
+
+    if len(tests) > limit:
+        tests = tests[:limit]
+        response.headers["X-Next-Cursor"] = str(tests[-1].id)
     return tests
 
 
+# ---------------------------
+# ИМПОРТ ТЕСТОВ (NDJSON или JSON-массив TestCreateFull)
+# ---------------------------
+@router.post("/import", response_model=TestImportReport)
+async def import_tests_bulk(
+    request: Request,
+    session: AsyncSession = Depends(db_helper.session_getter),
+    current_user: CurrentUser = Depends(get_current_user),
+):
+    if current_user.role not in [Role.admin, Role.teacher]:
+        raise HTTPException(status_code=403, detail="Недостаточно прав")
+
+    return await import_tests(session, iter_json_documents(request.stream()), current_user.id)
+
+
+# ---------------------------
+# ЭКСПОРТ ТЕСТОВ В NDJSON
+# ---------------------------
+@router.get("/export")
+async def export_tests_bulk(current_user: CurrentUser = Depends(get_current_user)):
+    if current_user.role not in [Role.admin, Role.teacher]:
+        raise HTTPException(status_code=403, detail="Недостаточно прав")
+
+    # Администратор выгружает все тесты, преподаватель — только свои
+    author_id = None if current_user.role == Role.admin else current_user.id
+    return StreamingResponse(export_tests(author_id), media_type="application/x-ndjson")
+
+
 # ---------------------------
 # ОДИН ТЕСТ ПО ID (с вопросами)
 # ---------------------------
-@router.get("/{test_id}", response_model=TestReadFull)
+@router.get("/{test_id}", response_model=Union[TestReadFull, TestReadStudent])
 async def get_test(
     test_id: UUID,
-    session: AsyncSession = Depends(db_helper.session_getter),
-    current_user: User = Depends(get_current_user),
+    session: AsyncSession = Depends(db_helper.read_session_getter),
+    current_user: CurrentUser = Depends(get_current_user),
 ):
-    test = await session.execute(select(Test).options(
-        selectinload(Test.questions).selectinload(Question.answers)
-    ).where(Test.id == test_id))
+    # Студент получает тест без правильных ответов, кэшируется отдельно
+    view = "student" if current_user.role == Role.student else "full"
 
-    test = test.scalars().first()
+    data = await test_cache.get(test_id, view)
+    # Версию берём после get(): он сверяет её с общим хранилищем
+    version = test_cache.version(test_id)
+    if data is None:
+        if view == "student":
+            data = await build_student_snapshot(session, test_id)
+        else:
+            test = (await session.execute(full_test_query(test_id))).scalars().first()
+            data = TestReadFull.model_validate(test).model_dump_json().encode() if test else None
 
-    if not test:
-        raise HTTPException(status_code=404, detail="Тест не найден")
-    return test
+        if data is None:
+            raise HTTPException(status_code=404, detail="Тест не найден")
+
+        # Снимок с отстающей реплики может не содержать свежих правок — не кэшируем
+        if not db_helper.replica_lagging(session):
+            await test_cache.set(test_id, data, version, view)
+
+    if view == "student":
+        # Общий снимок переставляется под вариант студента
+        data = personalize(test_id, data, version, current_user.id)
+    return Response(content=data, media_type="application/json")
 
 
 # ---------------------------
@@ -111,7 +191,7 @@ async def update_test(
     test_id: UUID,
     test_data: TestUpdate,
     session: AsyncSession = Depends(db_helper.session_getter),
-    current_user: User = Depends(get_current_user),
+    current_user: CurrentUser = Depends(get_current_user),
 ):
     test = await session.get(Test, test_id)
     if not test:
@@ -123,37 +203,39 @@ async def update_test(
         setattr(test, key, value)
 
     await session.commit()
-    await session.refresh(test)
-    return test
+    await test_cache.invalidate(test_id)
+    # Ответ включает вопросы: ленивую загрузку в async-сессии не вызвать
+    result = await session.execute(full_test_query(test_id), execution_options={"populate_existing": True})
+    return result.scalars().first()
 
 
 # ---------------------------
-# УДАЛЕНИЕ ТЕСТА + каскадное удаление вопросов и ответов
+# УДАЛЕНИЕ ТЕСТА (вопросы и ответы удаляет БД по ON DELETE CASCADE)
 # ---------------------------
 @router.delete("/{test_id}")
 async def delete_test(
     test_id: UUID,
     session: AsyncSession = Depends(db_helper.session_getter),
-    current_user: User = Depends(get_current_user),
+    current_user: CurrentUser = Depends(get_current_user),
 ):
-    test = await session.get(Test, test_id)
-    if not test:
-        raise HTTPException(status_code=404, detail="Тест не найден")
-    if current_user.role != Role.admin and test.author_id != current_user.id:
+    # Проверка прав входит в сам DELETE: в обычном случае это один запрос
+    stmt = delete(Test).where(Test.id == test_id)
+    if current_user.role != Role.admin:
+        stmt = stmt.where(Test.author_id == current_user.id)
+
+    try:
+        deleted = (await session.execute(stmt.returning(Test.id))).first()
+    except IntegrityError:
+        await session.rollback()
+        raise HTTPException(status_code=409, detail="Тест уже сдавали, удалить его нельзя")
+
+    if deleted is None:
+        if await session.scalar(select(Test.id).where(Test.id == test_id)) is None:
+            raise HTTPException(status_code=404, detail="Тест не найден")
         raise HTTPException(status_code=403, detail="Недостаточно прав")
 
-    stmt = select(Question).where(Question.test_id == test.id)
-    result = await session.execute(stmt)
-    questions = result.scalars().all()
-
-    for question in questions:
-        await session.execute(
-            select(Answer).where(Answer.question_id == question.id).delete()
-        )
-        await session.delete(question)
-
-    await session.delete(test)
     await session.commit()
+    await test_cache.invalidate(test_id)
     return {"ok": True}
 
 
@@ -165,7 +247,7 @@ async def update_question(
     question_id: UUID,
     question_data: QuestionUpdate,
     session: AsyncSession = Depends(db_helper.session_getter),
-    current_user: User = Depends(get_current_user),
+    current_user: CurrentUser = Depends(get_current_user),
 ):
     question = await session.get(Question, question_id)
     if not question:
@@ -179,30 +261,37 @@ async def update_question(
         setattr(question, key, value)
 
     await session.commit()
+    await test_cache.invalidate(question.test_id)
     await session.refresh(question)
     return question
 
 
 # ---------------------------
-# УДАЛЕНИЕ ВОПРОСА + его ответов
+# УДАЛЕНИЕ ВОПРОСА (ответы удаляет БД по ON DELETE CASCADE)
 # ---------------------------
 @router.delete("/questions/{question_id}")
 async def delete_question(
     question_id: UUID,
     session: AsyncSession = Depends(db_helper.session_getter),
-    current_user: User = Depends(get_current_user),
+    current_user: CurrentUser = Depends(get_current_user),
 ):
-    question = await session.get(Question, question_id)
-    if not question:
-        raise HTTPException(status_code=404, detail="Вопрос не найден")
+    if current_user.role not in [Role.admin, Role.teacher]:
+        raise HTTPException(status_code=403, detail="Недостаточно прав")
 
-    test = await session.get(Test, question.test_id)
-    if current_user.role not in [Role.admin, Role.teacher] or test.author_id != current_user.id:
+    own_tests = select(Test.id).where(Test.author_id == current_user.id)
+    deleted_test_id = await session.scalar(
+        delete(Question)
+        .where(Question.id == question_id, Question.test_id.in_(own_tests))
+        .returning(Question.test_id)
+    )
+
+    if deleted_test_id is None:
+        if await session.scalar(select(Question.id).where(Question.id == question_id)) is None:
+            raise HTTPException(status_code=404, detail="Вопрос не найден")
         raise HTTPException(status_code=403, detail="Недостаточно прав")
 
-    await session.execute(select(Answer).where(Answer.question_id == question.id).delete())
-    await session.delete(question)
     await session.commit()
+    await test_cache.invalidate(deleted_test_id)
     return {"ok": True}
 
 
@@ -214,55 +303,87 @@ async def submit_test(
     test_id: UUID,
     submission: TestSubmission,
     session: AsyncSession = Depends(db_helper.session_getter),
-    current_user: User = Depends(get_current_user),
+    current_user: CurrentUser = Depends(get_current_user),
 ):
     # if current_user.role != Role.student:
         # raise HTTPException(status_code=403, detail="Только студент может сдавать тест")
 
-    test = await session.get(Test, test_id)
-    if not test:
+    answer_key = await get_answer_key(session, test_id)
+    if answer_key is None:
         raise HTTPException(status_code=404, detail="Тест не найден")
 
-    question_ids = [item.question_id for item in submission.answers]
-    answer_ids = [item.answer_id for item in submission.answers]
-
-    question_stmt = select(Question).where(Question.id.in_(question_ids))
-    question_result = await session.execute(question_stmt)
-    questions = question_result.scalars().all()
-
-    answer_stmt = select(Answer).where(Answer.id.in_(answer_ids))
-    answer_result = await session.execute(answer_stmt)
-    answers = answer_result.scalars().all()
-
-    valid_answer_map = {answer.id: answer for answer in answers}
-    correct_count = 0
-
-    for question in questions:
-        answer_id = next((item.answer_id for item in submission.answers if item.question_id == question.id), None)
-        if answer_id not in valid_answer_map:
-            raise HTTPException(status_code=400, detail="Ответ не найден")
-        answer = valid_answer_map[answer_id]
-        if answer.question_id != question.id:
-            raise HTTPException(status_code=400, detail="Ответ не соответствует вопросу")
-        if answer.is_correct:
-            correct_count += 1
+    # Вариант выводится из id студента и теста, ничего не запрашивая
+    drawn = drawn_questions(current_user.id, test_id, len(answer_key.questions), answer_key.draw_count)
+    if answer_key.time_limit_minutes:
+        # Срок считает сервер от начала попытки, без неё ограничение не проверить.
+        # Оценку подведёт finalize_attempt, здесь ответы только проверяются, как при автосохранении
+        try:
+            for item in submission.answers:
+                answer_key.locate(item.question_id, item.answer_id, drawn)
+        except GradingError as exc:
+            raise HTTPException(status_code=400, detail=str(exc))
+        return await submit_timed_test(session, test_id, current_user.id, submission)
+
+    try:
+        graded = answer_key.grade(submission.answers, drawn)
+    except GradingError as exc:
+        raise HTTPException(status_code=400, detail=str(exc))
 
     result = Result(
         student_id=current_user.id,
         test_id=test_id,
-        score=correct_count,
-    )
-    session.add(result)
-    await session.commit()
-    await session.refresh(result)
-
-    result_read = ResultRead(
-        id=result.id,
-        student_id=result.student_id,
-        test_id=result.test_id,
-        score=result.score,
-        test_title=None
+        score=graded.score,
     )
+    detail = detail_row(result.id, test_id, answer_key, graded)
+    if result_batcher.enabled:
+        # Оценка уже посчитана, запись уходит в общую пачку
+        try:
+            await result_batcher.submit(result.model_dump(), detail)
+        except ResultBatcherBusy:
+            raise HTTPException(status_code=503, detail="Сервер перегружен, повторите попытку позже")
+        except ResultRejected:
+            raise HTTPException(status_code=409, detail="Результат не сохранён: тест изменили или удалили")
+        except SQLAlchemyError:
+            raise HTTPException(status_code=503, detail="Не удалось сохранить результат, повторите попытку позже")
+    else:
+        session.add(result)
+        session.add(ResultDetail(**detail))
+        await record_scores(session, [(test_id, result.score)])
+        await session.commit()
+
+    event_broker.publish(test_id, "result_submitted", {
+        "result_id": result.id,
+        "student_id": result.student_id,
+        "score": result.score,
+        "created_at": result.created_at,
+    })
+    return result_read(result)
+
+
+async def submit_timed_test(
+    session: AsyncSession,
+    test_id: UUID,
+    student_id: UUID,
+    submission: TestSubmission,
+) -> ResultRead:
+    """Сдача теста с ограничением времени: итог подводит незавершённая попытка студента"""
+    attempt = await active_attempt(session, test_id, student_id)
+    if attempt is None:
+        raise HTTPException(
+            status_code=409,
+            detail="Тест ограничен по времени: начните попытку через POST /attempts/",
+        )
 
-    return result_read
+    # Как и POST /attempts/{id}/submit: сданная позже дедлайна попытка засчитывается как просроченная
+    overdue = AttemptState.from_attempt(attempt).overdue(utcnow(), autosave_buffer.deadline_grace)
+    finalized = await finalize_attempt(
+        session,
+        attempt.id,
+        AttemptStatus.expired if overdue else AttemptStatus.submitted,
+        answers={item.question_id: item.answer_id for item in submission.answers},
+    )
+    if finalized is None:
+        raise HTTPException(status_code=409, detail="Попытка уже завершена")
 
+    _, result = finalized
+    return result_read(result)
@@ -1,8 +1,9 @@
 from typing import Optional, List
 from uuid import UUID
 from enum import Enum
-from sqlmodel import SQLModel
-from pydantic import EmailStr, BaseModel, field_validator
+from datetime import datetime
+from sqlmodel import SQLModel, Field
+from pydantic import EmailStr, BaseModel, ConfigDict, field_validator
 
 
 # -------------------------
@@ -15,6 +16,12 @@ class Role(str, Enum):
     student = "student"
 
 
+class AttemptStatus(str, Enum):
+    in_progress = "in_progress"
+    submitted = "submitted"
+    expired = "expired"
+
+
 # -------------------------
 # USER
 # -------------------------
@@ -51,12 +58,30 @@ class UserRead(UserBase):
     id: UUID
 
 
+class CurrentUser(BaseModel):
+    """Облегчённое представление авторизованного пользователя, хранится в кэше токенов"""
+    model_config = ConfigDict(frozen=True, from_attributes=True)
+
+    id: UUID
+    username: str
+    email: str
+    first_name: str
+    middle_name: Optional[str] = None
+    last_name: str
+    role: Role
+
+
 # -------------------------
 # TEST
 # -------------------------
 
 class TestBase(SQLModel):
     title: str
+    shuffle_questions: bool = False
+    shuffle_answers: bool = False
+    draw_count: Optional[int] = Field(default=None, ge=1)
+    # Ограничение времени на попытку; None — без ограничения
+    time_limit_minutes: Optional[int] = Field(default=None, ge=1)
 
 
 class TestCreate(TestBase):
@@ -70,12 +95,20 @@ class TestRead(TestBase):
 
 class TestUpdate(SQLModel):
     title: Optional[str] = None
+    shuffle_questions: Optional[bool] = None
+    shuffle_answers: Optional[bool] = None
+    draw_count: Optional[int] = Field(default=None, ge=1)
+    time_limit_minutes: Optional[int] = Field(default=None, ge=1)
 
 
 class TestReadFull(TestRead):
     questions: List["QuestionRead"]
 
 
+class TestReadShallow(TestRead):
+    question_count: int
+
+
 # -------------------------
 # QUESTION
 # -------------------------
@@ -116,6 +149,33 @@ class AnswerRead(AnswerBase):
     id: UUID
 
 
+# -------------------------
+# ТЕСТ ДЛЯ СТУДЕНТА (без правильных ответов)
+# -------------------------
+
+class AnswerReadStudent(BaseModel):
+    id: UUID
+    text: str
+
+
+class QuestionReadStudent(BaseModel):
+    id: UUID
+    text: str
+    answers: List[AnswerReadStudent]
+
+
+class TestReadStudent(BaseModel):
+    id: UUID
+    title: str
+    # Вопросы и ответы идут в порядке варианта студента
+    shuffle_questions: bool = False
+    shuffle_answers: bool = False
+    draw_count: Optional[int] = None
+    # С ограничением времени тест сдаётся в рамках попытки (POST /attempts/)
+    time_limit_minutes: Optional[int] = None
+    questions: List[QuestionReadStudent]
+
+
 # -------------------------
 # RESULT
 # -------------------------
@@ -136,6 +196,43 @@ class ResultRead(BaseModel):
     student_id: UUID
     score: int
     test_title: str | None
+    created_at: datetime | None = None
+
+
+class ItemStats(BaseModel):
+    question_id: UUID
+    answered: int
+    correct: int
+    choice_counts: List[int]
+
+
+class ScoreBucket(BaseModel):
+    score: int
+    count: int
+
+
+class StudentScoreStats(BaseModel):
+    student_id: UUID
+    count: int
+    mean: float
+    median: float
+    min: int
+    max: int
+
+
+class TestScoreStats(BaseModel):
+    test_id: UUID
+    test_title: str
+    count: int
+    mean: float
+    min: int
+    max: int
+    median: int
+    p25: int
+    p75: int
+    p90: int
+    histogram: List[ScoreBucket]
+    students: Optional[List[StudentScoreStats]] = None
 
 
 # -------------------------
@@ -150,6 +247,34 @@ class TestSubmission(BaseModel):
     answers: List[AnswerSubmission]
 
 
+# -------------------------
+# ПОПЫТКА
+# -------------------------
+
+class AttemptStart(BaseModel):
+    test_id: UUID
+
+
+class AttemptRead(BaseModel):
+    id: UUID
+    test_id: UUID
+    student_id: UUID
+    status: AttemptStatus
+    started_at: datetime
+    deadline: Optional[datetime] = None
+    finished_at: Optional[datetime] = None
+    result_id: Optional[UUID] = None
+    # Оставшееся время клиент считает от часов сервера, а не от своих
+    server_time: datetime
+    answers: List[AnswerSubmission] = []
+
+
+class AutosaveAck(BaseModel):
+    saved: int
+    deadline: Optional[datetime] = None
+    server_time: datetime
+
+
 # -------------------------
 # СОЗДАНИЕ ТЕСТА С ВОПРОСАМИ И ОТВЕТАМИ
 # -------------------------
@@ -166,5 +291,23 @@ class QuestionNestedCreate(BaseModel):
 
 class TestCreateFull(SQLModel):
     title: str
+    shuffle_questions: bool = False
+    shuffle_answers: bool = False
+    draw_count: Optional[int] = Field(default=None, ge=1)
+    time_limit_minutes: Optional[int] = Field(default=None, ge=1)
     questions: List[QuestionNestedCreate]
 
+
+# -------------------------
+# ИМПОРТ ТЕСТОВ
+# -------------------------
+
+class TestImportError(BaseModel):
+    index: int
+    detail: str
+
+
+class TestImportReport(BaseModel):
+    imported: int = 0
+    test_ids: List[UUID] = []
+    errors: List[TestImportError] = []
@@ -3,7 +3,7 @@ import uuid
 
 from app.database import db_helper
 from app.models import Role, User
-from app.services.auth import hash_password
+from app.services.passwords import hash_password
 from app.utils import generate_username
 
 
@@ -0,0 +1,537 @@
+import asyncio
+import contextvars
+import logging
+import time
+from collections import OrderedDict
+from dataclasses import dataclass, replace
+from datetime import datetime, timedelta, timezone
+from typing import Optional
+from uuid import UUID
+
+from sqlalchemy import select
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.config import settings
+from app.database import db_helper, dialect_insert
+from app.models import Attempt, AttemptAnswer, AttemptStatus, Result, ResultDetail, Test
+from app.schemas import AnswerSubmission, ResultRead
+from app.services.events import event_broker
+from app.services.grading import GradingError, get_answer_key
+from app.services.result_details import detail_row
+from app.services.result_stats import record_scores
+from app.services.tests import INSERT_CHUNK_SIZE
+from app.services.variants import drawn_questions
+
+logger = logging.getLogger(__name__)
+
+
+def utcnow() -> datetime:
+    return datetime.now(timezone.utc)
+
+
+def as_utc(value: Optional[datetime]) -> Optional[datetime]:
+    # SQLite отдаёт время без пояса, в Postgres колонки timestamptz
+    if value is not None and value.tzinfo is None:
+        return value.replace(tzinfo=timezone.utc)
+    return value
+
+
+@dataclass(frozen=True, slots=True)
+class AttemptState:
+    """То, что нужно автосохранению: владелец, тест, статус и дедлайн"""
+
+    id: UUID
+    student_id: UUID
+    test_id: UUID
+    status: AttemptStatus
+    deadline: Optional[datetime]
+
+    @classmethod
+    def from_attempt(cls, attempt: Attempt) -> "AttemptState":
+        return cls(
+            id=attempt.id,
+            student_id=attempt.student_id,
+            test_id=attempt.test_id,
+            status=attempt.status,
+            deadline=as_utc(attempt.deadline),
+        )
+
+    def overdue(self, now: datetime, grace: timedelta) -> bool:
+        return self.deadline is not None and now > self.deadline + grace
+
+
+class AttemptCache:
+    """LRU состояний попыток, чтобы автосохранение не ходило в БД.
+
+    Владелец, тест и дедлайн попытки не меняются. Статус обновляется
+    при завершении в этом процессе; попытку, завершённую другим
+    воркером, этот ещё может считать открытой. Поэтому при нескольких
+    воркерах статус перепроверяется по БД при каждой записи ответов
+    (AutosaveBuffer.write), и кэш обновляется оттуда же.
+    """
+
+    def __init__(self, max_size: int = 10_000) -> None:
+        self.max_size = max_size
+        self._entries: OrderedDict[UUID, AttemptState] = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, attempt_id: UUID) -> Optional[AttemptState]:
+        state = self._entries.get(attempt_id)
+        if state is None:
+            self.misses += 1
+            return None
+        self._entries.move_to_end(attempt_id)
+        self.hits += 1
+        return state
+
+    def set(self, state: AttemptState) -> None:
+        self._entries[state.id] = state
+        self._entries.move_to_end(state.id)
+        while len(self._entries) > self.max_size:
+            self._entries.popitem(last=False)
+
+    def stats(self) -> dict:
+        return {
+            "size": len(self._entries),
+            "hits": self.hits,
+            "misses": self.misses,
+        }
+
+
+attempt_cache = AttemptCache(max_size=settings.attempts.cache_size)
+
+
+class AutosaveBusy(Exception):
+    """Буфер автосохранения переполнен"""
+
+
+class AttemptFinished(Exception):
+    """Попытку, начатую параллельным запросом, уже успели завершить"""
+
+
+class AutosaveBuffer:
+    """Копит автосохранённые ответы и пишет их в attempt_answer пачками.
+
+    Повторное сохранение того же вопроса до сброса заменяет ответ
+    в памяти, в БД уходит только последний. Раз в ``flush_interval``
+    все накопленные ответы пишутся одним многострочным upsert'ом, так
+    что нагрузка на запись размазана по всему экзамену. Клиент не ждёт
+    записи: при падении процесса теряется не больше одного интервала.
+
+    Буфер виден только своему процессу, поэтому ``buffered`` включают
+    лишь при одном воркере. Иначе ответы пишутся сразу методом write:
+    сдача на любом воркере видит всё, что клиенту подтвердили.
+
+    Та же фоновая задача раз в ``sweep_interval`` завершает попытки,
+    у которых вышло время, даже если студент так и не нажал «сдать».
+    """
+
+    def __init__(
+        self,
+        flush_interval: float = 2.0,
+        max_pending: int = 100_000,
+        deadline_grace: float = 10.0,
+        sweep_interval: float = 30.0,
+        buffered: bool = True,
+    ) -> None:
+        self.buffered = buffered
+        self.flush_interval = flush_interval
+        self.max_pending = max_pending
+        self.deadline_grace = timedelta(seconds=deadline_grace)
+        self.sweep_interval = sweep_interval
+        # attempt_id -> question_id -> (answer_id, время сохранения)
+        self._pending: dict[UUID, dict[UUID, tuple[UUID, datetime]]] = {}
+        # Пачка, которая пишется прямо сейчас: её ещё нет в БД, но уже нет в _pending
+        self._flushing: dict[UUID, dict[UUID, tuple[UUID, datetime]]] = {}
+        self._size = 0
+        self._task: Optional[asyncio.Task] = None
+        self._wakeup: Optional[asyncio.Event] = None
+        self._stopping = False
+        self.saved = 0
+        self.coalesced = 0
+        self.flushes = 0
+        self.rows = 0
+        self.dropped = 0
+        self.failed_flushes = 0
+        self.rejected = 0
+        self.expired = 0
+        self.total_flush = 0.0
+
+    def start(self) -> None:
+        if self._task is None or self._task.done():
+            self._stopping = False
+            self._wakeup = asyncio.Event()
+            # Пустой контекст: иначе задача унаследует счётчики запросов первого HTTP-запроса
+            self._task = asyncio.create_task(self._run(), name="attempt-autosave", context=contextvars.Context())
+
+    def save(self, attempt_id: UUID, answers: list[tuple[UUID, UUID]]) -> None:
+        """Запоминает ответы (question_id, answer_id) попытки до следующего сброса"""
+        self.start()
+        pending = self._pending.get(attempt_id, {})
+        added = len({question_id for question_id, _ in answers if question_id not in pending})
+        if self._size + added > self.max_pending:
+            self.rejected += 1
+            raise AutosaveBusy()
+
+        self._pending[attempt_id] = pending
+        now = utcnow()
+        for question_id, answer_id in answers:
+            if question_id in pending:
+                self.coalesced += 1
+            pending[question_id] = (answer_id, now)
+        self._size += added
+        self.saved += len(answers)
+
+    async def write(
+        self,
+        session: AsyncSession,
+        state: AttemptState,
+        answers: list[tuple[UUID, UUID]],
+    ) -> Optional[AttemptStatus]:
+        """Пишет ответы в attempt_answer сразу; возвращает статус попытки в БД.
+
+        Строка попытки блокируется на чтение (FOR SHARE): завершение на
+        другом воркере (FOR UPDATE) ждёт записи и видит эти ответы, а
+        запись после завершения получает итоговый статус и ничего не
+        пишет. None — попытки больше нет.
+        """
+        self.start()
+        status = (
+            await session.execute(
+                select(Attempt.status).where(Attempt.id == state.id).with_for_update(read=True)
+            )
+        ).scalar_one_or_none()
+        if status != AttemptStatus.in_progress:
+            await session.rollback()
+            if status is not None:
+                attempt_cache.set(replace(state, status=status))
+            return status
+
+        now = utcnow()
+        rows = await self._upsert(session, {state.id: {question_id: (answer_id, now) for question_id, answer_id in answers}})
+        await session.commit()
+        self.saved += len(answers)
+        self.rows += rows
+        return status
+
+    def peek(self, attempt_id: UUID) -> dict[UUID, UUID]:
+        """Ответы попытки, ещё не записанные в БД"""
+        answers = {question_id: answer_id for question_id, (answer_id, _) in self._flushing.get(attempt_id, {}).items()}
+        answers.update(
+            (question_id, answer_id) for question_id, (answer_id, _) in self._pending.get(attempt_id, {}).items()
+        )
+        return answers
+
+    def discard(self, attempt_id: UUID) -> None:
+        pending = self._pending.pop(attempt_id, None)
+        if pending:
+            self._size -= len(pending)
+
+    async def stop(self) -> None:
+        """Останавливает фоновую задачу и дописывает всё, что накопилось"""
+        if self._task is not None:
+            assert self._wakeup is not None
+            self._stopping = True
+            self._wakeup.set()
+            await self._task
+            self._task = None
+        await self.flush()
+
+    async def _run(self) -> None:
+        assert self._wakeup is not None
+        loop = asyncio.get_running_loop()
+        next_sweep = loop.time() + self.sweep_interval
+        while not self._stopping:
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), self.flush_interval)
+            except asyncio.TimeoutError:
+                pass
+            await self.flush()
+            if loop.time() >= next_sweep and not self._stopping:
+                next_sweep = loop.time() + self.sweep_interval
+                try:
+                    self.expired += await expire_overdue(
+                        # Ответы, принятые в последний момент другими воркерами, успевают дойти до БД
+                        self.deadline_grace + timedelta(seconds=2 * self.flush_interval)
+                    )
+                except Exception:
+                    logger.exception("Не удалось завершить просроченные попытки")
+
+    async def flush(self) -> None:
+        if not self._pending:
+            return
+        batch, self._pending, self._size = self._pending, {}, 0
+        self._flushing = batch
+        started_at = time.perf_counter()
+        rows = 0
+        try:
+            async with db_helper.session_factory() as session:
+                try:
+                    rows = await self._upsert(session, batch)
+                    await session.commit()
+                except IntegrityError:
+                    # Попытку или вопрос удалили вместе с тестом: пишем по попыткам, пропуская такие
+                    await session.rollback()
+                    rows = 0
+                    for attempt_id in sorted(batch):
+                        try:
+                            rows += await self._upsert(session, {attempt_id: batch[attempt_id]})
+                            await session.commit()
+                        except IntegrityError:
+                            await session.rollback()
+                            self.dropped += len(batch[attempt_id])
+                            logger.warning("Ответы попытки %s отброшены: попытки или вопросов больше нет", attempt_id)
+        except Exception:
+            self.failed_flushes += 1
+            logger.exception("Не удалось сохранить ответы попыток (%d попыток)", len(batch))
+            # Возвращаем в буфер всё, что не успели перезаписать новыми сохранениями
+            for attempt_id, answers in batch.items():
+                pending = self._pending.setdefault(attempt_id, {})
+                for question_id, value in answers.items():
+                    if question_id not in pending:
+                        pending[question_id] = value
+                        self._size += 1
+            return
+        finally:
+            self._flushing = {}
+
+        self.flushes += 1
+        self.rows += rows
+        self.total_flush += time.perf_counter() - started_at
+
+    @staticmethod
+    async def _upsert(session: AsyncSession, batch: dict[UUID, dict[UUID, tuple[UUID, datetime]]]) -> int:
+        # Строки в порядке ключа: параллельные сбросы блокируют их в одном порядке
+        rows = [
+            {"attempt_id": attempt_id, "question_id": question_id, "answer_id": answer_id, "updated_at": saved_at}
+            for attempt_id in sorted(batch)
+            for question_id, (answer_id, saved_at) in sorted(batch[attempt_id].items())
+        ]
+        insert = dialect_insert(session)
+        for start in range(0, len(rows), INSERT_CHUNK_SIZE):
+            stmt = insert(AttemptAnswer).values(rows[start:start + INSERT_CHUNK_SIZE])
+            stmt = stmt.on_conflict_do_update(
+                index_elements=[AttemptAnswer.attempt_id, AttemptAnswer.question_id],
+                set_={"answer_id": stmt.excluded.answer_id, "updated_at": stmt.excluded.updated_at},
+                # Запоздавшая запись (повтор после сбоя, другой воркер) не затирает более новый ответ
+                where=AttemptAnswer.updated_at <= stmt.excluded.updated_at,
+            )
+            await session.execute(stmt)
+        return len(rows)
+
+    def stats(self) -> dict:
+        return {
+            "buffered": self.buffered,
+            "pending_attempts": len(self._pending),
+            "pending_answers": self._size,
+            "saved": self.saved,
+            "coalesced": self.coalesced,
+            "flushes": self.flushes,
+            "rows": self.rows,
+            "dropped": self.dropped,
+            "failed_flushes": self.failed_flushes,
+            "rejected": self.rejected,
+            "expired": self.expired,
+            "avg_flush_ms": self.total_flush / self.flushes * 1000 if self.flushes else 0.0,
+            "cache": attempt_cache.stats(),
+        }
+
+
+autosave_buffer = AutosaveBuffer(
+    flush_interval=settings.attempts.autosave_flush_interval.total_seconds(),
+    max_pending=settings.attempts.autosave_max_pending,
+    deadline_grace=settings.attempts.deadline_grace.total_seconds(),
+    sweep_interval=settings.attempts.sweep_interval.total_seconds(),
+    buffered=(
+        settings.run.workers == 1
+        if settings.attempts.autosave_buffered is None
+        else settings.attempts.autosave_buffered
+    ),
+)
+
+
+async def load_attempt_state(session: AsyncSession, attempt_id: UUID) -> Optional[AttemptState]:
+    state = attempt_cache.get(attempt_id)
+    if state is not None:
+        return state
+    attempt = await session.get(Attempt, attempt_id)
+    if attempt is None:
+        return None
+    state = AttemptState.from_attempt(attempt)
+    attempt_cache.set(state)
+    return state
+
+
+async def load_answers(session: AsyncSession, attempt_id: UUID) -> dict[UUID, UUID]:
+    """Сохранённые ответы попытки: записанные в БД и ещё не сброшенные"""
+    rows = await session.execute(
+        select(AttemptAnswer.question_id, AttemptAnswer.answer_id).where(AttemptAnswer.attempt_id == attempt_id)
+    )
+    answers = {question_id: answer_id for question_id, answer_id in rows}
+    answers.update(autosave_buffer.peek(attempt_id))
+    return answers
+
+
+async def start_attempt(session: AsyncSession, test_id: UUID, student_id: UUID) -> Optional[Attempt]:
+    """Незавершённая попытка студента или новая; None — теста нет.
+
+    Попытка, у которой вышло время, сначала завершается, и тогда
+    начинается новая. AttemptFinished — попытку создал параллельный
+    запрос, и она уже завершена.
+    """
+    attempt = await active_attempt(session, test_id, student_id)
+    if attempt is not None and AttemptState.from_attempt(attempt).overdue(utcnow(), autosave_buffer.deadline_grace):
+        await finalize_attempt(session, attempt.id, AttemptStatus.expired)
+        attempt = None
+    if attempt is not None:
+        attempt_cache.set(AttemptState.from_attempt(attempt))
+        return attempt
+
+    time_limit = (await session.execute(select(Test.time_limit_minutes).where(Test.id == test_id))).first()
+    if time_limit is None:
+        return None
+
+    now = utcnow()
+    attempt = Attempt(
+        student_id=student_id,
+        test_id=test_id,
+        started_at=now,
+        deadline=now + timedelta(minutes=time_limit[0]) if time_limit[0] else None,
+    )
+    session.add(attempt)
+    try:
+        await session.commit()
+    except IntegrityError:
+        # Параллельный старт той же попытки (двойной клик): берём уже созданную,
+        # о её начале сообщил запрос, который её создал
+        await session.rollback()
+        attempt = await active_attempt(session, test_id, student_id)
+        if attempt is None:
+            # Либо тест удалили между проверкой и вставкой, либо попытку уже сдали
+            if await session.scalar(select(Test.id).where(Test.id == test_id)) is None:
+                return None
+            raise AttemptFinished()
+        attempt_cache.set(AttemptState.from_attempt(attempt))
+        return attempt
+
+    autosave_buffer.start()
+    attempt_cache.set(AttemptState.from_attempt(attempt))
+    event_broker.publish(test_id, "attempt_started", {
+        "attempt_id": attempt.id,
+        "student_id": attempt.student_id,
+        "started_at": attempt.started_at,
+        "deadline": attempt.deadline,
+    })
+    return attempt
+
+
+async def active_attempt(session: AsyncSession, test_id: UUID, student_id: UUID) -> Optional[Attempt]:
+    result = await session.execute(
+        select(Attempt).where(
+            Attempt.student_id == student_id,
+            Attempt.test_id == test_id,
+            Attempt.status == AttemptStatus.in_progress,
+        )
+    )
+    return result.scalars().first()
+
+
+async def finalize_attempt(
+    session: AsyncSession,
+    attempt_id: UUID,
+    status: AttemptStatus = AttemptStatus.submitted,
+    answers: Optional[dict[UUID, UUID]] = None,
+) -> Optional[tuple[Attempt, Result]]:
+    """Подводит итог попытки и пишет Result в одной транзакции.
+
+    Ответы берутся из attempt_answer и из буфера автосохранения;
+    ``answers`` (question_id -> answer_id), присланные при сдаче,
+    заменяют сохранённые ответы на те же вопросы.
+    Строка попытки блокируется (FOR UPDATE), поэтому два воркера не
+    завершат её дважды. None — попытки нет или она уже завершена.
+    """
+    result = await session.execute(
+        select(Attempt).where(Attempt.id == attempt_id).with_for_update(),
+        execution_options={"populate_existing": True},
+    )
+    attempt = result.scalars().first()
+    if attempt is None or attempt.status != AttemptStatus.in_progress:
+        await session.rollback()
+        return None
+
+    answer_key = await get_answer_key(session, attempt.test_id)
+    if answer_key is None:
+        await session.rollback()
+        return None
+
+    drawn = drawn_questions(attempt.student_id, attempt.test_id, len(answer_key.questions), answer_key.draw_count)
+    saved = await load_answers(session, attempt_id)
+    saved.update(answers or {})
+    submitted = []
+    for question_id, answer_id in saved.items():
+        # Тест могли изменить во время попытки: ответы на удалённые вопросы не засчитываются
+        try:
+            answer_key.locate(question_id, answer_id, drawn)
+        except GradingError:
+            continue
+        submitted.append(AnswerSubmission(question_id=question_id, answer_id=answer_id))
+    graded = answer_key.grade(submitted, drawn)
+
+    result = Result(student_id=attempt.student_id, test_id=attempt.test_id, score=graded.score)
+    session.add(result)
+    session.add(ResultDetail(**detail_row(result.id, attempt.test_id, answer_key, graded)))
+    await record_scores(session, [(attempt.test_id, result.score)])
+    # Без relationship порядок INSERT result и UPDATE attempt не гарантирован
+    await session.flush()
+    attempt.status = status
+    attempt.finished_at = utcnow()
+    attempt.result_id = result.id
+    await session.commit()
+
+    autosave_buffer.discard(attempt_id)
+    attempt_cache.set(AttemptState.from_attempt(attempt))
+    event_broker.publish(attempt.test_id, "attempt_finished", {
+        "attempt_id": attempt.id,
+        "student_id": attempt.student_id,
+        "status": attempt.status,
+        "result_id": result.id,
+        "score": result.score,
+        "finished_at": attempt.finished_at,
+    })
+    return attempt, result
+
+
+def result_read(result: Result) -> ResultRead:
+    """Ответ на сдачу теста: одинаковый для сдачи попытки и POST /tests/{id}/submit"""
+    return ResultRead(
+        id=result.id,
+        student_id=result.student_id,
+        test_id=result.test_id,
+        score=result.score,
+        test_title=None,
+        created_at=result.created_at,
+    )
+
+
+async def expire_overdue(delay: timedelta, limit: int = 100) -> int:
+    """Завершает попытки, дедлайн которых прошёл больше ``delay`` назад"""
+    expired = 0
+    while True:
+        finalized = 0
+        async with db_helper.session_factory() as session:
+            attempt_ids = (
+                await session.execute(
+                    select(Attempt.id)
+                    .where(Attempt.status == AttemptStatus.in_progress, Attempt.deadline < utcnow() - delay)
+                    .order_by(Attempt.deadline)
+                    .limit(limit)
+                )
+            ).scalars().all()
+            for attempt_id in attempt_ids:
+                if await finalize_attempt(session, attempt_id, AttemptStatus.expired) is not None:
+                    finalized += 1
+        expired += finalized
+        if len(attempt_ids) < limit or not finalized:
+            return expired
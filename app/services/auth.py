@@ -1,29 +1,35 @@
 from typing import Optional
 
 from datetime import datetime, timezone
-from passlib.context import CryptContext
 from sqlmodel.ext.asyncio.session import AsyncSession
 from sqlalchemy import select
 
 from app.models import User, Token
 from app.config import settings
+from app.services.passwords import password_hasher
+from app.services.statements import token_user_query
 
-pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
 
+async def resolve_token(session: AsyncSession, token_id: str) -> Optional[tuple[User, Optional[datetime]]]:
+    """Находит владельца действующего токена одним запросом.
 
-def hash_password(password: str) -> str:
-    return pwd_context.hash(password)
-
-
-def verify_password(plain: str, hashed: str) -> bool:
-    return pwd_context.verify(plain, hashed)
+    Просроченные токены отсекаются на стороне БД. Возвращает пользователя
+    и срок действия токена либо None.
+    """
+    result = await session.execute(token_user_query(token_id))
+    row = result.one_or_none()
+    if row is None:
+        return None
+    return row[0], row[1]
 
 
 async def authenticate_user(session: AsyncSession, username: str, password: str) -> Optional[User]:
     stmt = select(User).where(User.username == username)
     result = await session.execute(stmt)
     user = result.scalar_one_or_none()
-    if user and verify_password(password, user.password_hash):
+    # Отпускаем соединение на время bcrypt, чтобы не держать его в пуле
+    await session.commit()
+    if user and await password_hasher.verify(password, user.password_hash):
         return user
     return None
 
@@ -0,0 +1,329 @@
+import json
+import logging
+import re
+import time
+from bisect import bisect_left
+from collections import Counter
+from contextlib import contextmanager
+from contextvars import ContextVar
+from dataclasses import dataclass, field
+from functools import lru_cache
+from typing import Iterator, Optional
+
+from sqlalchemy import event
+from sqlalchemy.exc import TimeoutError as PoolTimeoutError
+from sqlalchemy.ext.asyncio import AsyncEngine
+from sqlalchemy.pool import AsyncAdaptedQueuePool
+
+logger = logging.getLogger(__name__)
+
+# Границы корзин гистограмм в миллисекундах, последняя корзина — всё, что больше
+BUCKETS_MS = (1, 2, 5, 10, 25, 50, 100, 250, 500, 1_000, 2_500, 5_000, 10_000)
+
+
+class Histogram:
+    """Гистограмма с фиксированными корзинами, значения в миллисекундах"""
+
+    def __init__(self, buckets: tuple[float, ...] = BUCKETS_MS) -> None:
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.count = 0
+        self.sum = 0.0
+        self.max = 0.0
+
+    def observe(self, value: float) -> None:
+        self.counts[bisect_left(self.buckets, value)] += 1
+        self.count += 1
+        self.sum += value
+        if value > self.max:
+            self.max = value
+
+    def quantile(self, q: float) -> Optional[float]:
+        """Верхняя граница корзины, в которую попадает квантиль"""
+        if not self.count:
+            return None
+        rank = q * self.count
+        seen = 0
+        for index, count in enumerate(self.counts):
+            seen += count
+            if seen >= rank:
+                return min(self.buckets[index], self.max) if index < len(self.buckets) else self.max
+        return self.max
+
+    def stats(self) -> dict:
+        return {
+            "count": self.count,
+            "avg": self.sum / self.count if self.count else 0.0,
+            "max": self.max,
+            "p50": self.quantile(0.50),
+            "p95": self.quantile(0.95),
+            "p99": self.quantile(0.99),
+            "buckets": {
+                f"le_{bound}" if index < len(self.buckets) else "inf": count
+                for index, (bound, count) in enumerate(zip((*self.buckets, None), self.counts))
+            },
+        }
+
+
+class PoolMetrics:
+    """Насыщение пула: ожидание выдачи соединения, таймауты, возраст соединений"""
+
+    def __init__(self) -> None:
+        self.wait = Histogram()
+        self.age_at_checkout = Histogram(buckets=(1_000, 10_000, 60_000, 300_000, 1_800_000, 3_600_000))
+        self.timeouts = 0
+        self.connects = 0
+        self.closes = 0
+        self._connected_at: dict[int, float] = {}
+
+    def on_connect(self, dbapi_connection, connection_record) -> None:
+        self.connects += 1
+        connection_record.info["connected_at"] = time.monotonic()
+        self._connected_at[id(connection_record)] = connection_record.info["connected_at"]
+
+    def on_checkout(self, dbapi_connection, connection_record, connection_proxy) -> None:
+        connected_at = connection_record.info.get("connected_at")
+        if connected_at is not None:
+            self.age_at_checkout.observe((time.monotonic() - connected_at) * 1000)
+
+    def on_close(self, dbapi_connection, connection_record) -> None:
+        self.closes += 1
+        self._connected_at.pop(id(connection_record), None)
+
+    def attach(self, engine: AsyncEngine) -> None:
+        pool = engine.sync_engine.pool
+        if isinstance(pool, InstrumentedAsyncPool):
+            pool.metrics = self
+        # Слушатели пула переживают его пересоздание при engine.dispose()
+        event.listen(engine.sync_engine, "connect", self.on_connect)
+        event.listen(engine.sync_engine, "checkout", self.on_checkout)
+        event.listen(engine.sync_engine, "close", self.on_close)
+
+    def stats(self, pool) -> dict:
+        now = time.monotonic()
+        ages = [now - connected_at for connected_at in self._connected_at.values()]
+        return {
+            "size": pool.size(),
+            "checked_out": pool.checkedout(),
+            "checked_in": pool.checkedin(),
+            "overflow": max(pool.overflow(), 0),
+            "max_overflow": getattr(pool, "_max_overflow", None),
+            "timeouts": self.timeouts,
+            "connects": self.connects,
+            "closes": self.closes,
+            "wait_ms": self.wait.stats(),
+            "connection_age_s": {
+                "open": len(ages),
+                "oldest": max(ages, default=None),
+                "avg": sum(ages) / len(ages) if ages else None,
+            },
+            "age_at_checkout_ms": self.age_at_checkout.stats(),
+        }
+
+
+class InstrumentedAsyncPool(AsyncAdaptedQueuePool):
+    """Пул, замеряющий, сколько запрос ждал свободное соединение"""
+
+    metrics: Optional[PoolMetrics] = None
+
+    def _do_get(self):
+        metrics = self.metrics
+        if metrics is None:
+            return super()._do_get()
+        started_at = time.perf_counter()
+        try:
+            return super()._do_get()
+        except PoolTimeoutError:
+            metrics.timeouts += 1
+            raise
+        finally:
+            metrics.wait.observe((time.perf_counter() - started_at) * 1000)
+
+    def recreate(self):
+        pool = super().recreate()
+        pool.metrics = self.metrics
+        return pool
+
+
+_BIND_LIST = re.compile(r"\(\s*%\(\w+\)s(?:\s*,\s*%\(\w+\)s)*\s*\)(?:\s*,\s*\(\s*%\(\w+\)s(?:\s*,\s*%\(\w+\)s)*\s*\))*")
+_BIND = re.compile(r"%\(\w+\)s|\$\d+|\?")
+
+
+@lru_cache(maxsize=1024)
+def statement_shape(statement: str) -> str:
+    """Текст запроса без параметров: списки IN и VALUES любой длины сводятся к (?)"""
+    return " ".join(_BIND.sub("?", _BIND_LIST.sub("(?)", statement)).split())
+
+
+@dataclass(slots=True)
+class QueryStats:
+    """Запросы к БД в пределах одного контекста (обычно — HTTP-запроса)"""
+
+    count: int = 0
+    duration: float = 0.0
+    # Вложенные блоки учитываются и во внешних, а не перехватывают их запросы
+    parent: Optional["QueryStats"] = field(default=None, repr=False)
+    # Счётчик по форме запроса, ведётся только по запросу (отладка, тесты)
+    shapes: Optional[Counter] = field(default=None, repr=False)
+
+    @property
+    def duration_ms(self) -> float:
+        return self.duration * 1000
+
+    def repeated(self, threshold: int) -> list[tuple[str, int]]:
+        """Формы запросов, выполненные не меньше ``threshold`` раз — кандидаты в N+1"""
+        if not self.shapes:
+            return []
+        return [(shape, count) for shape, count in self.shapes.most_common() if count >= threshold]
+
+
+_current: ContextVar[Optional[QueryStats]] = ContextVar("query_stats", default=None)
+
+
+@contextmanager
+def track_queries(record_shapes: bool = False) -> Iterator[QueryStats]:
+    """Считает запросы и время в БД внутри блока.
+
+        with track_queries() as stats:
+            await session.execute(...)
+        stats.count, stats.duration_ms
+    """
+    stats = QueryStats(parent=_current.get(), shapes=Counter() if record_shapes else None)
+    token = _current.set(stats)
+    try:
+        yield stats
+    finally:
+        _current.reset(token)
+
+
+def current_query_stats() -> Optional[QueryStats]:
+    return _current.get()
+
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany) -> None:
+    if _current.get() is not None:
+        conn.info.setdefault("query_started_at", []).append(time.perf_counter())
+
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany) -> None:
+    _record_query(conn, statement)
+
+
+def _handle_error(exception_context) -> None:
+    # Без этого отметка упавшего запроса осталась бы в соединении и сдвинула
+    # время всех следующих запросов на нём; упавший запрос тоже считается
+    if exception_context.connection is not None and exception_context.statement is not None:
+        _record_query(exception_context.connection, exception_context.statement)
+
+
+def _record_query(conn, statement: str) -> None:
+    started = conn.info.get("query_started_at")
+    if not started:
+        return
+    elapsed = time.perf_counter() - started.pop()
+    stats = _current.get()
+    while stats is not None:
+        stats.count += 1
+        stats.duration += elapsed
+        if stats.shapes is not None:
+            stats.shapes[statement_shape(statement)] += 1
+        stats = stats.parent
+
+
+def instrument_queries(engine: AsyncEngine) -> None:
+    # Контекст задачи asyncio доходит до событий: SQLAlchemy запускает
+    # синхронный код в greenlet с тем же contextvars.Context
+    event.listen(engine.sync_engine, "before_cursor_execute", _before_cursor_execute)
+    event.listen(engine.sync_engine, "after_cursor_execute", _after_cursor_execute)
+    event.listen(engine.sync_engine, "handle_error", _handle_error)
+
+
+class RouteQueryMetrics:
+    """Сводка по маршрутам: число запросов к БД и время в БД на один HTTP-запрос"""
+
+    def __init__(self) -> None:
+        self._routes: dict[str, tuple[Histogram, Histogram]] = {}
+
+    def observe(self, route: str, stats: QueryStats) -> None:
+        entry = self._routes.get(route)
+        if entry is None:
+            entry = self._routes[route] = (Histogram(buckets=(0, 1, 2, 3, 5, 10, 20, 50, 100)), Histogram())
+        entry[0].observe(stats.count)
+        entry[1].observe(stats.duration_ms)
+
+    def stats(self) -> dict:
+        return {
+            route: {"queries": queries.stats(), "db_time_ms": db_time.stats()}
+            for route, (queries, db_time) in sorted(self._routes.items())
+        }
+
+
+route_query_metrics = RouteQueryMetrics()
+
+
+class QueryStatsMiddleware:
+    """ASGI-middleware: собирает QueryStats на каждый HTTP-запрос"""
+
+    def __init__(self, app) -> None:
+        self.app = app
+
+    async def __call__(self, scope, receive, send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        with track_queries() as stats:
+            try:
+                await self.app(scope, receive, send)
+            finally:
+                # Шаблон пути, а не сам путь: иначе каждый id — отдельная строка
+                route = scope.get("route")
+                path = getattr(route, "path", None) or "<unmatched>"
+                route_query_metrics.observe(f"{scope['method']} {path}", stats)
+
+
+class QueryDebugMiddleware:
+    """Отладочное ASGI-middleware: запросы к БД на каждый HTTP-запрос.
+
+    Добавляет заголовки X-DB-Queries, X-DB-Time-Ms и X-DB-N-Plus-One
+    (сколько форм запросов повторились не меньше ``threshold`` раз)
+    и пишет по строке JSON в лог. Включается настройкой query_debug.
+    """
+
+    def __init__(self, app, threshold: int = 5) -> None:
+        self.app = app
+        self.threshold = threshold
+
+    async def __call__(self, scope, receive, send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        with track_queries(record_shapes=True) as stats:
+
+            async def send_with_headers(message) -> None:
+                if message["type"] == "http.response.start":
+                    repeated = stats.repeated(self.threshold)
+                    message["headers"] = [
+                        *message.get("headers", []),
+                        (b"x-db-queries", str(stats.count).encode()),
+                        (b"x-db-time-ms", f"{stats.duration_ms:.2f}".encode()),
+                        (b"x-db-n-plus-one", str(len(repeated)).encode()),
+                    ]
+                await send(message)
+
+            try:
+                await self.app(scope, receive, send_with_headers)
+            finally:
+                repeated = stats.repeated(self.threshold)
+                record = {
+                    "method": scope["method"],
+                    "path": scope["path"],
+                    "route": getattr(scope.get("route"), "path", None),
+                    "queries": stats.count,
+                    "db_time_ms": round(stats.duration_ms, 2),
+                    "n_plus_one": [{"statement": shape, "count": count} for shape, count in repeated],
+                }
+                logger.log(
+                    logging.WARNING if repeated else logging.INFO,
+                    json.dumps(record, ensure_ascii=False),
+                )
@@ -0,0 +1,313 @@
+import asyncio
+import contextvars
+import json
+import logging
+from abc import ABC, abstractmethod
+from collections import deque
+from contextlib import asynccontextmanager
+from datetime import datetime
+from typing import AsyncIterator, Optional
+from uuid import UUID
+
+from sqlalchemy import text
+from sqlalchemy.engine import make_url
+
+from app.config import settings
+from app.database import db_helper
+
+logger = logging.getLogger(__name__)
+
+
+def _json_default(value):
+    if isinstance(value, datetime):
+        return value.isoformat()
+    return str(value)
+
+
+def dumps(data: dict) -> str:
+    return json.dumps(data, ensure_ascii=False, default=_json_default)
+
+
+def sse_frame(event: str, data: dict) -> bytes:
+    """Событие в формате text/event-stream"""
+    return f"event: {event}\ndata: {dumps(data)}\n\n".encode()
+
+
+class Subscription:
+    """Очередь событий одного подписчика.
+
+    Очередь ограничена: подписчика, который не успевает читать,
+    отключают, а не копят для него события. Клиент переподключается
+    и перечитывает список результатов.
+    """
+
+    def __init__(self, test_id: UUID, queue_size: int) -> None:
+        self.test_id = test_id
+        self.queue: asyncio.Queue[Optional[bytes]] = asyncio.Queue(maxsize=queue_size)
+        self.overflowed = False
+        self.closed = False
+
+    def put(self, frame: bytes) -> bool:
+        try:
+            self.queue.put_nowait(frame)
+        except asyncio.QueueFull:
+            self.overflowed = True
+            return False
+        return True
+
+    def close(self) -> None:
+        """Завершает поток, даже если очередь полна"""
+        self.closed = True
+        # None будит читателя, ждущего события. Если очередь полна, он и так
+        # не ждёт, а флаг closed завершит поток на следующем событии
+        try:
+            self.queue.put_nowait(None)
+        except asyncio.QueueFull:
+            pass
+
+
+class EventBackend(ABC):
+    """Доставка событий между процессами.
+
+    Брокер отдаёт событие в ``publish``, а бэкенд должен вызвать
+    ``broker.deliver`` в каждом процессе, где есть подписчики, —
+    в том числе в том, где событие опубликовано.
+    """
+
+    broker: "EventBroker"
+
+    def bind(self, broker: "EventBroker") -> None:
+        self.broker = broker
+
+    @abstractmethod
+    def publish(self, test_id: UUID, event: str, data: dict) -> None: ...
+
+    def listen(self) -> None:
+        """Вызывается при появлении подписчиков в процессе"""
+
+    async def stop(self) -> None:
+        pass
+
+    def stats(self) -> dict:
+        return {"backend": type(self).__name__}
+
+
+class LocalBackend(EventBackend):
+    """Один процесс: событие сразу раздаётся подписчикам"""
+
+    def publish(self, test_id: UUID, event: str, data: dict) -> None:
+        self.broker.deliver(test_id, event, data)
+
+
+class PostgresNotifyBackend(EventBackend):
+    """Несколько воркеров: события идут через LISTEN/NOTIFY PostgreSQL.
+
+    Опубликованные события копятся и отправляются одним запросом
+    pg_notify на пачку. Слушает канал отдельное соединение вне пула,
+    и только в тех процессах, где есть подписчики.
+    """
+
+    def __init__(self, url: str, channel: str, max_pending: int = 10_000, reconnect_delay: float = 1.0) -> None:
+        self.conninfo = make_url(url).set(drivername="postgresql").render_as_string(hide_password=False)
+        self.channel = channel
+        self.reconnect_delay = reconnect_delay
+        self._outbox: deque[str] = deque(maxlen=max_pending)
+        self._wakeup: Optional[asyncio.Event] = None
+        self._sender: Optional[asyncio.Task] = None
+        self._listener: Optional[asyncio.Task] = None
+        self.sent = 0
+        self.failed = 0
+        self.dropped = 0
+        self.received = 0
+
+    def publish(self, test_id: UUID, event: str, data: dict) -> None:
+        if self._sender is None or self._sender.done():
+            self._wakeup = asyncio.Event()
+            # Пустой контекст: иначе задача унаследует счётчики запросов первого HTTP-запроса
+            self._sender = asyncio.create_task(self._send_loop(), name="events-notify", context=contextvars.Context())
+        if len(self._outbox) == self._outbox.maxlen:
+            self.dropped += 1
+        self._outbox.append(dumps({"test_id": test_id, "event": event, "data": data}))
+        assert self._wakeup is not None
+        self._wakeup.set()
+
+    async def _send_loop(self) -> None:
+        assert self._wakeup is not None
+        while True:
+            await self._wakeup.wait()
+            self._wakeup.clear()
+            await self._send()
+
+    async def _send(self) -> None:
+        if not self._outbox:
+            return
+        payloads = list(self._outbox)
+        self._outbox.clear()
+        try:
+            async with db_helper.engine.connect() as conn:
+                await conn.execute(
+                    text("SELECT pg_notify(:channel, payload) FROM unnest(CAST(:payloads AS text[])) AS payload"),
+                    {"channel": self.channel, "payloads": payloads},
+                )
+                await conn.commit()
+        except Exception:
+            self.failed += len(payloads)
+            logger.exception("Не удалось отправить события (%d шт.)", len(payloads))
+        else:
+            self.sent += len(payloads)
+
+    def listen(self) -> None:
+        if self._listener is None or self._listener.done():
+            self._listener = asyncio.create_task(self._listen_loop(), name="events-listen", context=contextvars.Context())
+
+    async def _listen_loop(self) -> None:
+        # Драйвер напрямую нужен только слушателю, импортируем его при первой подписке
+        import psycopg
+        from psycopg import sql
+
+        while True:
+            try:
+                async with await psycopg.AsyncConnection.connect(self.conninfo, autocommit=True) as conn:
+                    await conn.execute(sql.SQL("LISTEN {}").format(sql.Identifier(self.channel)))
+                    async for notify in conn.notifies():
+                        self.received += 1
+                        try:
+                            message = json.loads(notify.payload)
+                            self.broker.deliver(UUID(message["test_id"]), message["event"], message["data"])
+                        except (ValueError, KeyError):
+                            logger.warning("Непонятное событие в канале %s: %r", self.channel, notify.payload)
+            except asyncio.CancelledError:
+                raise
+            except Exception as exc:
+                # События за время переподключения теряются: клиенты догоняют по списку результатов
+                logger.warning("Канал событий %s недоступен: %r", self.channel, exc)
+            await asyncio.sleep(self.reconnect_delay)
+
+    async def stop(self) -> None:
+        if self._listener is not None:
+            self._listener.cancel()
+            try:
+                await self._listener
+            except asyncio.CancelledError:
+                pass
+            self._listener = None
+        if self._sender is not None:
+            self._sender.cancel()
+            try:
+                await self._sender
+            except asyncio.CancelledError:
+                pass
+            self._sender = None
+        await self._send()
+
+    def stats(self) -> dict:
+        return {
+            **super().stats(),
+            "channel": self.channel,
+            "listening": self._listener is not None and not self._listener.done(),
+            "pending": len(self._outbox),
+            "sent": self.sent,
+            "failed": self.failed,
+            "dropped": self.dropped,
+            "received": self.received,
+        }
+
+
+class EventBroker:
+    """Рассылка событий экзамена подписчикам по тестам.
+
+    Событие сериализуется один раз и та же строка кладётся в очередь
+    каждого подписчика теста. Публикация не ждёт ни доставки, ни БД.
+    """
+
+    def __init__(self, backend: EventBackend, queue_size: int = 1_000) -> None:
+        self.backend = backend
+        self.backend.bind(self)
+        self.queue_size = queue_size
+        self._subscribers: dict[UUID, set[Subscription]] = {}
+        self.published = 0
+        self.delivered = 0
+        self.overflowed = 0
+
+    def publish(self, test_id: UUID, event: str, data: dict) -> None:
+        self.published += 1
+        self.backend.publish(test_id, event, data)
+
+    def deliver(self, test_id: UUID, event: str, data: dict) -> None:
+        subscribers = self._subscribers.get(test_id)
+        if not subscribers:
+            return
+        frame = sse_frame(event, data)
+        for subscription in list(subscribers):
+            if subscription.put(frame):
+                self.delivered += 1
+            else:
+                self.overflowed += 1
+                self._remove(subscription)
+
+    @asynccontextmanager
+    async def subscribe(self, test_id: UUID) -> AsyncIterator[Subscription]:
+        self.backend.listen()
+        subscription = Subscription(test_id, self.queue_size)
+        self._subscribers.setdefault(test_id, set()).add(subscription)
+        try:
+            yield subscription
+        finally:
+            self._remove(subscription)
+
+    def _remove(self, subscription: Subscription) -> None:
+        subscribers = self._subscribers.get(subscription.test_id)
+        if subscribers is None:
+            return
+        subscribers.discard(subscription)
+        if not subscribers:
+            del self._subscribers[subscription.test_id]
+
+    def close_streams(self) -> None:
+        """Завершает потоки подписчиков; клиенты переподключатся к другому воркеру"""
+        for subscribers in list(self._subscribers.values()):
+            for subscription in list(subscribers):
+                subscription.close()
+                self._remove(subscription)
+
+    async def stop(self) -> None:
+        self.close_streams()
+        await self.backend.stop()
+
+    def stats(self) -> dict:
+        return {
+            "tests": len(self._subscribers),
+            "subscribers": sum(len(subscribers) for subscribers in self._subscribers.values()),
+            "published": self.published,
+            "delivered": self.delivered,
+            "overflowed": self.overflowed,
+            **self.backend.stats(),
+        }
+
+
+def make_backend() -> EventBackend:
+    if settings.events.backend == "postgres":
+        return PostgresNotifyBackend(str(settings.database.url), settings.events.channel)
+    return LocalBackend()
+
+
+event_broker = EventBroker(make_backend(), queue_size=settings.events.queue_size)
+
+
+async def stream_events(test_id: UUID, keepalive: float) -> AsyncIterator[bytes]:
+    """Поток text/event-stream по тесту: события, а в паузах — комментарии, чтобы прокси не рвали соединение"""
+    async with event_broker.subscribe(test_id) as subscription:
+        yield b"retry: 3000\n\n"
+        while True:
+            try:
+                frame = await asyncio.wait_for(subscription.queue.get(), keepalive)
+            except asyncio.TimeoutError:
+                yield b": keepalive\n\n"
+                continue
+            if frame is None or subscription.closed:
+                return
+            yield frame
+            if subscription.overflowed and subscription.queue.empty():
+                # Подписчик отстал и отключён от рассылки: клиенту пора перечитать список
+                yield sse_frame("overflow", {"test_id": test_id})
+                return
@@ -0,0 +1,233 @@
+import time
+import zlib
+from array import array
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Iterable, Optional
+from uuid import UUID
+
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.config import settings
+from app.schemas import AnswerSubmission
+from app.services.statements import answer_key_query
+from app.services.test_cache import TestSnapshotCache, test_cache
+
+
+class GradingError(ValueError):
+    """Ответ студента не согласуется с тестом"""
+
+
+@dataclass(slots=True)
+class GradedSubmission:
+    """Итог проверки: балл и выбранные ответы по позициям вопросов"""
+
+    score: int
+    # Номер выбранного ответа внутри вопроса + 1, 0 — вопрос без ответа
+    choices: array
+    # Битовая маска верно отвеченных вопросов
+    correct: bytearray
+
+
+def layout_checksum(questions: Iterable[UUID], answers: Iterable[Iterable[UUID]]) -> int:
+    """CRC32 порядка вопросов и их ответов.
+
+    Номер ответа в сохранённой сдаче — позиция среди ответов вопроса,
+    поэтому добавленный или удалённый ответ тоже меняет раскладку.
+    """
+    checksum = 0
+    for question_id, answer_ids in zip(questions, answers):
+        answer_ids = tuple(answer_ids)
+        checksum = zlib.crc32(question_id.bytes + len(answer_ids).to_bytes(2, "big"), checksum)
+        checksum = zlib.crc32(b"".join(answer_id.bytes for answer_id in answer_ids), checksum)
+    # Обрезаем до 31 бита, чтобы помещалось в INTEGER
+    return checksum & 0x7FFFFFFF
+
+
+@dataclass(frozen=True, slots=True)
+class AnswerKey:
+    """Ключ ответов теста в компактном виде.
+
+    Вопросы упорядочены по id, их позиция (ordinal) — индекс в кортежах.
+    ``layout`` — контрольная сумма порядка вопросов и ответов внутри них,
+    по ней сохранённые позиционные ответы сверяются с текущей версией теста.
+    """
+
+    questions: tuple[UUID, ...]
+    answers: tuple[tuple[UUID, ...], ...]
+    correct: tuple[frozenset[UUID], ...]
+    question_index: dict[UUID, int]
+    answer_owner: dict[UUID, tuple[int, int]]
+    layout: int
+    # Сколько вопросов выдаётся студенту из банка; None — все
+    draw_count: Optional[int] = None
+    # Ограничение по времени: такой тест сдаётся только через попытку
+    time_limit_minutes: Optional[int] = None
+
+    @classmethod
+    def from_rows(
+        cls,
+        rows: Iterable[tuple[Optional[UUID], Optional[UUID], Optional[bool]]],
+        draw_count: Optional[int] = None,
+        time_limit_minutes: Optional[int] = None,
+    ) -> "AnswerKey":
+        """Строит ключ из строк (question_id, answer_id, is_correct), отсортированных по вопросу и ответу"""
+        questions: list[UUID] = []
+        answers: list[list[UUID]] = []
+        correct: list[set[UUID]] = []
+        answer_owner: dict[UUID, tuple[int, int]] = {}
+        for question_id, answer_id, is_correct in rows:
+            if question_id is None:
+                continue
+            if not questions or questions[-1] != question_id:
+                questions.append(question_id)
+                answers.append([])
+                correct.append(set())
+            if answer_id is None:
+                continue
+            ordinal = len(questions) - 1
+            answer_owner[answer_id] = (ordinal, len(answers[ordinal]))
+            answers[ordinal].append(answer_id)
+            if is_correct:
+                correct[ordinal].add(answer_id)
+
+        return cls(
+            questions=tuple(questions),
+            answers=tuple(tuple(ids) for ids in answers),
+            correct=tuple(frozenset(ids) for ids in correct),
+            question_index={question_id: ordinal for ordinal, question_id in enumerate(questions)},
+            answer_owner=answer_owner,
+            layout=layout_checksum(questions, answers),
+            draw_count=draw_count,
+            time_limit_minutes=time_limit_minutes,
+        )
+
+    def locate(
+        self,
+        question_id: UUID,
+        answer_id: UUID,
+        drawn: Optional[frozenset[int]] = None,
+    ) -> tuple[int, int]:
+        """Позиция вопроса и номер ответа внутри него; GradingError, если ответ не подходит"""
+        ordinal = self.question_index.get(question_id)
+        if ordinal is None:
+            raise GradingError("Вопрос не относится к тесту")
+        if drawn is not None and ordinal not in drawn:
+            raise GradingError("Вопрос не входит в ваш вариант")
+
+        owner = self.answer_owner.get(answer_id)
+        if owner is None:
+            raise GradingError("Ответ не найден")
+        if owner[0] != ordinal:
+            raise GradingError("Ответ не соответствует вопросу")
+        return owner
+
+    def grade(
+        self,
+        submitted: Iterable[AnswerSubmission],
+        drawn: Optional[frozenset[int]] = None,
+    ) -> GradedSubmission:
+        """Проверяет ответы за один проход.
+
+        ``drawn`` — позиции вопросов варианта студента, если тест выдаёт
+        не все вопросы банка; ответы на остальные отклоняются.
+        """
+        choices = array("H", bytes(2 * len(self.questions)))
+        correct = bytearray((len(self.questions) + 7) // 8)
+        score = 0
+        for item in submitted:
+            ordinal, position = self.locate(item.question_id, item.answer_id, drawn)
+            if choices[ordinal]:
+                raise GradingError("Повторный ответ на вопрос")
+
+            choices[ordinal] = position + 1
+            if item.answer_id in self.correct[ordinal]:
+                correct[ordinal >> 3] |= 1 << (ordinal & 7)
+                score += 1
+        return GradedSubmission(score=score, choices=choices, correct=correct)
+
+
+class AnswerKeyCache:
+    """LRU-кэш ключей ответов.
+
+    Отдельной инвалидации нет: запись действительна, пока совпадает
+    с версией теста в кэше снимков, которую поднимают обработчики
+    изменения теста. Если версия не общая для воркеров (несколько
+    воркеров без хранилища снимков), кэш не используется: устаревший
+    ключ записал бы неверные баллы в результаты.
+    """
+
+    def __init__(
+        self,
+        max_size: int = 1_000,
+        ttl: float = 60.0,
+        enabled: bool = True,
+        snapshots: Optional[TestSnapshotCache] = None,
+    ) -> None:
+        self.max_size = max_size
+        self.ttl = ttl
+        self.enabled = enabled
+        self.snapshots = test_cache if snapshots is None else snapshots
+        self._entries: OrderedDict[UUID, tuple[float, int, AnswerKey]] = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    @property
+    def active(self) -> bool:
+        return self.enabled and self.snapshots.shared
+
+    async def get(self, test_id: UUID) -> Optional[AnswerKey]:
+        entry = self._entries.get(test_id) if self.active else None
+        if entry is not None:
+            deadline, version, key = entry
+            if deadline > time.monotonic() and version == await self.snapshots.refresh_version(test_id):
+                self._entries.move_to_end(test_id)
+                self.hits += 1
+                return key
+            del self._entries[test_id]
+        self.misses += 1
+        return None
+
+    async def set(self, test_id: UUID, key: AnswerKey, version: int) -> None:
+        if not self.active or version != await self.snapshots.refresh_version(test_id):
+            return
+        self._entries[test_id] = (time.monotonic() + self.ttl, version, key)
+        self._entries.move_to_end(test_id)
+        while len(self._entries) > self.max_size:
+            self._entries.popitem(last=False)
+
+    def stats(self) -> dict:
+        return {
+            "enabled": self.enabled,
+            "active": self.active,
+            "size": len(self._entries),
+            "hits": self.hits,
+            "misses": self.misses,
+        }
+
+
+answer_key_cache = AnswerKeyCache(
+    max_size=settings.test_cache.max_size,
+    ttl=settings.test_cache.ttl.total_seconds(),
+    enabled=settings.test_cache.enabled,
+)
+
+
+async def get_answer_key(session: AsyncSession, test_id: UUID) -> Optional[AnswerKey]:
+    """Ключ ответов из кэша или одним запросом из БД; None — теста нет"""
+    key = await answer_key_cache.get(test_id)
+    if key is not None:
+        return key
+
+    version = await test_cache.refresh_version(test_id)
+    rows = (await session.execute(answer_key_query(test_id))).all()
+    if not rows:
+        return None
+
+    key = AnswerKey.from_rows(
+        ((row[2], row[3], row[4]) for row in rows),
+        draw_count=rows[0][0],
+        time_limit_minutes=rows[0][1],
+    )
+    await answer_key_cache.set(test_id, key, version)
+    return key
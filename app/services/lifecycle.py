@@ -0,0 +1,89 @@
+import asyncio
+import logging
+import signal
+import threading
+import time
+from typing import Callable, Optional
+
+logger = logging.getLogger(__name__)
+
+
+class Lifecycle:
+    """Состояние воркера: готовность, плавная остановка, запросы в работе.
+
+    При SIGTERM воркер сразу перестаёт быть готовым (балансировщик
+    уводит трафик) и закрывает долгие потоки событий, а начатые
+    запросы дорабатывают до конца.
+    """
+
+    def __init__(self) -> None:
+        self.started = False
+        self.draining = False
+        self.in_flight = 0
+        self.database: dict = {"healthy": None, "latency_ms": None, "error": None, "checked_at": None}
+        self._on_drain: list[Callable[[], None]] = []
+
+    def on_drain(self, callback: Callable[[], None]) -> None:
+        self._on_drain.append(callback)
+
+    def begin_drain(self) -> None:
+        if self.draining:
+            return
+        self.draining = True
+        logger.info("Остановка: новые запросы не принимаются, в работе %d", self.in_flight)
+        for callback in self._on_drain:
+            try:
+                callback()
+            except Exception:
+                logger.exception("Ошибка при остановке")
+
+    def watch_signals(self) -> None:
+        """Перехватывает SIGTERM/SIGINT поверх обработчиков сервера, не заменяя их"""
+        if threading.current_thread() is not threading.main_thread():
+            return
+        loop = asyncio.get_running_loop()
+        for signum in (signal.SIGTERM, signal.SIGINT):
+            previous = signal.getsignal(signum)
+            if not callable(previous):
+                continue
+
+            def handler(signum, frame, previous=previous) -> None:
+                loop.call_soon_threadsafe(self.begin_drain)
+                previous(signum, frame)
+
+            signal.signal(signum, handler)
+
+    async def wait_idle(self, timeout: float) -> bool:
+        """Ждёт, пока допишутся начатые запросы; False — не дождались"""
+        deadline = time.monotonic() + timeout
+        while self.in_flight and time.monotonic() < deadline:
+            await asyncio.sleep(0.05)
+        return not self.in_flight
+
+    def record_database(self, latency: Optional[float], error: Optional[BaseException] = None) -> None:
+        self.database = {
+            "healthy": error is None,
+            "latency_ms": latency * 1000 if latency is not None else None,
+            "error": repr(error) if error is not None else None,
+            "checked_at": time.time(),
+        }
+
+
+lifecycle = Lifecycle()
+
+
+class InFlightMiddleware:
+    """ASGI-middleware: считает HTTP-запросы в работе для плавной остановки"""
+
+    def __init__(self, app) -> None:
+        self.app = app
+
+    async def __call__(self, scope, receive, send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        lifecycle.in_flight += 1
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            lifecycle.in_flight -= 1
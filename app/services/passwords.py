@@ -0,0 +1,120 @@
+import asyncio
+import time
+from concurrent.futures import Executor, ProcessPoolExecutor, ThreadPoolExecutor
+from functools import cache
+from typing import TYPE_CHECKING, Optional
+
+from app.config import settings
+
+if TYPE_CHECKING:
+    from passlib.context import CryptContext
+
+
+@cache
+def pwd_context() -> "CryptContext":
+    # passlib и CryptContext нужны только при входе и регистрации, а не при старте.
+    # В режиме process контекст создаётся в каждом процессе пула при первом хэше
+    from passlib.context import CryptContext
+
+    return CryptContext(schemes=["bcrypt"], deprecated="auto")
+
+
+def hash_password(password: str) -> str:
+    return pwd_context().hash(password)
+
+
+def verify_password(plain: str, hashed: str) -> bool:
+    return pwd_context().verify(plain, hashed)
+
+
+class PasswordHasherBusy(Exception):
+    """Очередь на хэширование переполнена"""
+
+
+class PasswordHasher:
+    """Выполняет bcrypt в отдельном пуле, не блокируя event loop.
+
+    Одновременно считается не больше ``workers`` хэшей, остальные запросы
+    ждут в очереди. Если ожидающих больше ``max_waiting``, новые запросы
+    сразу отклоняются, чтобы вход при пиковой нагрузке деградировал
+    по задержке, а не копил бесконечную очередь.
+    """
+
+    def __init__(self, executor: str = "thread", workers: int = 4, max_waiting: int = 256) -> None:
+        self.executor_kind = executor
+        self.workers = workers
+        self.max_waiting = max_waiting
+        self._executor: Optional[Executor] = None
+        self._semaphore = asyncio.Semaphore(workers)
+        self.in_flight = 0
+        self.waiting = 0
+        self.max_waiting_seen = 0
+        self.completed = 0
+        self.rejected = 0
+        self.total_wait = 0.0
+        self.total_run = 0.0
+
+    @property
+    def executor(self) -> Executor:
+        if self._executor is None:
+            if self.executor_kind == "process":
+                self._executor = ProcessPoolExecutor(max_workers=self.workers)
+            else:
+                self._executor = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="bcrypt")
+        return self._executor
+
+    async def hash(self, password: str) -> str:
+        return await self._run(hash_password, password)
+
+    async def verify(self, plain: str, hashed: str) -> bool:
+        return await self._run(verify_password, plain, hashed)
+
+    async def _run(self, func, *args):
+        if self.waiting >= self.max_waiting:
+            self.rejected += 1
+            raise PasswordHasherBusy()
+
+        queued_at = time.perf_counter()
+        self.waiting += 1
+        self.max_waiting_seen = max(self.max_waiting_seen, self.waiting)
+        try:
+            await self._semaphore.acquire()
+        finally:
+            self.waiting -= 1
+
+        started_at = time.perf_counter()
+        self.total_wait += started_at - queued_at
+        self.in_flight += 1
+        try:
+            loop = asyncio.get_running_loop()
+            return await loop.run_in_executor(self.executor, func, *args)
+        finally:
+            self.in_flight -= 1
+            self.completed += 1
+            self.total_run += time.perf_counter() - started_at
+            self._semaphore.release()
+
+    def shutdown(self) -> None:
+        if self._executor is not None:
+            self._executor.shutdown(wait=True)
+            self._executor = None
+
+    def stats(self) -> dict:
+        return {
+            "executor": self.executor_kind,
+            "workers": self.workers,
+            "in_flight": self.in_flight,
+            "waiting": self.waiting,
+            "max_waiting_seen": self.max_waiting_seen,
+            "completed": self.completed,
+            "rejected": self.rejected,
+            "avg_wait_ms": self.total_wait / self.completed * 1000 if self.completed else 0.0,
+            "avg_run_ms": self.total_run / self.completed * 1000 if self.completed else 0.0,
+        }
+
+
+password_hasher = PasswordHasher(
+    executor=settings.password_hashing.executor,
+    workers=settings.password_hashing.workers,
+    max_waiting=settings.password_hashing.max_waiting,
+)
@@ -0,0 +1,194 @@
+import asyncio
+import contextvars
+import logging
+import time
+from typing import Optional
+
+from sqlalchemy import insert
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.config import settings
+from app.database import db_helper
+from app.models import Result, ResultDetail
+from app.services.result_stats import record_scores
+
+logger = logging.getLogger(__name__)
+
+
+class ResultBatcherBusy(Exception):
+    """Очередь на запись результатов переполнена или запись остановлена"""
+
+
+class ResultRejected(Exception):
+    """Результат нарушает ограничения БД (например, тест удалили), остальная пачка записана"""
+
+
+class ResultBatcher:
+    """Копит результаты сдачи и пишет их многострочными INSERT'ами.
+
+    Пачка сбрасывается, когда набралось ``batch_size`` строк или прошло
+    ``flush_interval`` секунд с первой строки в пачке. ``submit``
+    возвращается только после коммита пачки, поэтому ответ клиенту
+    по-прежнему означает, что результат сохранён. Если в очереди уже
+    ``max_pending`` строк, новые ждут места не дольше ``enqueue_timeout``.
+
+    Если пачка нарушила ограничения БД, её строки пишутся по одной:
+    ошибку получает только виновник, остальные результаты сохраняются.
+    """
+
+    def __init__(
+        self,
+        enabled: bool = False,
+        batch_size: int = 100,
+        flush_interval: float = 0.05,
+        max_pending: int = 5_000,
+        enqueue_timeout: float = 5.0,
+    ) -> None:
+        self.enabled = enabled
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.max_pending = max_pending
+        self.enqueue_timeout = enqueue_timeout
+        self._queue: Optional[asyncio.Queue[tuple[dict, dict, asyncio.Future]]] = None
+        self._task: Optional[asyncio.Task] = None
+        self.batches = 0
+        self.rows = 0
+        self.failed_batches = 0
+        self.rejected = 0
+        self.rejected_rows = 0
+        self.total_flush = 0.0
+
+    async def submit(self, result: dict, detail: dict) -> None:
+        """Ставит в очередь строки Result и ResultDetail, ждёт их коммита"""
+        if self._task is None or self._task.done():
+            if self._queue is not None:
+                # Задача упала: тех, кто остался в старой очереди, никто не запишет
+                self._fail_pending(self._queue)
+            self._queue = asyncio.Queue(maxsize=self.max_pending)
+            # Пустой контекст: иначе задача унаследует счётчики запросов первого HTTP-запроса
+            self._task = asyncio.create_task(self._run(), name="result-batcher", context=contextvars.Context())
+
+        assert self._queue is not None
+        future = asyncio.get_running_loop().create_future()
+        try:
+            await asyncio.wait_for(self._queue.put((result, detail, future)), self.enqueue_timeout)
+        except asyncio.TimeoutError:
+            self.rejected += 1
+            raise ResultBatcherBusy()
+        await future
+
+    async def stop(self) -> None:
+        """Дописывает всё, что уже в очереди, и останавливает фоновую задачу"""
+        if self._task is None:
+            return
+        assert self._queue is not None
+        # Если фоновая задача упала, очередь уже никто не разберёт: join не дождаться
+        drained = asyncio.ensure_future(self._queue.join())
+        await asyncio.wait((drained, self._task), return_when=asyncio.FIRST_COMPLETED)
+        drained.cancel()
+        self._task.cancel()
+        try:
+            await self._task
+        except asyncio.CancelledError:
+            pass
+        except Exception:
+            logger.exception("Запись результатов завершилась с ошибкой")
+        self._task = None
+        self._fail_pending(self._queue)
+
+    @staticmethod
+    def _fail_pending(queue: asyncio.Queue[tuple[dict, dict, asyncio.Future]]) -> None:
+        # Клиент получит 503 и повторит сдачу, в том числе на другом воркере
+        while not queue.empty():
+            _, _, future = queue.get_nowait()
+            queue.task_done()
+            if not future.done():
+                future.set_exception(ResultBatcherBusy())
+
+    async def _run(self) -> None:
+        assert self._queue is not None
+        loop = asyncio.get_running_loop()
+        while True:
+            batch = [await self._queue.get()]
+            deadline = loop.time() + self.flush_interval
+            while len(batch) < self.batch_size:
+                timeout = deadline - loop.time()
+                if timeout <= 0:
+                    break
+                try:
+                    batch.append(await asyncio.wait_for(self._queue.get(), timeout))
+                except asyncio.TimeoutError:
+                    break
+
+            await self._flush(batch)
+            for _ in batch:
+                self._queue.task_done()
+
+    async def _flush(self, batch: list[tuple[dict, dict, asyncio.Future]]) -> None:
+        started_at = time.perf_counter()
+        errors: dict[int, Exception] = {}
+        try:
+            async with db_helper.session_factory() as session:
+                try:
+                    await self._write(session, batch)
+                    await session.commit()
+                except IntegrityError:
+                    # Ищем виновника, как импорт тестов: каждая строка своей транзакцией
+                    await session.rollback()
+                    for index, row in enumerate(batch):
+                        try:
+                            await self._write(session, [row])
+                            await session.commit()
+                        except IntegrityError as exc:
+                            await session.rollback()
+                            errors[index] = ResultRejected(str(exc.orig or exc))
+        except Exception as exc:
+            self.failed_batches += 1
+            logger.exception("Не удалось записать пачку результатов (%d шт.)", len(batch))
+            for _, _, future in batch:
+                if not future.done():
+                    future.set_exception(exc)
+            return
+
+        if errors:
+            logger.warning("Отклонено результатов: %d из %d", len(errors), len(batch))
+        self.batches += 1
+        self.rows += len(batch) - len(errors)
+        self.rejected_rows += len(errors)
+        self.total_flush += time.perf_counter() - started_at
+        for index, (_, _, future) in enumerate(batch):
+            if future.done():
+                continue
+            if index in errors:
+                future.set_exception(errors[index])
+            else:
+                future.set_result(None)
+
+    @staticmethod
+    async def _write(session: AsyncSession, batch: list[tuple[dict, dict, asyncio.Future]]) -> None:
+        await session.execute(insert(Result).values([result for result, _, _ in batch]))
+        await session.execute(insert(ResultDetail).values([detail for _, detail, _ in batch]))
+        await record_scores(session, [(result["test_id"], result["score"]) for result, _, _ in batch])
+
+    def stats(self) -> dict:
+        return {
+            "enabled": self.enabled,
+            "pending": self._queue.qsize() if self._queue is not None else 0,
+            "batches": self.batches,
+            "rows": self.rows,
+            "failed_batches": self.failed_batches,
+            "rejected": self.rejected,
+            "rejected_rows": self.rejected_rows,
+            "avg_batch_size": self.rows / self.batches if self.batches else 0.0,
+            "avg_flush_ms": self.total_flush / self.batches * 1000 if self.batches else 0.0,
+        }
+
+
+result_batcher = ResultBatcher(
+    enabled=settings.submissions.batching,
+    batch_size=settings.submissions.batch_size,
+    flush_interval=settings.submissions.flush_interval.total_seconds(),
+    max_pending=settings.submissions.max_pending,
+    enqueue_timeout=settings.submissions.enqueue_timeout.total_seconds(),
+)
@@ -0,0 +1,80 @@
+import sys
+from array import array
+from dataclasses import dataclass, field
+from uuid import UUID
+
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.models import ResultDetail
+from app.services.grading import AnswerKey, GradedSubmission
+
+
+def pack_choices(choices: array) -> bytes:
+    if sys.byteorder == "big":
+        choices = array("H", choices)
+        choices.byteswap()
+    return choices.tobytes()
+
+
+def unpack_choices(data: bytes) -> array:
+    choices = array("H", data)
+    if sys.byteorder == "big":
+        choices.byteswap()
+    return choices
+
+
+def detail_row(result_id: UUID, test_id: UUID, key: AnswerKey, graded: GradedSubmission) -> dict:
+    return {
+        "result_id": result_id,
+        "test_id": test_id,
+        "layout": key.layout,
+        "choices": pack_choices(graded.choices),
+        "correct": bytes(graded.correct),
+    }
+
+
+@dataclass(slots=True)
+class ChoiceMatrix:
+    """Ответы всех сдач теста построчно: result_id и массив выбранных ответов"""
+
+    key: AnswerKey
+    result_ids: list[UUID] = field(default_factory=list)
+    choices: list[array] = field(default_factory=list)
+    correct: list[bytes] = field(default_factory=list)
+
+    def item_stats(self) -> list[dict]:
+        """Для каждого вопроса: сколько ответили, сколько верно и распределение по вариантам"""
+        stats = [
+            {"question_id": question_id, "answered": 0, "correct": 0, "choice_counts": [0] * len(answers)}
+            for question_id, answers in zip(self.key.questions, self.key.answers)
+        ]
+        for choices, correct in zip(self.choices, self.correct):
+            for ordinal, choice in enumerate(choices):
+                if not choice:
+                    continue
+                item = stats[ordinal]
+                item["answered"] += 1
+                item["choice_counts"][choice - 1] += 1
+                if correct[ordinal >> 3] & (1 << (ordinal & 7)):
+                    item["correct"] += 1
+        return stats
+
+
+async def load_choice_matrix(session: AsyncSession, test_id: UUID, key: AnswerKey) -> ChoiceMatrix:
+    """Читает упакованные ответы по тесту одной выборкой колонок, без ORM.
+
+    Сдачи, сделанные при другом наборе вопросов (``layout`` не совпадает),
+    позиционно несопоставимы с текущим ключом и пропускаются.
+    """
+    matrix = ChoiceMatrix(key=key)
+    stmt = (
+        select(ResultDetail.result_id, ResultDetail.choices, ResultDetail.correct)
+        .where(ResultDetail.test_id == test_id)
+        .where(ResultDetail.layout == key.layout)
+    )
+    for result_id, choices, correct in (await session.execute(stmt)).all():
+        matrix.result_ids.append(result_id)
+        matrix.choices.append(unpack_choices(choices))
+        matrix.correct.append(correct)
+    return matrix
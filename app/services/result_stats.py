@@ -0,0 +1,162 @@
+from collections import Counter
+from typing import Iterable, Optional
+from uuid import UUID
+
+from sqlalchemy import Float, cast, func, select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.database import dialect_insert
+from app.models import Result, ScoreHistogram, Test
+from app.schemas import ScoreBucket, StudentScoreStats, TestScoreStats
+
+PERCENTILES = {"p25": 0.25, "median": 0.5, "p75": 0.75, "p90": 0.9}
+
+
+async def record_scores(session: AsyncSession, scores: Iterable[tuple[UUID, int]]) -> None:
+    """Прибавляет результаты (test_id, score) к сводке в текущей транзакции.
+
+    Одинаковые пары схлопываются, строки идут в порядке ключа, чтобы
+    параллельные транзакции блокировали их в одном порядке.
+    """
+    counts = Counter(scores)
+    if not counts:
+        return
+    stmt = dialect_insert(session)(ScoreHistogram).values(
+        [{"test_id": test_id, "score": score, "count": count} for (test_id, score), count in sorted(counts.items())]
+    )
+    stmt = stmt.on_conflict_do_update(
+        index_elements=[ScoreHistogram.test_id, ScoreHistogram.score],
+        set_={"count": ScoreHistogram.count + stmt.excluded.count},
+    )
+    await session.execute(stmt)
+
+
+async def load_test_stats(
+    session: AsyncSession,
+    test_id: Optional[UUID] = None,
+    author_id: Optional[UUID] = None,
+    by_student: bool = False,
+) -> list[TestScoreStats]:
+    """Статистика по тестам из сводной таблицы.
+
+    Процентили считаются методом ближайшего ранга по накопленной сумме
+    (оконная функция), среднее — как взвешенное по количеству.
+    """
+    filters = []
+    if test_id is not None:
+        filters.append(ScoreHistogram.test_id == test_id)
+    if author_id is not None:
+        filters.append(Test.author_id == author_id)
+
+    window = (
+        select(
+            ScoreHistogram.test_id,
+            Test.title,
+            ScoreHistogram.score,
+            ScoreHistogram.count,
+            func.sum(ScoreHistogram.count)
+            .over(partition_by=ScoreHistogram.test_id, order_by=ScoreHistogram.score)
+            .label("running"),
+            func.sum(ScoreHistogram.count).over(partition_by=ScoreHistogram.test_id).label("total"),
+        )
+        .join(Test, Test.id == ScoreHistogram.test_id)
+        .where(ScoreHistogram.count > 0, *filters)
+        .subquery()
+    )
+    stmt = (
+        select(
+            window.c.test_id,
+            window.c.title,
+            func.sum(window.c.count).label("count"),
+            (cast(func.sum(window.c.score * window.c.count), Float) / func.sum(window.c.count)).label("mean"),
+            func.min(window.c.score).label("min"),
+            func.max(window.c.score).label("max"),
+            *(
+                func.min(window.c.score).filter(window.c.running >= fraction * window.c.total).label(name)
+                for name, fraction in PERCENTILES.items()
+            ),
+        )
+        .group_by(window.c.test_id, window.c.title)
+        .order_by(window.c.test_id)
+    )
+    rows = (await session.execute(stmt)).all()
+    if not rows:
+        return []
+
+    test_ids = [row.test_id for row in rows]
+    histograms: dict[UUID, list[ScoreBucket]] = {test_id: [] for test_id in test_ids}
+    buckets = await session.execute(
+        select(ScoreHistogram.test_id, ScoreHistogram.score, ScoreHistogram.count)
+        .where(ScoreHistogram.test_id.in_(test_ids), ScoreHistogram.count > 0)
+        .order_by(ScoreHistogram.test_id, ScoreHistogram.score)
+    )
+    for bucket in buckets:
+        histograms[bucket.test_id].append(ScoreBucket(score=bucket.score, count=bucket.count))
+
+    students = await _load_student_stats(session, test_ids) if by_student else {}
+
+    return [
+        TestScoreStats(
+            test_id=row.test_id,
+            test_title=row.title,
+            count=row.count,
+            mean=row.mean,
+            min=row.min,
+            max=row.max,
+            median=row.median,
+            p25=row.p25,
+            p75=row.p75,
+            p90=row.p90,
+            histogram=histograms[row.test_id],
+            students=students.get(row.test_id, []) if by_student else None,
+        )
+        for row in rows
+    ]
+
+
+async def _load_student_stats(session: AsyncSession, test_ids: list[UUID]) -> dict[UUID, list[StudentScoreStats]]:
+    """Статистика по студентам считается по самой таблице result.
+
+    Медиана — среднее одного или двух центральных значений, найденных
+    через row_number() внутри пары (тест, студент).
+    """
+    ranked = (
+        select(
+            Result.test_id,
+            Result.student_id,
+            Result.score,
+            func.row_number()
+            .over(partition_by=(Result.test_id, Result.student_id), order_by=Result.score)
+            .label("position"),
+            func.count().over(partition_by=(Result.test_id, Result.student_id)).label("total"),
+        )
+        .where(Result.test_id.in_(test_ids))
+        .subquery()
+    )
+    middle = (ranked.c.position == (ranked.c.total + 1) // 2) | (ranked.c.position == (ranked.c.total + 2) // 2)
+    stmt = (
+        select(
+            ranked.c.test_id,
+            ranked.c.student_id,
+            func.count().label("count"),
+            func.avg(cast(ranked.c.score, Float)).label("mean"),
+            func.avg(cast(ranked.c.score, Float)).filter(middle).label("median"),
+            func.min(ranked.c.score).label("min"),
+            func.max(ranked.c.score).label("max"),
+        )
+        .group_by(ranked.c.test_id, ranked.c.student_id)
+        .order_by(ranked.c.test_id, ranked.c.student_id)
+    )
+    students: dict[UUID, list[StudentScoreStats]] = {}
+    for row in await session.execute(stmt):
+        students.setdefault(row.test_id, []).append(
+            StudentScoreStats(
+                student_id=row.student_id,
+                count=row.count,
+                mean=row.mean,
+                median=row.median,
+                min=row.min,
+                max=row.max,
+            )
+        )
+    return students
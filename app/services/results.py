@@ -0,0 +1,122 @@
+import csv
+import io
+import json
+from dataclasses import dataclass
+from datetime import datetime
+from typing import AsyncIterator, Optional
+from uuid import UUID
+
+from sqlalchemy import Select, select, tuple_
+
+from app.database import db_helper
+from app.models import Result, Test, User
+
+EXPORT_PARTITION_SIZE = 1000
+EXPORT_COLUMNS = (
+    "id", "test_id", "test_title", "student_id", "username",
+    "last_name", "first_name", "middle_name", "score", "created_at",
+)
+
+
+def _json_default(value):
+    return value.isoformat() if isinstance(value, datetime) else str(value)
+
+
+class InvalidCursor(ValueError):
+    """Курсор страницы не удалось разобрать"""
+
+
+@dataclass(slots=True)
+class ResultFilters:
+    test_id: Optional[UUID] = None
+    student_id: Optional[UUID] = None
+    date_from: Optional[datetime] = None
+    date_to: Optional[datetime] = None
+
+    def apply(self, stmt: Select) -> Select:
+        if self.test_id is not None:
+            stmt = stmt.where(Result.test_id == self.test_id)
+        if self.student_id is not None:
+            stmt = stmt.where(Result.student_id == self.student_id)
+        if self.date_from is not None:
+            stmt = stmt.where(Result.created_at >= self.date_from)
+        if self.date_to is not None:
+            stmt = stmt.where(Result.created_at < self.date_to)
+        return stmt
+
+
+def encode_cursor(created_at: datetime, result_id: UUID) -> str:
+    return f"{created_at.isoformat()}_{result_id}"
+
+
+def decode_cursor(cursor: str) -> tuple[datetime, UUID]:
+    try:
+        created_at, result_id = cursor.rsplit("_", 1)
+        return datetime.fromisoformat(created_at), UUID(result_id)
+    except ValueError as exc:
+        raise InvalidCursor() from exc
+
+
+def results_page_query(filters: ResultFilters, limit: int, cursor: Optional[str] = None) -> Select:
+    """Страница результатов от новых к старым, ключ — (created_at, id)"""
+    stmt = filters.apply(
+        select(
+            Result.id,
+            Result.test_id,
+            Result.student_id,
+            Result.score,
+            Result.created_at,
+            Test.title.label("test_title"),
+        ).join(Test, Result.test_id == Test.id)
+    )
+    if cursor is not None:
+        stmt = stmt.where(tuple_(Result.created_at, Result.id) < decode_cursor(cursor))
+    return stmt.order_by(Result.created_at.desc(), Result.id.desc()).limit(limit)
+
+
+async def export_results(filters: ResultFilters, fmt: str) -> AsyncIterator[bytes]:
+    """Выгрузка журнала в CSV или NDJSON серверным курсором.
+
+    Строки читаются порциями по EXPORT_PARTITION_SIZE и сразу уходят
+    клиенту, весь результат в памяти не собирается.
+    """
+    stmt = filters.apply(
+        select(
+            Result.id,
+            Result.test_id,
+            Test.title,
+            Result.student_id,
+            User.username,
+            User.last_name,
+            User.first_name,
+            User.middle_name,
+            Result.score,
+            Result.created_at,
+        )
+        .join(Test, Result.test_id == Test.id)
+        .join(User, Result.student_id == User.id)
+        .order_by(Result.created_at, Result.id)
+    ).execution_options(yield_per=EXPORT_PARTITION_SIZE)
+
+    if fmt == "csv":
+        buffer = io.StringIO()
+        writer = csv.writer(buffer)
+        writer.writerow(EXPORT_COLUMNS)
+        yield buffer.getvalue().encode()
+
+    async with db_helper.session_factory() as session:
+        result = await session.stream(stmt)
+        async for partition in result.partitions():
+            if fmt == "csv":
+                buffer = io.StringIO()
+                writer = csv.writer(buffer)
+                writer.writerows(
+                    [row.isoformat() if isinstance(row, datetime) else row for row in values]
+                    for values in partition
+                )
+                yield buffer.getvalue().encode()
+            else:
+                yield "".join(
+                    json.dumps(dict(zip(EXPORT_COLUMNS, values)), ensure_ascii=False, default=_json_default) + "\n"
+                    for values in partition
+                ).encode()
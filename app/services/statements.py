@@ -0,0 +1,72 @@
+"""Заранее построенные запросы горячих путей.
+
+Каждый запрос обёрнут в ``lambda_stmt``: SQLAlchemy строит конструкцию
+и ключ кэша один раз на место вызова лямбды, а дальше лишь подставляет
+значения замкнутых переменных как параметры и берёт скомпилированный
+SQL из кэша. Текст запроса при этом не меняется от вызова к вызову,
+так что psycopg после ``prepare_threshold`` выполнений переводит его
+в подготовленный на сервере.
+
+Внутри лямбд допустимы только параметры-значения: всё, что меняет
+структуру запроса (условные where, списки переменной длины), сюда
+не подходит.
+"""
+from uuid import UUID
+
+from sqlalchemy import StatementLambdaElement, func, lambda_stmt, or_, select
+from sqlalchemy.orm import selectinload
+
+from app.models import Answer, Question, Test, Token, User
+
+
+def token_user_query(token_id: str) -> StatementLambdaElement:
+    """Владелец действующего токена и срок действия (get_current_user)"""
+    return lambda_stmt(
+        lambda: select(User, Token.expires_at)
+        .join(Token, Token.user_id == User.id)
+        .where(Token.id == token_id)
+        .where(or_(Token.expires_at.is_(None), Token.expires_at > func.now()))
+    )
+
+
+def full_test_query(test_id: UUID) -> StatementLambdaElement:
+    """Тест с вопросами и ответами (get_test для преподавателя, create_test)"""
+    return lambda_stmt(
+        lambda: select(Test)
+        .options(selectinload(Test.questions).selectinload(Question.answers))
+        .where(Test.id == test_id)
+    )
+
+
+def student_snapshot_query(test_id: UUID) -> StatementLambdaElement:
+    """Колонки для снимка теста без правильных ответов (get_test для студента)"""
+    return lambda_stmt(
+        lambda: select(
+            Test.title,
+            Test.shuffle_questions,
+            Test.shuffle_answers,
+            Test.draw_count,
+            Test.time_limit_minutes,
+            Question.id,
+            Question.text,
+            Answer.id,
+            Answer.text,
+        )
+        .select_from(Test)
+        .outerjoin(Question, Question.test_id == Test.id)
+        .outerjoin(Answer, Answer.question_id == Question.id)
+        .where(Test.id == test_id)
+        .order_by(Question.id, Answer.id)
+    )
+
+
+def answer_key_query(test_id: UUID) -> StatementLambdaElement:
+    """Строки ключа ответов (submit_test)"""
+    return lambda_stmt(
+        lambda: select(Test.draw_count, Test.time_limit_minutes, Question.id, Answer.id, Answer.is_correct)
+        .select_from(Test)
+        .outerjoin(Question, Question.test_id == Test.id)
+        .outerjoin(Answer, Answer.question_id == Question.id)
+        .where(Test.id == test_id)
+        .order_by(Question.id, Answer.id)
+    )
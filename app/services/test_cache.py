@@ -0,0 +1,164 @@
+import time
+from collections import OrderedDict
+from typing import Optional, Protocol
+from uuid import UUID
+
+from app.config import settings
+
+
+class SnapshotBackend(Protocol):
+    """Общее для всех воркеров хранилище снимков (Redis, memcached и т.п.)"""
+
+    async def get(self, key: str) -> Optional[bytes]: ...
+
+    async def set(self, key: str, value: bytes, ttl: float) -> None: ...
+
+    async def delete(self, *keys: str) -> None: ...
+
+    async def incr(self, key: str) -> int: ...
+
+
+class TestSnapshotCache:
+    """Кэш готовых JSON-снимков теста с вопросами и ответами.
+
+    Снимок хранится уже сериализованным, поэтому попадание в кэш отдаёт
+    байты без обращения к БД и без повторной валидации Pydantic.
+    У каждого теста есть версия, которая растёт при инвалидации: снимок,
+    собранный по данным до изменения, в кэш уже не попадёт.
+
+    С общим хранилищем (``backend``) версия живёт в нём и сверяется перед
+    выдачей локального снимка, так что изменение на одном воркере видно
+    всем. Без хранилища инвалидация доходит только до воркера, принявшего
+    изменение, поэтому при нескольких воркерах локальные снимки живут
+    не дольше ``unshared_ttl``.
+    """
+
+    VIEWS = ("full", "student")
+
+    def __init__(
+        self,
+        max_size: int = 1_000,
+        ttl: float = 60.0,
+        enabled: bool = True,
+        workers: int = 1,
+        unshared_ttl: float = 5.0,
+    ) -> None:
+        self.max_size = max_size
+        self.ttl = ttl
+        self.enabled = enabled
+        self.workers = workers
+        self.unshared_ttl = unshared_ttl
+        self.backend: Optional[SnapshotBackend] = None
+        self._entries: OrderedDict[tuple[UUID, str], tuple[float, bytes]] = OrderedDict()
+        self._versions: dict[UUID, int] = {}
+        self.hits = 0
+        self.backend_hits = 0
+        self.misses = 0
+
+    @property
+    def shared(self) -> bool:
+        """Инвалидация доходит до всех воркеров"""
+        return self.backend is not None or self.workers == 1
+
+    def version(self, test_id: UUID) -> int:
+        """Последняя известная процессу версия теста"""
+        return self._versions.get(test_id, 0)
+
+    async def refresh_version(self, test_id: UUID) -> int:
+        """Версия теста из общего хранилища, без него — локальная.
+
+        Если версию поднял другой воркер, локальные снимки теста выбрасываются.
+        """
+        if self.backend is None:
+            return self.version(test_id)
+        data = await self.backend.get(self._version_key(test_id))
+        version = int(data) if data else 0
+        if version != self.version(test_id):
+            self._versions[test_id] = version
+            self._drop(test_id)
+        return version
+
+    async def get(self, test_id: UUID, view: str = "full") -> Optional[bytes]:
+        if not self.enabled:
+            return None
+        await self.refresh_version(test_id)
+
+        key = (test_id, view)
+        entry = self._entries.get(key)
+        if entry is not None:
+            deadline, data = entry
+            if deadline > time.monotonic():
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return data
+            del self._entries[key]
+
+        if self.backend is not None:
+            data = await self.backend.get(self._backend_key(test_id, view))
+            if data is not None:
+                self._store(key, data)
+                self.backend_hits += 1
+                return data
+
+        self.misses += 1
+        return None
+
+    async def set(self, test_id: UUID, data: bytes, version: int, view: str = "full") -> None:
+        # Версию перечитываем: пока снимок собирался, тест могли изменить на другом воркере
+        if not self.enabled or version != await self.refresh_version(test_id):
+            return
+        self._store((test_id, view), data)
+        if self.backend is not None:
+            await self.backend.set(self._backend_key(test_id, view), data, self.ttl)
+
+    async def invalidate(self, test_id: UUID) -> None:
+        if self.backend is not None:
+            self._versions[test_id] = await self.backend.incr(self._version_key(test_id))
+        else:
+            self._versions[test_id] = self.version(test_id) + 1
+        self._drop(test_id)
+        if self.backend is not None:
+            await self.backend.delete(*(self._backend_key(test_id, view) for view in self.VIEWS))
+
+    def clear(self) -> None:
+        self._entries.clear()
+
+    def stats(self) -> dict:
+        return {
+            "enabled": self.enabled,
+            "shared": self.shared,
+            "size": len(self._entries),
+            "max_size": self.max_size,
+            "hits": self.hits,
+            "backend_hits": self.backend_hits,
+            "misses": self.misses,
+            "backend": type(self.backend).__name__ if self.backend is not None else None,
+        }
+
+    def _drop(self, test_id: UUID) -> None:
+        for view in self.VIEWS:
+            self._entries.pop((test_id, view), None)
+
+    def _store(self, key: tuple[UUID, str], data: bytes) -> None:
+        ttl = self.ttl if self.shared else min(self.ttl, self.unshared_ttl)
+        self._entries[key] = (time.monotonic() + ttl, data)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_size:
+            self._entries.popitem(last=False)
+
+    @staticmethod
+    def _backend_key(test_id: UUID, view: str) -> str:
+        return f"test-snapshot:{test_id}:{view}"
+
+    @staticmethod
+    def _version_key(test_id: UUID) -> str:
+        return f"test-version:{test_id}"
+
+
+test_cache = TestSnapshotCache(
+    max_size=settings.test_cache.max_size,
+    ttl=settings.test_cache.ttl.total_seconds(),
+    enabled=settings.test_cache.enabled,
+    workers=settings.run.workers,
+    unshared_ttl=settings.test_cache.unshared_ttl.total_seconds(),
+)
@@ -0,0 +1,96 @@
+import json
+from typing import Optional
+from uuid import UUID, uuid4
+
+from sqlalchemy import insert
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.models import Answer, Question, Test
+from app.schemas import TestCreateFull
+from app.services.statements import student_snapshot_query
+
+
+# Postgres ограничивает число параметров в запросе (65535)
+INSERT_CHUNK_SIZE = 1000
+
+
+class TestRows:
+    """Строки для пакетной вставки тестов с вопросами и ответами"""
+
+    def __init__(self) -> None:
+        self.tests: list[dict] = []
+        self.questions: list[dict] = []
+        self.answers: list[dict] = []
+
+    def add(self, test_data: TestCreateFull, author_id: UUID) -> UUID:
+        # Идентификаторы генерируем на клиенте, чтобы не ждать их от БД
+        test_id = uuid4()
+        self.tests.append({
+            "id": test_id,
+            "title": test_data.title,
+            "author_id": author_id,
+            "shuffle_questions": test_data.shuffle_questions,
+            "shuffle_answers": test_data.shuffle_answers,
+            "draw_count": test_data.draw_count,
+            "time_limit_minutes": test_data.time_limit_minutes,
+        })
+        for question_data in test_data.questions:
+            question_id = uuid4()
+            self.questions.append({"id": question_id, "test_id": test_id, "text": question_data.text})
+            self.answers.extend(
+                {
+                    "id": uuid4(),
+                    "question_id": question_id,
+                    "text": answer_data.text,
+                    "is_correct": answer_data.is_correct,
+                }
+                for answer_data in question_data.answers
+            )
+        return test_id
+
+    async def insert(self, session: AsyncSession) -> None:
+        """Многострочные INSERT'ы без коммита — транзакцией управляет вызывающий"""
+        for model, rows in ((Test, self.tests), (Question, self.questions), (Answer, self.answers)):
+            for start in range(0, len(rows), INSERT_CHUNK_SIZE):
+                await session.execute(insert(model).values(rows[start:start + INSERT_CHUNK_SIZE]))
+
+
+async def create_test_full(session: AsyncSession, test_data: TestCreateFull, author_id: UUID) -> UUID:
+    rows = TestRows()
+    test_id = rows.add(test_data, author_id)
+    await rows.insert(session)
+    return test_id
+
+
+async def build_student_snapshot(session: AsyncSession, test_id: UUID) -> Optional[bytes]:
+    """Собирает JSON теста для студента (схема TestReadStudent) одним запросом.
+
+    Выбираются только нужные колонки, без ORM-объектов; is_correct
+    и автор в выборку не попадают вовсе.
+    """
+    rows = (await session.execute(student_snapshot_query(test_id))).all()
+    if not rows:
+        return None
+
+    questions: list[dict] = []
+    current: Optional[dict] = None
+    for *_, question_id, question_text, answer_id, answer_text in rows:
+        if question_id is None:
+            continue
+        if current is None or current["id"] != str(question_id):
+            current = {"id": str(question_id), "text": question_text, "answers": []}
+            questions.append(current)
+        if answer_id is not None:
+            current["answers"].append({"id": str(answer_id), "text": answer_text})
+
+    title, shuffle_questions, shuffle_answers, draw_count, time_limit_minutes = rows[0][:5]
+    payload = {
+        "id": str(test_id),
+        "title": title,
+        "shuffle_questions": shuffle_questions,
+        "shuffle_answers": shuffle_answers,
+        "draw_count": draw_count,
+        "time_limit_minutes": time_limit_minutes,
+        "questions": questions,
+    }
+    return json.dumps(payload, ensure_ascii=False).encode()
@@ -0,0 +1,110 @@
+import time
+from collections import OrderedDict
+from datetime import datetime, timezone
+from typing import Optional
+from uuid import UUID
+
+from app.config import settings
+from app.schemas import CurrentUser
+
+
+class TokenCache:
+    """Ограниченный LRU-кэш "токен -> пользователь" с TTL.
+
+    Запись живёт не дольше ``ttl`` и не дольше срока действия самого токена.
+    Кэш локален для процесса: при нескольких воркерах выход из системы
+    сбрасывает запись только в текущем, остальные доживают до ``ttl``.
+    """
+
+    def __init__(self, max_size: int = 10_000, ttl: float = 300.0, enabled: bool = True) -> None:
+        self.max_size = max_size
+        self.ttl = ttl
+        self.enabled = enabled
+        self._entries: OrderedDict[str, tuple[float, CurrentUser]] = OrderedDict()
+        self._by_user: dict[UUID, set[str]] = {}
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get(self, token_id: str) -> Optional[CurrentUser]:
+        if not self.enabled:
+            return None
+
+        entry = self._entries.get(token_id)
+        if entry is None:
+            self.misses += 1
+            return None
+
+        deadline, user = entry
+        if deadline <= time.time():
+            self._remove(token_id)
+            self.misses += 1
+            return None
+
+        self._entries.move_to_end(token_id)
+        self.hits += 1
+        return user
+
+    def set(self, token_id: str, user: CurrentUser, expires_at: Optional[datetime] = None) -> None:
+        if not self.enabled:
+            return
+
+        deadline = time.time() + self.ttl
+        if expires_at is not None:
+            if expires_at.tzinfo is None:
+                # В БД время хранится без зоны, но записывается в UTC
+                expires_at = expires_at.replace(tzinfo=timezone.utc)
+            deadline = min(deadline, expires_at.timestamp())
+        if deadline <= time.time():
+            return
+
+        self._remove(token_id)
+        self._entries[token_id] = (deadline, user)
+        self._by_user.setdefault(user.id, set()).add(token_id)
+
+        while len(self._entries) > self.max_size:
+            oldest, _ = next(iter(self._entries.items()))
+            self._remove(oldest)
+            self.evictions += 1
+
+    def invalidate(self, token_id: str) -> None:
+        self._remove(token_id)
+
+    def invalidate_user(self, user_id: UUID) -> None:
+        """Сбрасывает все токены пользователя (смена роли, данных, блокировка)"""
+        for token_id in list(self._by_user.get(user_id, ())):
+            self._remove(token_id)
+
+    def clear(self) -> None:
+        self._entries.clear()
+        self._by_user.clear()
+
+    def stats(self) -> dict:
+        total = self.hits + self.misses
+        return {
+            "enabled": self.enabled,
+            "size": len(self._entries),
+            "max_size": self.max_size,
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "hit_ratio": self.hits / total if total else 0.0,
+        }
+
+    def _remove(self, token_id: str) -> None:
+        entry = self._entries.pop(token_id, None)
+        if entry is None:
+            return
+        user_id = entry[1].id
+        tokens = self._by_user.get(user_id)
+        if tokens is not None:
+            tokens.discard(token_id)
+            if not tokens:
+                del self._by_user[user_id]
+
+
+token_cache = TokenCache(
+    max_size=settings.token_cache.max_size,
+    ttl=settings.token_cache.ttl.total_seconds(),
+    enabled=settings.token_cache.enabled,
+)
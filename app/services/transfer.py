@@ -0,0 +1,239 @@
+import codecs
+import json
+from typing import Any, AsyncIterator
+from uuid import UUID
+
+from pydantic import ValidationError
+from sqlalchemy import select
+from sqlalchemy.exc import SQLAlchemyError
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.database import db_helper
+from app.models import Answer, Question, Test
+from app.schemas import TestCreateFull, TestImportError, TestImportReport
+from app.services.tests import TestRows
+
+IMPORT_BATCH_SIZE = 50
+EXPORT_PAGE_SIZE = 100
+
+_decoder = json.JSONDecoder()
+_WHITESPACE = " \t\r\n"
+
+
+class DocumentStreamError(ValueError):
+    """Тело запроса не является NDJSON или JSON-массивом"""
+
+
+async def iter_json_documents(chunks: AsyncIterator[bytes]) -> AsyncIterator[Any]:
+    """Разбирает поток байтов как NDJSON или JSON-массив документов.
+
+    Формат определяется по первому значащему символу. Буферизуется
+    только текущий документ, а не всё тело запроса.
+    """
+    utf8 = codecs.getincrementaldecoder("utf-8")()
+    buffer = ""
+    eof = False
+
+    async def fill() -> bool:
+        nonlocal buffer, eof
+        if eof:
+            return False
+        async for chunk in chunks:
+            if chunk:
+                buffer += utf8.decode(chunk)
+                return True
+        buffer += utf8.decode(b"", final=True)
+        eof = True
+        return False
+
+    while not buffer.strip(_WHITESPACE):
+        buffer = ""
+        if not await fill():
+            return
+    buffer = buffer.lstrip(_WHITESPACE)
+
+    is_array = buffer[0] == "["
+    if is_array:
+        buffer = buffer[1:]
+
+    while True:
+        if is_array:
+            buffer = buffer.lstrip(_WHITESPACE + ",")
+            if not buffer:
+                if not await fill():
+                    raise DocumentStreamError("Неожиданный конец JSON-массива")
+                continue
+            if buffer[0] == "]":
+                buffer = buffer[1:]
+                while True:
+                    if buffer.strip(_WHITESPACE):
+                        raise DocumentStreamError("Лишние данные после JSON-массива")
+                    buffer = ""
+                    if not await fill():
+                        return
+            try:
+                document, end = _decoder.raw_decode(buffer)
+            except json.JSONDecodeError as exc:
+                if await fill():
+                    continue
+                raise DocumentStreamError(f"Некорректный JSON: {exc.msg}") from exc
+            buffer = buffer[end:]
+            yield document
+        else:
+            newline = buffer.find("\n")
+            if newline == -1:
+                if await fill():
+                    continue
+                line, buffer = buffer, ""
+            else:
+                line, buffer = buffer[:newline], buffer[newline + 1:]
+            if line.strip(_WHITESPACE):
+                try:
+                    yield json.loads(line)
+                except json.JSONDecodeError as exc:
+                    raise DocumentStreamError(f"Некорректная строка NDJSON: {exc.msg}") from exc
+            if eof and not buffer:
+                return
+
+
+async def import_tests(
+    session: AsyncSession,
+    documents: AsyncIterator[Any],
+    author_id: UUID,
+    batch_size: int = IMPORT_BATCH_SIZE,
+) -> TestImportReport:
+    """Импортирует тесты пачками, по транзакции на пачку.
+
+    Ошибка валидации отклоняет только свой документ. Если пачка не
+    записалась целиком, её документы повторяются по одному, чтобы найти
+    виновника и сохранить остальные.
+    """
+    report = TestImportReport()
+    pending: list[tuple[int, TestCreateFull]] = []
+
+    async def flush() -> None:
+        rows = TestRows()
+        ids = [rows.add(test_data, author_id) for _, test_data in pending]
+        try:
+            await rows.insert(session)
+            await session.commit()
+            report.test_ids.extend(ids)
+        except SQLAlchemyError:
+            await session.rollback()
+            for index, test_data in pending:
+                single = TestRows()
+                test_id = single.add(test_data, author_id)
+                try:
+                    await single.insert(session)
+                    await session.commit()
+                    report.test_ids.append(test_id)
+                except SQLAlchemyError as exc:
+                    await session.rollback()
+                    report.errors.append(TestImportError(index=index, detail=str(getattr(exc, "orig", None) or exc)))
+        pending.clear()
+
+    index = -1
+    try:
+        async for index, document in _enumerate(documents):
+            try:
+                pending.append((index, TestCreateFull.model_validate(document)))
+            except ValidationError as exc:
+                report.errors.append(TestImportError(index=index, detail=str(exc)))
+                continue
+            if len(pending) >= batch_size:
+                await flush()
+    except DocumentStreamError as exc:
+        report.errors.append(TestImportError(index=index + 1, detail=str(exc)))
+
+    if pending:
+        await flush()
+
+    report.imported = len(report.test_ids)
+    return report
+
+
+async def _enumerate(documents: AsyncIterator[Any]) -> AsyncIterator[tuple[int, Any]]:
+    index = 0
+    async for document in documents:
+        yield index, document
+        index += 1
+
+
+async def export_tests(author_id: UUID | None = None) -> AsyncIterator[bytes]:
+    """Отдаёт тесты с вопросами и ответами построчно в NDJSON.
+
+    Тесты читаются страницами по ключу, поэтому в памяти одновременно
+    находится не больше EXPORT_PAGE_SIZE тестов. Сессия открывается
+    здесь же, так как живёт дольше обработчика запроса.
+    """
+    async with db_helper.session_factory() as session:
+        last_id: UUID | None = None
+        while True:
+            stmt = (
+                select(
+                    Test.id,
+                    Test.title,
+                    Test.author_id,
+                    Test.shuffle_questions,
+                    Test.shuffle_answers,
+                    Test.draw_count,
+                    Test.time_limit_minutes,
+                )
+                .order_by(Test.id)
+                .limit(EXPORT_PAGE_SIZE)
+            )
+            if author_id is not None:
+                stmt = stmt.where(Test.author_id == author_id)
+            if last_id is not None:
+                stmt = stmt.where(Test.id > last_id)
+            tests = (await session.execute(stmt)).all()
+            if not tests:
+                break
+            last_id = tests[-1].id
+
+            test_ids = [test.id for test in tests]
+            questions = (
+                await session.execute(
+                    select(Question.id, Question.test_id, Question.text)
+                    .where(Question.test_id.in_(test_ids))
+                    .order_by(Question.id)
+                )
+            ).all()
+            answers = (
+                await session.execute(
+                    select(Answer.id, Answer.question_id, Answer.text, Answer.is_correct)
+                    .join(Question, Answer.question_id == Question.id)
+                    .where(Question.test_id.in_(test_ids))
+                    .order_by(Answer.id)
+                )
+            ).all()
+            # Фиксируем снимок страницы и отпускаем соединение до следующей
+            await session.commit()
+
+            answers_by_question: dict[UUID, list[dict]] = {}
+            for answer in answers:
+                answers_by_question.setdefault(answer.question_id, []).append(
+                    {"id": str(answer.id), "text": answer.text, "is_correct": answer.is_correct}
+                )
+            questions_by_test: dict[UUID, list[dict]] = {}
+            for question in questions:
+                questions_by_test.setdefault(question.test_id, []).append(
+                    {
+                        "id": str(question.id),
+                        "text": question.text,
+                        "answers": answers_by_question.get(question.id, []),
+                    }
+                )
+
+            for test in tests:
+                line = {
+                    "id": str(test.id),
+                    "title": test.title,
+                    "author_id": str(test.author_id),
+                    "shuffle_questions": test.shuffle_questions,
+                    "shuffle_answers": test.shuffle_answers,
+                    "draw_count": test.draw_count,
+                    "time_limit_minutes": test.time_limit_minutes,
+                    "questions": questions_by_test.get(test.id, []),
+                }
+                yield (json.dumps(line, ensure_ascii=False) + "\n").encode()
@@ -0,0 +1,141 @@
+import hashlib
+import json
+import random
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Optional
+from uuid import UUID
+
+from app.config import settings
+from app.services.test_cache import test_cache
+
+
+def variant_rng(student_id: UUID, test_id: UUID) -> random.Random:
+    """Генератор варианта: один и тот же для пары студент–тест в любом процессе"""
+    digest = hashlib.blake2b(student_id.bytes + test_id.bytes, digest_size=8).digest()
+    return random.Random(int.from_bytes(digest, "big"))
+
+
+def _draw(rng: random.Random, question_count: int, draw_count: Optional[int]) -> Optional[list[int]]:
+    # Выборка делается первой, чтобы набор вопросов не зависел от перемешивания
+    if draw_count is None or draw_count >= question_count:
+        return None
+    return rng.sample(range(question_count), draw_count)
+
+
+def drawn_questions(
+    student_id: UUID, test_id: UUID, question_count: int, draw_count: Optional[int]
+) -> Optional[frozenset[int]]:
+    """Позиции вопросов, доставшихся студенту; None — достались все"""
+    drawn = _draw(variant_rng(student_id, test_id), question_count, draw_count)
+    return frozenset(drawn) if drawn is not None else None
+
+
+@dataclass(frozen=True, slots=True)
+class StudentLayout:
+    """Снимок теста для студента, разобранный на готовые JSON-фрагменты.
+
+    Вариант студента собирается склейкой фрагментов в нужном порядке,
+    без повторной сериализации. Позиции вопросов совпадают с ключом
+    ответов: и там, и там вопросы упорядочены по id.
+    """
+
+    test_id: UUID
+    shuffle_questions: bool
+    shuffle_answers: bool
+    draw_count: Optional[int]
+    header: bytes
+    questions: tuple[tuple[bytes, tuple[bytes, ...]], ...]
+
+    @property
+    def personalized(self) -> bool:
+        return self.shuffle_questions or self.shuffle_answers or (
+            self.draw_count is not None and self.draw_count < len(self.questions)
+        )
+
+    @classmethod
+    def from_snapshot(cls, test_id: UUID, data: bytes) -> "StudentLayout":
+        payload = json.loads(data)
+        questions = payload.pop("questions")
+        header = json.dumps(payload, ensure_ascii=False)[:-1] + ', "questions": ['
+        return cls(
+            test_id=test_id,
+            shuffle_questions=payload.get("shuffle_questions", False),
+            shuffle_answers=payload.get("shuffle_answers", False),
+            draw_count=payload.get("draw_count"),
+            header=header.encode(),
+            questions=tuple(
+                (
+                    (
+                        '{"id": ' + json.dumps(question["id"])
+                        + ', "text": ' + json.dumps(question["text"], ensure_ascii=False)
+                        + ', "answers": ['
+                    ).encode(),
+                    tuple(json.dumps(answer, ensure_ascii=False).encode() for answer in question["answers"]),
+                )
+                for question in questions
+            ),
+        )
+
+    def render(self, student_id: UUID) -> bytes:
+        rng = variant_rng(student_id, self.test_id)
+        order = _draw(rng, len(self.questions), self.draw_count)
+        if order is None:
+            order = list(range(len(self.questions)))
+            if self.shuffle_questions:
+                rng.shuffle(order)
+        elif not self.shuffle_questions:
+            order.sort()
+
+        parts = []
+        for ordinal in order:
+            head, answers = self.questions[ordinal]
+            if self.shuffle_answers:
+                answers = list(answers)
+                rng.shuffle(answers)
+            parts.append(head + b", ".join(answers) + b"]}")
+        return self.header + b", ".join(parts) + b"]}"
+
+
+class StudentLayoutCache:
+    """LRU разобранных снимков, действителен пока совпадают версия теста и сам снимок.
+
+    Сверка снимка нужна при нескольких воркерах без общего хранилища:
+    там новый снимок может прийти с прежней локальной версией.
+    """
+
+    def __init__(self, max_size: int = 1_000, ttl: float = 60.0) -> None:
+        self.max_size = max_size
+        self.ttl = ttl
+        self._entries: OrderedDict[UUID, tuple[float, int, bytes, StudentLayout]] = OrderedDict()
+
+    def get(self, test_id: UUID, data: bytes, version: int) -> StudentLayout:
+        entry = self._entries.get(test_id)
+        if entry is not None:
+            deadline, cached_version, cached_data, layout = entry
+            # Снимок из кэша — тот же объект, и сравнение не доходит до содержимого
+            if deadline > time.monotonic() and cached_version == version and cached_data == data:
+                self._entries.move_to_end(test_id)
+                return layout
+        layout = StudentLayout.from_snapshot(test_id, data)
+        if version == test_cache.version(test_id):
+            self._entries[test_id] = (time.monotonic() + self.ttl, version, data, layout)
+            self._entries.move_to_end(test_id)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+        return layout
+
+
+student_layouts = StudentLayoutCache(
+    max_size=settings.test_cache.max_size,
+    ttl=settings.test_cache.ttl.total_seconds(),
+)
+
+
+def personalize(test_id: UUID, data: bytes, version: int, student_id: UUID) -> bytes:
+    """Вариант теста для студента; тест без перемешивания отдаётся как есть"""
+    layout = student_layouts.get(test_id, data, version)
+    if not layout.personalized:
+        return data
+    return layout.render(student_id)
@@ -0,0 +1,48 @@
+"""Плагин pytest: бюджеты запросов к БД для обработчиков.
+
+Подключается в pytest.ini (``-p app.testing``). Запросы считаются через
+contextvars, поэтому приложение должно выполняться в той же задаче,
+что и тест, — например, через ``httpx.AsyncClient(transport=ASGITransport(app))``::
+
+    async def test_get_test(client, query_budget):
+        with query_budget(max_queries=3):
+            await client.get(f"/tests/tests/{test_id}", headers=headers)
+
+Фикстуры client и пользователей — в tests/conftest.py, бюджеты
+обработчиков — в tests/test_query_budgets.py.
+"""
+from contextlib import contextmanager
+from typing import Callable, ContextManager, Iterator, Optional
+
+import pytest
+
+from app.services.db_metrics import QueryStats, track_queries
+
+
+@contextmanager
+def assert_query_budget(
+    max_queries: Optional[int] = None,
+    max_db_time_ms: Optional[float] = None,
+    n_plus_one_threshold: Optional[int] = 5,
+) -> Iterator[QueryStats]:
+    """Проваливает тест, если блок превысил бюджет запросов или содержит N+1"""
+    with track_queries(record_shapes=True) as stats:
+        yield stats
+
+    problems = []
+    if max_queries is not None and stats.count > max_queries:
+        problems.append(f"запросов {stats.count}, допустимо {max_queries}")
+    if max_db_time_ms is not None and stats.duration_ms > max_db_time_ms:
+        problems.append(f"время в БД {stats.duration_ms:.1f} мс, допустимо {max_db_time_ms} мс")
+    if n_plus_one_threshold is not None:
+        for shape, count in stats.repeated(n_plus_one_threshold):
+            problems.append(f"N+1: {count} раз {shape}")
+    if problems:
+        statements = "\n".join(f"  {count} x {shape}" for shape, count in stats.shapes.most_common())
+        pytest.fail("Превышен бюджет запросов: " + "; ".join(problems) + "\n" + statements, pytrace=False)
+
+
+@pytest.fixture
+def query_budget() -> Callable[..., ContextManager[QueryStats]]:
+    """Контекстный менеджер assert_query_budget"""
+    return assert_query_budget
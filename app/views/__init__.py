@@ -0,0 +1,9 @@
+"""Страницы на fastui.
+
+Необязательная часть: fastui ставится отдельно (``uv sync --extra ui``
+или ``pip install .[ui]``), приложение эти модули при старте не импортирует.
+"""
+try:
+    import fastui  # noqa: F401
+except ImportError as exc:
+    raise ImportError("Для app.views нужен fastui: установите extra ui (uv sync --extra ui)") from exc
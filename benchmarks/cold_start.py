@@ -0,0 +1,123 @@
+"""Время до первого запроса: от запуска процесса сервера до первого ответа.
+
+    python -m benchmarks.cold_start --runs 5
+    python -m benchmarks.cold_start --no-warm-up
+    python -m benchmarks.cold_start --save-baseline cold_start.json
+    python -m benchmarks.cold_start --baseline cold_start.json --tolerance 0.25
+
+Каждый прогон запускает ``python -m uvicorn main:app`` (один воркер) на
+свободном порту и раз в ``--poll`` секунд опрашивает сервер. Замеряются
+два момента: первый ответ /health/live (импорт приложения и lifespan
+позади, сервер принимает соединения) и первый 200 от /health/ready
+(БД отвечает). Нужна БД из APP_CONFIG__DATABASE__URL.
+
+С ``--baseline`` медианы сравниваются с сохранённым JSON, и прогон
+завершается с кодом 1, если старт стал дольше больше чем на ``--tolerance``.
+"""
+import argparse
+import json
+import os
+import socket
+import statistics
+import subprocess
+import sys
+import time
+import urllib.error
+import urllib.request
+
+STAGES = ("first_response", "ready")
+
+
+def free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def status(url: str) -> int | None:
+    try:
+        with urllib.request.urlopen(url, timeout=1) as response:
+            return response.status
+    except urllib.error.HTTPError as exc:
+        return exc.code
+    except OSError:
+        return None
+
+
+def run_once(args: argparse.Namespace) -> dict[str, float]:
+    port = free_port()
+    env = dict(os.environ, APP_CONFIG__RUN__WARM_UP=str(args.warm_up).lower())
+    base_url = f"http://127.0.0.1:{port}"
+    started_at = time.perf_counter()
+    server = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "main:app", "--host", "127.0.0.1", "--port", str(port), "--log-level", "warning"],
+        env=env,
+        stdout=subprocess.DEVNULL,
+        stderr=subprocess.DEVNULL,
+    )
+    timings: dict[str, float] = {}
+    try:
+        deadline = started_at + args.timeout
+        while time.perf_counter() < deadline:
+            if server.poll() is not None:
+                raise RuntimeError(f"Сервер завершился с кодом {server.returncode}")
+            if "first_response" not in timings and status(f"{base_url}/health/live") is not None:
+                timings["first_response"] = time.perf_counter() - started_at
+            if "first_response" in timings and status(f"{base_url}/health/ready") == 200:
+                timings["ready"] = time.perf_counter() - started_at
+                return timings
+            time.sleep(args.poll)
+        raise RuntimeError(f"Сервер не стал готов за {args.timeout} с")
+    finally:
+        server.terminate()
+        server.wait()
+
+
+def compare(report: dict, baseline: dict, tolerance: float) -> list[str]:
+    regressions = []
+    for stage in STAGES:
+        previous = baseline.get(stage, {}).get("median")
+        if previous and report[stage]["median"] > previous * (1 + tolerance):
+            regressions.append(f"{stage}: {previous * 1000:.0f} -> {report[stage]['median'] * 1000:.0f} мс")
+    return regressions
+
+
+def main(args: argparse.Namespace) -> int:
+    runs = [run_once(args) for _ in range(args.runs)]
+    report = {
+        stage: {
+            "min": min(run[stage] for run in runs),
+            "median": statistics.median(run[stage] for run in runs),
+            "max": max(run[stage] for run in runs),
+        }
+        for stage in STAGES
+    }
+
+    print(f"{'stage':<16}{'min ms':>9}{'median ms':>11}{'max ms':>9}")
+    for stage, row in report.items():
+        print(f"{stage:<16}{row['min'] * 1000:>9.0f}{row['median'] * 1000:>11.0f}{row['max'] * 1000:>9.0f}")
+    print(f"прогонов: {args.runs}, прогрев пула: {'да' if args.warm_up else 'нет'}")
+
+    if args.save_baseline:
+        with open(args.save_baseline, "w") as file:
+            json.dump(report, file, indent=2)
+    if args.baseline:
+        with open(args.baseline) as file:
+            regressions = compare(report, json.load(file), args.tolerance)
+        for line in regressions:
+            print(f"РЕГРЕССИЯ {line}", file=sys.stderr)
+        if regressions:
+            return 1
+    return 0
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--warm-up", action=argparse.BooleanOptionalAction, default=True, help="Прогрев пула при старте")
+    parser.add_argument("--poll", type=float, default=0.01)
+    parser.add_argument("--timeout", type=float, default=60.0)
+    parser.add_argument("--save-baseline", metavar="PATH")
+    parser.add_argument("--baseline", metavar="PATH")
+    parser.add_argument("--tolerance", type=float, default=0.2)
+    sys.exit(main(parser.parse_args()))
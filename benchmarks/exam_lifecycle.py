@@ -0,0 +1,248 @@
+"""Нагрузочный прогон полного цикла экзамена: вход, получение теста, сдача, результаты.
+
+Запуск против PostgreSQL из APP_CONFIG__DATABASE__URL (схема должна быть
+создана миграциями) или против временной SQLite (нужен aiosqlite):
+
+    python -m benchmarks.exam_lifecycle --students 200 --concurrency 50
+    python -m benchmarks.exam_lifecycle --sqlite --save-baseline baseline.json
+    python -m benchmarks.exam_lifecycle --baseline baseline.json --tolerance 0.25
+
+Данные генерируются детерминированно из ``--seed``: преподаватели,
+тесты с вопросами и ответами, студенты с общим паролем. Каждый студент
+проходит цикл целиком; одновременно идут ``--concurrency`` студентов.
+Запросы по умолчанию идут в приложение через ASGI в том же процессе,
+с ``--base-url`` — в запущенный сервер по сети (он должен смотреть в ту
+же БД).
+
+Отчёт — p50/p95/p99 и пропускная способность по каждому шагу. С
+``--baseline`` прогон сравнивается с сохранённым JSON и завершается с
+кодом 1, если p95 вырос или пропускная способность упала больше чем на
+``--tolerance``.
+"""
+import argparse
+import asyncio
+import json
+import os
+import random
+import sys
+import tempfile
+import time
+from collections import defaultdict
+from uuid import uuid4
+
+# Настройки требуют URL PostgreSQL даже тогда, когда прогон идёт на SQLite
+if "--sqlite" in sys.argv:
+    os.environ.setdefault("APP_CONFIG__DATABASE__URL", "postgresql+psycopg://unused@localhost/unused")
+
+from httpx import ASGITransport, AsyncClient
+from sqlalchemy import insert
+from sqlmodel import SQLModel
+
+from app.database import DatabaseHelper, db_helper
+from app.models import Answer, Question, Role, Test, User
+from app.services.passwords import hash_password
+from app.services.result_batcher import result_batcher
+
+PASSWORD = "bench-password"
+STEPS = ("login", "get_test", "submit", "list_results")
+
+
+def use_sqlite(path: str) -> None:
+    """Подменяет движок приложения на SQLite-файл"""
+    helper = DatabaseHelper(url=f"sqlite+aiosqlite:///{path}", pool_size=5, max_overflow=10)
+    db_helper.engine = helper.engine
+    db_helper.session_factory = helper.session_factory
+    db_helper.pool_metrics = helper.pool_metrics
+
+
+async def seed(args: argparse.Namespace) -> tuple[list[str], list[str]]:
+    """Создаёт пользователей и тесты, возвращает логины студентов и id тестов"""
+    rng = random.Random(args.seed)
+    run = f"{args.seed}-{uuid4().hex[:8]}"
+    password_hash = hash_password(PASSWORD)
+
+    def user(role: Role, index: int) -> dict:
+        name = f"bench_{role.value}_{run}_{index}"
+        return {
+            "id": uuid4(),
+            "email": f"{name}@example.com",
+            "username": name,
+            "first_name": "Bench",
+            "last_name": role.value.title(),
+            "password_hash": password_hash,
+            "role": role,
+        }
+
+    teachers = [user(Role.teacher, i) for i in range(args.teachers)]
+    students = [user(Role.student, i) for i in range(args.students)]
+
+    tests, questions, answers = [], [], []
+    for i in range(args.tests):
+        test_id = uuid4()
+        tests.append({"id": test_id, "title": f"Нагрузочный тест {i}", "author_id": rng.choice(teachers)["id"]})
+        for j in range(args.questions):
+            question_id = uuid4()
+            questions.append({"id": question_id, "test_id": test_id, "text": f"Вопрос {j}"})
+            correct = rng.randrange(args.answers)
+            for k in range(args.answers):
+                answers.append({"id": uuid4(), "question_id": question_id, "text": f"Ответ {k}", "is_correct": k == correct})
+
+    if args.sqlite:
+        async with db_helper.engine.begin() as conn:
+            await conn.run_sync(SQLModel.metadata.create_all)
+    async with db_helper.engine.begin() as conn:
+        for model, rows in ((User, teachers + students), (Test, tests), (Question, questions), (Answer, answers)):
+            await conn.execute(insert(model), rows)
+
+    return [student["username"] for student in students], [str(test["id"]) for test in tests]
+
+
+class Recorder:
+    def __init__(self) -> None:
+        self.latencies: dict[str, list[float]] = defaultdict(list)
+        self.errors: dict[str, int] = defaultdict(int)
+
+    async def call(self, step: str, request):
+        started_at = time.perf_counter()
+        response = await request
+        elapsed = time.perf_counter() - started_at
+        if response.is_success:
+            self.latencies[step].append(elapsed)
+        else:
+            self.errors[step] += 1
+        return response
+
+    def report(self, elapsed: float) -> dict:
+        report = {}
+        for step in STEPS:
+            samples = sorted(self.latencies[step])
+            report[step] = {
+                "count": len(samples),
+                "errors": self.errors[step],
+                "throughput": len(samples) / elapsed if elapsed else 0.0,
+                **{f"p{q}": percentile(samples, q) * 1000 for q in (50, 95, 99)},
+            }
+        return report
+
+
+def percentile(samples: list[float], q: int) -> float:
+    """Ближайший ранг по отсортированной выборке"""
+    if not samples:
+        return 0.0
+    return samples[min(len(samples) - 1, max(0, -(-q * len(samples) // 100) - 1))]
+
+
+async def student_flow(client: AsyncClient, recorder: Recorder, username: str, test_id: str, rng: random.Random) -> None:
+    response = await recorder.call("login", client.post("/auth/login", data={"username": username, "password": PASSWORD}))
+    if not response.is_success:
+        return
+    headers = {"Authorization": f"Bearer {response.json()['access_token']}"}
+
+    response = await recorder.call("get_test", client.get(f"/tests/tests/{test_id}", headers=headers))
+    if not response.is_success:
+        return
+    submission = {
+        "answers": [
+            {"question_id": question["id"], "answer_id": rng.choice(question["answers"])["id"]}
+            for question in response.json()["questions"]
+            if question["answers"]
+        ]
+    }
+
+    response = await recorder.call("submit", client.post(f"/tests/tests/{test_id}/submit", json=submission, headers=headers))
+    if not response.is_success:
+        return
+    await recorder.call("list_results", client.get("/results/results/", params={"limit": 20}, headers=headers))
+
+
+async def drive(args: argparse.Namespace, students: list[str], tests: list[str]) -> tuple[Recorder, float]:
+    from main import app
+
+    rng = random.Random(args.seed)
+    recorder = Recorder()
+    semaphore = asyncio.Semaphore(args.concurrency)
+    if args.base_url:
+        client = AsyncClient(base_url=args.base_url, timeout=60)
+    else:
+        client = AsyncClient(transport=ASGITransport(app=app), base_url="http://bench", timeout=60)
+
+    async def one(username: str) -> None:
+        async with semaphore:
+            await student_flow(client, recorder, username, rng.choice(tests), random.Random(rng.random()))
+
+    async with client:
+        started_at = time.perf_counter()
+        await asyncio.gather(*(one(username) for username in students))
+        elapsed = time.perf_counter() - started_at
+    return recorder, elapsed
+
+
+def compare(report: dict, baseline: dict, tolerance: float) -> list[str]:
+    regressions = []
+    for step, current in report.items():
+        previous = baseline.get(step)
+        if not previous:
+            continue
+        if previous["p95"] and current["p95"] > previous["p95"] * (1 + tolerance):
+            regressions.append(f"{step}: p95 {previous['p95']:.1f} -> {current['p95']:.1f} мс")
+        if current["throughput"] < previous["throughput"] * (1 - tolerance):
+            regressions.append(f"{step}: пропускная способность {previous['throughput']:.1f} -> {current['throughput']:.1f} /с")
+        if current["errors"] > previous["errors"]:
+            regressions.append(f"{step}: ошибок {previous['errors']} -> {current['errors']}")
+    return regressions
+
+
+async def main(args: argparse.Namespace) -> int:
+    sqlite_file = None
+    if args.sqlite:
+        sqlite_file = tempfile.NamedTemporaryFile(suffix=".sqlite", delete=False)
+        use_sqlite(sqlite_file.name)
+
+    result_batcher.enabled = args.batching
+    try:
+        students, tests = await seed(args)
+        recorder, elapsed = await drive(args, students, tests)
+    finally:
+        await result_batcher.stop()
+        await db_helper.dispose()
+        if sqlite_file is not None:
+            os.unlink(sqlite_file.name)
+
+    report = recorder.report(elapsed)
+    print(f"{'step':<14}{'count':>7}{'errors':>8}{'req/s':>9}{'p50 ms':>9}{'p95 ms':>9}{'p99 ms':>9}")
+    for step, row in report.items():
+        print(
+            f"{step:<14}{row['count']:>7}{row['errors']:>8}{row['throughput']:>9.1f}"
+            f"{row['p50']:>9.1f}{row['p95']:>9.1f}{row['p99']:>9.1f}"
+        )
+    print(f"всего {len(students)} студентов за {elapsed:.2f} с")
+
+    if args.save_baseline:
+        with open(args.save_baseline, "w") as file:
+            json.dump(report, file, indent=2)
+    if args.baseline:
+        with open(args.baseline) as file:
+            regressions = compare(report, json.load(file), args.tolerance)
+        for line in regressions:
+            print(f"РЕГРЕССИЯ {line}", file=sys.stderr)
+        if regressions:
+            return 1
+    return 0
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--students", type=int, default=200)
+    parser.add_argument("--concurrency", type=int, default=50)
+    parser.add_argument("--teachers", type=int, default=5)
+    parser.add_argument("--tests", type=int, default=20)
+    parser.add_argument("--questions", type=int, default=20)
+    parser.add_argument("--answers", type=int, default=4)
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--batching", action="store_true", help="Пакетная запись результатов")
+    parser.add_argument("--sqlite", action="store_true", help="Временная SQLite вместо PostgreSQL")
+    parser.add_argument("--base-url", help="Адрес запущенного сервера вместо ASGI в процессе")
+    parser.add_argument("--save-baseline", metavar="PATH")
+    parser.add_argument("--baseline", metavar="PATH")
+    parser.add_argument("--tolerance", type=float, default=0.2)
+    sys.exit(asyncio.run(main(parser.parse_args())))
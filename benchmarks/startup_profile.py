@@ -0,0 +1,82 @@
+"""Профиль старта: сколько времени уходит на импорт каждого модуля.
+
+    python -m benchmarks.startup_profile --top 30
+    python -m benchmarks.startup_profile --module app.database --repeat 5 --json profile.json
+
+Модуль (по умолчанию main) импортируется в отдельном процессе с
+``python -X importtime`` ``--repeat`` раз, по каждому модулю берётся
+медиана: собственное время (self) и вместе с вложенными импортами
+(cumulative). Сводка по пакетам верхнего уровня складывает self-время
+всех их модулей — видно, сколько стоят fastapi, sqlalchemy, pydantic и
+само приложение. Подключаться к БД для этого не нужно.
+"""
+import argparse
+import json
+import os
+import re
+import statistics
+import subprocess
+import sys
+from collections import defaultdict
+
+LINE = re.compile(r"^import time:\s+(\d+) \|\s+(\d+) \| (\s*)(\S+)$")
+
+
+def profile_once(module: str) -> dict[str, tuple[int, int, int]]:
+    """Модуль -> (self мкс, cumulative мкс, глубина вложенности)"""
+    env = dict(os.environ)
+    # Настройки требуют URL БД, но при импорте соединений не открывается
+    env.setdefault("APP_CONFIG__DATABASE__URL", "postgresql+psycopg://unused@localhost/unused")
+    completed = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        env=env,
+        capture_output=True,
+        text=True,
+        check=True,
+    )
+    modules = {}
+    for line in completed.stderr.splitlines():
+        match = LINE.match(line)
+        if match:
+            own, cumulative, indent, name = match.groups()
+            modules[name] = (int(own), int(cumulative), len(indent) // 2)
+    return modules
+
+
+def main(args: argparse.Namespace) -> None:
+    runs = [profile_once(args.module) for _ in range(args.repeat)]
+    names = set().union(*runs)
+    rows = {
+        name: {
+            "self_ms": statistics.median(run[name][0] for run in runs if name in run) / 1000,
+            "cumulative_ms": statistics.median(run[name][1] for run in runs if name in run) / 1000,
+            "depth": min(run[name][2] for run in runs if name in run),
+        }
+        for name in names
+    }
+    packages: dict[str, float] = defaultdict(float)
+    for name, row in rows.items():
+        packages[name.split(".")[0]] += row["self_ms"]
+    total = rows[args.module]["cumulative_ms"]
+
+    print(f"импорт {args.module}: {total:.1f} мс (медиана из {args.repeat})\n")
+    print(f"{'cumulative ms':>14}{'self ms':>10}  module")
+    for name, row in sorted(rows.items(), key=lambda item: -item[1]["cumulative_ms"])[:args.top]:
+        print(f"{row['cumulative_ms']:>14.1f}{row['self_ms']:>10.1f}  {'  ' * row['depth']}{name}")
+
+    print(f"\n{'self ms':>14}{'share':>10}  package")
+    for package, own in sorted(packages.items(), key=lambda item: -item[1])[:args.top]:
+        print(f"{own:>14.1f}{own / total:>10.1%}  {package}")
+
+    if args.json:
+        with open(args.json, "w") as file:
+            json.dump({"module": args.module, "total_ms": total, "modules": rows, "packages": packages}, file, indent=2)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--module", default="main")
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--top", type=int, default=25)
+    parser.add_argument("--json", metavar="PATH", help="Сохранить полный профиль")
+    main(parser.parse_args())
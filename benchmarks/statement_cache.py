@@ -0,0 +1,152 @@
+"""Стоимость построения запросов: обычный select() против lambda_stmt.
+
+Запуск (нужна БД из APP_CONFIG__DATABASE__URL, схема создаётся при отсутствии):
+
+    python -m benchmarks.statement_cache --iterations 5000
+
+Каждый запрос горячего пути выполняется ``iterations`` раз подряд в одной
+сессии в двух вариантах: построенный заново на каждый вызов, как было
+раньше, и из app.services.statements. CPU процесса (process_time) на один
+вызов — то, что экономится на каждом HTTP-запросе; время по часам
+включает ещё и сам поход в БД. Прогоны повторяются с prepared statements
+psycopg и без них.
+"""
+import argparse
+import asyncio
+import time
+from uuid import UUID
+
+from sqlalchemy import func, or_, select
+from sqlalchemy.orm import selectinload
+from sqlmodel import SQLModel
+
+from app.config import settings
+from app.database import DatabaseHelper
+from app.models import Answer, Question, Role, Test, Token, User
+from app.schemas import AnswerNestedCreate, QuestionNestedCreate, TestCreateFull
+from app.services import statements
+from app.services.auth import create_token_for_user
+from app.services.tests import create_test_full
+
+
+# Запросы в том виде, в каком обработчики строили их до app.services.statements
+def inline_token_user(token_id: str):
+    return (
+        select(User, Token.expires_at)
+        .join(Token, Token.user_id == User.id)
+        .where(Token.id == token_id)
+        .where(or_(Token.expires_at.is_(None), Token.expires_at > func.now()))
+    )
+
+
+def inline_full_test(test_id: UUID):
+    return select(Test).options(
+        selectinload(Test.questions).selectinload(Question.answers)
+    ).where(Test.id == test_id)
+
+
+def inline_student_snapshot(test_id: UUID):
+    return (
+        select(Test.title, Question.id, Question.text, Answer.id, Answer.text)
+        .select_from(Test)
+        .outerjoin(Question, Question.test_id == Test.id)
+        .outerjoin(Answer, Answer.question_id == Question.id)
+        .where(Test.id == test_id)
+        .order_by(Question.id, Answer.id)
+    )
+
+
+def inline_answer_key(test_id: UUID):
+    return (
+        select(Test.id, Question.id, Answer.id, Answer.is_correct)
+        .select_from(Test)
+        .outerjoin(Question, Question.test_id == Test.id)
+        .outerjoin(Answer, Answer.question_id == Question.id)
+        .where(Test.id == test_id)
+        .order_by(Question.id, Answer.id)
+    )
+
+
+def make_helper(prepare_threshold: int | None) -> DatabaseHelper:
+    return DatabaseHelper(url=str(settings.database.url), pool_size=1, max_overflow=0, prepare_threshold=prepare_threshold)
+
+
+async def seed(db: DatabaseHelper, questions: int) -> tuple[str, UUID]:
+    async with db.engine.begin() as conn:
+        await conn.run_sync(SQLModel.metadata.create_all)
+
+    async with db.session_factory() as session:
+        suffix = str(time.time_ns())
+        teacher = User(
+            email=f"bench-stmt-{suffix}@example.com",
+            username=f"bench_stmt_{suffix}",
+            first_name="Bench",
+            last_name="Statements",
+            password_hash="-",
+            role=Role.teacher,
+        )
+        session.add(teacher)
+        await session.commit()
+
+        test_data = TestCreateFull(
+            title="Benchmark",
+            questions=[
+                QuestionNestedCreate(
+                    text=f"Вопрос {i}",
+                    answers=[AnswerNestedCreate(text="Да", is_correct=True), AnswerNestedCreate(text="Нет")],
+                )
+                for i in range(questions)
+            ],
+        )
+        test_id = await create_test_full(session, test_data, teacher.id)
+        await session.commit()
+        token = await create_token_for_user(session, teacher)
+    return token.id, test_id
+
+
+async def measure(db: DatabaseHelper, build, arg, iterations: int, orm: bool) -> tuple[float, float]:
+    async with db.session_factory() as session:
+        # Прогрев: кэш компиляции SQLAlchemy и порог prepared statements
+        for _ in range(10):
+            await session.execute(build(arg))
+        cpu, wall = time.process_time(), time.perf_counter()
+        for _ in range(iterations):
+            result = await session.execute(build(arg))
+            result.scalars().all() if orm else result.all()
+            if orm:
+                session.expunge_all()
+        cpu, wall = time.process_time() - cpu, time.perf_counter() - wall
+    return cpu / iterations * 1e6, wall / iterations * 1e6
+
+
+async def main(args: argparse.Namespace) -> None:
+    seeder = make_helper(None)
+    token_id, test_id = await seed(seeder, args.questions)
+    await seeder.dispose()
+
+    cases = [
+        ("token -> user", inline_token_user, statements.token_user_query, token_id, False),
+        ("full test", inline_full_test, statements.full_test_query, test_id, True),
+        ("student snapshot", inline_student_snapshot, statements.student_snapshot_query, test_id, False),
+        ("answer key", inline_answer_key, statements.answer_key_query, test_id, False),
+    ]
+
+    print(f"{'query':<18}{'prepared':>10}{'inline cpu':>12}{'lambda cpu':>12}{'saved':>9}{'inline wall':>13}{'lambda wall':>13}")
+    for prepare_threshold in (None, settings.database.prepare_threshold):
+        db = make_helper(prepare_threshold)
+        for name, inline, prebuilt, arg, orm in cases:
+            inline_cpu, inline_wall = await measure(db, inline, arg, args.iterations, orm)
+            lambda_cpu, lambda_wall = await measure(db, prebuilt, arg, args.iterations, orm)
+            print(
+                f"{name:<18}{'yes' if prepare_threshold is not None else 'no':>10}"
+                f"{inline_cpu:>10.1f}us{lambda_cpu:>10.1f}us{inline_cpu - lambda_cpu:>7.1f}us"
+                f"{inline_wall:>11.1f}us{lambda_wall:>11.1f}us"
+            )
+        await db.dispose()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--iterations", type=int, default=5000)
+    parser.add_argument("--questions", type=int, default=20)
+    asyncio.run(main(parser.parse_args()))
@@ -0,0 +1,112 @@
+"""Пропускная способность POST /tests/{id}/submit: прямая запись против пакетной.
+
+Запуск (нужна БД из APP_CONFIG__DATABASE__URL, схема создаётся при отсутствии):
+
+    python -m benchmarks.submit_throughput --requests 2000 --concurrency 200
+
+Запросы идут в приложение напрямую через ASGI, без сети, так что
+цифры отражают обработчик и БД.
+"""
+import argparse
+import asyncio
+import time
+
+from httpx import ASGITransport, AsyncClient
+from sqlmodel import SQLModel
+
+from app.database import db_helper
+from app.models import Role, User
+from app.schemas import AnswerNestedCreate, QuestionNestedCreate, TestCreateFull
+from app.services.auth import create_token_for_user
+from app.services.grading import get_answer_key
+from app.services.result_batcher import result_batcher
+from app.services.tests import create_test_full
+from main import app
+
+
+async def seed(questions: int) -> tuple[str, str, dict]:
+    async with db_helper.engine.begin() as conn:
+        await conn.run_sync(SQLModel.metadata.create_all)
+
+    async with db_helper.session_factory() as session:
+        suffix = str(time.time_ns())
+        teacher = User(
+            email=f"bench-teacher-{suffix}@example.com",
+            username=f"bench_teacher_{suffix}",
+            first_name="Bench",
+            last_name="Teacher",
+            password_hash="-",
+            role=Role.teacher,
+        )
+        student = User(
+            email=f"bench-student-{suffix}@example.com",
+            username=f"bench_student_{suffix}",
+            first_name="Bench",
+            last_name="Student",
+            password_hash="-",
+            role=Role.student,
+        )
+        session.add_all([teacher, student])
+        await session.commit()
+
+        test_data = TestCreateFull(
+            title="Benchmark",
+            questions=[
+                QuestionNestedCreate(
+                    text=f"Вопрос {i}",
+                    answers=[AnswerNestedCreate(text="Да", is_correct=True), AnswerNestedCreate(text="Нет")],
+                )
+                for i in range(questions)
+            ],
+        )
+        test_id = await create_test_full(session, test_data, teacher.id)
+        await session.commit()
+
+        token = await create_token_for_user(session, student)
+        key = await get_answer_key(session, test_id)
+        assert key is not None
+
+    submission = {
+        "answers": [
+            {"question_id": str(question_id), "answer_id": str(answers[0])}
+            for question_id, answers in zip(key.questions, key.answers)
+        ]
+    }
+    return str(test_id), token.id, submission
+
+
+async def drive(test_id: str, token: str, submission: dict, requests: int, concurrency: int) -> float:
+    headers = {"Authorization": f"Bearer {token}"}
+    semaphore = asyncio.Semaphore(concurrency)
+    async with AsyncClient(transport=ASGITransport(app=app), base_url="http://bench") as client:
+
+        async def one() -> None:
+            async with semaphore:
+                response = await client.post(f"/tests/tests/{test_id}/submit", json=submission, headers=headers)
+                response.raise_for_status()
+
+        started_at = time.perf_counter()
+        await asyncio.gather(*(one() for _ in range(requests)))
+        return time.perf_counter() - started_at
+
+
+async def main(args: argparse.Namespace) -> None:
+    test_id, token, submission = await seed(args.questions)
+
+    print(f"{'mode':<10}{'requests':>10}{'seconds':>10}{'subs/sec':>12}")
+    for mode in ("direct", "batched"):
+        result_batcher.enabled = mode == "batched"
+        elapsed = await drive(test_id, token, submission, args.requests, args.concurrency)
+        print(f"{mode:<10}{args.requests:>10}{elapsed:>10.2f}{args.requests / elapsed:>12.1f}")
+
+    await result_batcher.stop()
+    print(result_batcher.stats())
+    await db_helper.dispose()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--requests", type=int, default=2000)
+    parser.add_argument("--concurrency", type=int, default=200)
+    parser.add_argument("--questions", type=int, default=20)
+    asyncio.run(main(parser.parse_args()))
@@ -0,0 +1,14 @@
+// Списки на бэкенде постраничные: следующая страница запрашивается
+// по заголовку X-Next-Cursor, пока он есть
+export async function fetchAllPages(client, url, cursorParam, params = {}) {
+  const items = []
+  let cursor = null
+  do {
+    const response = await client.get(url, {
+      params: cursor ? { ...params, [cursorParam]: cursor } : params,
+    })
+    items.push(...response.data)
+    cursor = response.headers['x-next-cursor']
+  } while (cursor)
+  return items
+}
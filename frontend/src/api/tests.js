@@ -1,4 +1,5 @@
 import axios from 'axios'
+import { fetchAllPages } from './pagination'
 
 const api = axios.create({
   baseURL: 'http://localhost:8000/tests/tests', // твой backend URL
@@ -6,8 +7,7 @@ const api = axios.create({
 })
 
 export async function fetchTests() {
-  const response = await api.get('/')
-  return response.data
+  return fetchAllPages(api, '/', 'after', { limit: 200 })
 }
 
 export async function fetchTestById(testId) {
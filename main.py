@@ -1,53 +1,89 @@
 from __future__ import annotations as _annotations
 
-import uvicorn
 import logging
 
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
 from contextlib import asynccontextmanager
 from typing import AsyncGenerator
-from sqlalchemy import text
 
 from app.database import db_helper
 from app.config import settings
+from app.services.db_metrics import QueryDebugMiddleware, QueryStatsMiddleware
+from app.services.attempts import autosave_buffer
+from app.services.events import event_broker
+from app.services.lifecycle import InFlightMiddleware, lifecycle
+from app.services.passwords import password_hasher
+from app.services.result_batcher import result_batcher
 from app.routers.auth import router as auth_router
 from app.routers.tests import router as tests_router
 from app.routers.result import router as result_router
+from app.routers.attempts import router as attempts_router
+from app.routers.health import router as health_router
+from app.routers.metrics import router as metrics_router
 
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
 @asynccontextmanager
 async def lifespan(app: FastAPI) -> AsyncGenerator[None, None]:
-    # startup
-    async for session in db_helper.session_getter():
-        result = await session.execute(text("SELECT 1"))
-        print(result.scalar())
+    # startup: выполняется в каждом воркере, движок создаётся уже здесь, после fork
+    lifecycle.watch_signals()
+    if settings.run.warm_up:
+        try:
+            opened = await db_helper.warm_up()
+            logger.info("Пул соединений прогрет: %d", opened)
+        except Exception as exc:
+            # Воркер всё равно стартует, а /health/ready покажет, что БД недоступна
+            logger.warning("Не удалось прогреть пул соединений: %r", exc)
+    lifecycle.started = True
 
     yield
-    # shutdown
+    # shutdown: дожидаемся начатых запросов, дописываем буферы, закрываем пулы
+    lifecycle.begin_drain()
+    if not await lifecycle.wait_idle(settings.run.graceful_timeout.total_seconds()):
+        logger.warning("Остановка без ожидания %d запросов", lifecycle.in_flight)
+    await event_broker.stop()
+    await autosave_buffer.stop()
+    await result_batcher.stop()
+    password_hasher.shutdown()
     await db_helper.dispose()
 
 
-app = FastAPI(lifespan=lifespan, debug=True)
+lifecycle.on_drain(event_broker.close_streams)
+
+app = FastAPI(lifespan=lifespan, debug=settings.run.debug)
 app.include_router(auth_router, prefix="/auth")
 app.include_router(tests_router, prefix="/tests")
 app.include_router(result_router, prefix="/results")
+app.include_router(attempts_router, prefix="/attempts")
+app.include_router(metrics_router, prefix="/metrics")
+app.include_router(health_router, prefix="/health")
 
+if settings.query_debug.enabled:
+    app.add_middleware(QueryDebugMiddleware, threshold=settings.query_debug.n_plus_one_threshold)
+app.add_middleware(QueryStatsMiddleware)
 app.add_middleware(
     CORSMiddleware,
     allow_origins=["*"],  # твой фронтенд
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["X-Next-Cursor", "X-DB-Queries", "X-DB-Time-Ms", "X-DB-N-Plus-One"],
 )
+app.add_middleware(InFlightMiddleware)
 
 
 if __name__ == "__main__":
+    import uvicorn
+
+    # Воркеры — отдельные процессы: каждый импортирует приложение и открывает свой пул.
+    # При остановке сервер перестаёт принимать соединения и ждёт начатые запросы
     uvicorn.run(
         "main:app",
         host=settings.run.host,
         port=settings.run.port,
-        reload=True,
+        workers=settings.run.workers,
+        reload=settings.run.reload,
+        timeout_graceful_shutdown=int(settings.run.graceful_timeout.total_seconds()),
     )
@@ -0,0 +1,171 @@
+"""Общие фикстуры: приложение на временной SQLite и пользователи с токенами.
+
+Настройкам нужен URL PostgreSQL даже тогда, когда тесты идут на SQLite,
+поэтому без APP_CONFIG__DATABASE__URL подставляется заглушка. Тесты,
+которым нужна настоящая PostgreSQL (планы запросов), без URL пропускаются.
+"""
+import os
+from dataclasses import dataclass
+from datetime import datetime, timedelta, timezone
+from typing import AsyncIterator, Awaitable, Callable, Optional
+from uuid import UUID, uuid4
+
+import pytest
+
+POSTGRES_URL = os.environ.get("APP_CONFIG__DATABASE__URL")
+os.environ.setdefault("APP_CONFIG__DATABASE__URL", "postgresql+psycopg://unused@localhost/unused")
+
+from httpx import ASGITransport, AsyncClient
+from sqlalchemy import event
+from sqlmodel import SQLModel
+
+from app.database import DatabaseHelper, db_helper
+from app.models import Role, Token, User
+from app.services.token_cache import token_cache
+
+
+@dataclass
+class Principal:
+    id: UUID
+    headers: dict[str, str]
+
+
+class MemoryBackend:
+    """SnapshotBackend в памяти: общее хранилище для нескольких кэшей, как у воркеров с Redis"""
+
+    def __init__(self) -> None:
+        self.data: dict[str, bytes] = {}
+
+    async def get(self, key: str) -> Optional[bytes]:
+        return self.data.get(key)
+
+    async def set(self, key: str, value: bytes, ttl: float) -> None:
+        self.data[key] = value
+
+    async def delete(self, *keys: str) -> None:
+        for key in keys:
+            self.data.pop(key, None)
+
+    async def incr(self, key: str) -> int:
+        value = int(self.data.get(key, b"0")) + 1
+        self.data[key] = str(value).encode()
+        return value
+
+
+@pytest.fixture(scope="session")
+def anyio_backend() -> str:
+    return "asyncio"
+
+
+@pytest.fixture(scope="session")
+def postgres_url() -> str:
+    if not POSTGRES_URL:
+        pytest.skip("Нужна PostgreSQL: задайте APP_CONFIG__DATABASE__URL")
+    return POSTGRES_URL
+
+
+@pytest.fixture
+def snapshot_backend() -> MemoryBackend:
+    return MemoryBackend()
+
+
+@pytest.fixture
+async def database(tmp_path) -> AsyncIterator[DatabaseHelper]:
+    """Подменяет движок приложения на SQLite-файл со свежей схемой"""
+    helper = DatabaseHelper(url=f"sqlite+aiosqlite:///{tmp_path / 'test.db'}", pool_size=5, max_overflow=10)
+
+    @event.listens_for(helper.engine.sync_engine, "connect")
+    def enable_foreign_keys(dbapi_connection, _) -> None:
+        # SQLite проверяет внешние ключи и каскады, только если включить их на каждом соединении
+        cursor = dbapi_connection.cursor()
+        cursor.execute("PRAGMA foreign_keys=ON")
+        cursor.close()
+
+    async with helper.engine.begin() as conn:
+        await conn.run_sync(SQLModel.metadata.create_all)
+
+    saved = db_helper.engine, db_helper.session_factory, db_helper.pool_metrics
+    db_helper.engine = helper.engine
+    db_helper.session_factory = helper.session_factory
+    db_helper.pool_metrics = helper.pool_metrics
+    try:
+        yield helper
+    finally:
+        db_helper.engine, db_helper.session_factory, db_helper.pool_metrics = saved
+        token_cache.clear()
+        await helper.dispose()
+
+
+@pytest.fixture
+async def client(database) -> AsyncIterator[AsyncClient]:
+    # Приложение выполняется в задаче теста: так до него доходят счётчики запросов
+    from main import app
+
+    async with AsyncClient(transport=ASGITransport(app), base_url="http://test") as client:
+        yield client
+
+
+@pytest.fixture
+def make_user(database) -> Callable[[Role], Awaitable[Principal]]:
+    """Создаёт пользователя с действующим токеном, минуя bcrypt и /auth/login"""
+
+    async def make_user(role: Role) -> Principal:
+        user_id = uuid4()
+        token_id = uuid4().hex
+        async with database.session_factory() as session:
+            session.add(User(
+                id=user_id,
+                email=f"{role.value}-{user_id.hex[:8]}@example.com",
+                username=f"{role.value}_{user_id.hex[:8]}",
+                first_name="Test",
+                last_name=role.value.title(),
+                password_hash="-",
+                role=role,
+            ))
+            await session.flush()
+            session.add(Token(
+                id=token_id,
+                user_id=user_id,
+                expires_at=datetime.now(timezone.utc) + timedelta(hours=1),
+            ))
+            await session.commit()
+        return Principal(id=user_id, headers={"Authorization": f"Bearer {token_id}"})
+
+    return make_user
+
+
+@pytest.fixture
+async def teacher(make_user) -> Principal:
+    return await make_user(Role.teacher)
+
+
+@pytest.fixture
+async def student(make_user) -> Principal:
+    return await make_user(Role.student)
+
+
+def exam_payload(questions: int = 3, answers: int = 3, **fields) -> dict:
+    """Тело POST /tests/tests/: в каждом вопросе верен первый ответ"""
+    return {
+        "title": "Тест",
+        **fields,
+        "questions": [
+            {
+                "text": f"Вопрос {i}",
+                "answers": [{"text": f"Ответ {j}", "is_correct": j == 0} for j in range(answers)],
+            }
+            for i in range(questions)
+        ],
+    }
+
+
+@pytest.fixture
+def create_test(client, teacher) -> Callable[..., Awaitable[dict]]:
+    """Создаёт тест от имени преподавателя, возвращает TestReadFull"""
+
+    async def create_test(owner: Optional[Principal] = None, **kwargs) -> dict:
+        response = await client.post("/tests/tests/", json=exam_payload(**kwargs), headers=(owner or teacher).headers)
+        assert response.status_code == 200, response.text
+        return response.json()
+
+    return create_test
@@ -0,0 +1,117 @@
+from datetime import datetime, timedelta, timezone
+from uuid import UUID
+
+import pytest
+from sqlalchemy import select
+
+from app.models import Attempt, AttemptAnswer, AttemptStatus
+from app.services import attempts
+from app.services.attempts import attempt_cache, autosave_buffer
+from app.services.events import event_broker
+
+pytestmark = pytest.mark.anyio
+
+
+def correct_answers(test: dict) -> list[dict]:
+    return [
+        {"question_id": question["id"], "answer_id": next(a["id"] for a in question["answers"] if a["is_correct"])}
+        for question in test["questions"]
+    ]
+
+
+async def test_timed_test_requires_attempt(client, student, create_test):
+    test = await create_test(questions=2, time_limit_minutes=30)
+    url = f"/tests/tests/{test['id']}/submit"
+
+    response = await client.post(url, json={"answers": correct_answers(test)}, headers=student.headers)
+    assert response.status_code == 409
+    assert "/attempts" in response.json()["detail"]
+
+
+async def test_timed_submit_finalizes_attempt(client, student, create_test):
+    test = await create_test(questions=2, time_limit_minutes=30)
+    url = f"/tests/tests/{test['id']}/submit"
+    first, second = correct_answers(test)
+
+    response = await client.post("/attempts/", json={"test_id": test["id"]}, headers=student.headers)
+    assert response.status_code == 200
+    attempt_id = response.json()["id"]
+    response = await client.put(f"/attempts/{attempt_id}/answers", json={"answers": [first]}, headers=student.headers)
+    assert response.status_code == 202
+
+    # Сохранённый ответ и присланный при сдаче засчитываются вместе
+    response = await client.post(url, json={"answers": [second]}, headers=student.headers)
+    assert response.status_code == 200
+    assert response.json()["score"] == 2
+
+    attempt = (await client.get(f"/attempts/{attempt_id}", headers=student.headers)).json()
+    assert attempt["status"] == "submitted"
+
+    # Повторная сдача без новой попытки не даёт второго результата
+    response = await client.post(url, json={"answers": [first, second]}, headers=student.headers)
+    assert response.status_code == 409
+
+
+@pytest.fixture
+def write_through(monkeypatch):
+    # Режим нескольких воркеров: ответы пишутся в БД сразу
+    monkeypatch.setattr(autosave_buffer, "buffered", False)
+    return autosave_buffer
+
+
+async def test_write_through_autosave_rejects_attempt_finished_elsewhere(
+    client, database, student, create_test, write_through
+):
+    test = await create_test(questions=2)
+    first, second = correct_answers(test)
+    attempt_id = (await client.post("/attempts/", json={"test_id": test["id"]}, headers=student.headers)).json()["id"]
+    url = f"/attempts/{attempt_id}/answers"
+
+    response = await client.put(url, json={"answers": [first]}, headers=student.headers)
+    assert response.status_code == 202
+    assert write_through.peek(UUID(attempt_id)) == {}
+    async with database.session_factory() as session:
+        rows = (await session.execute(select(AttemptAnswer.question_id))).scalars().all()
+        assert [str(question_id) for question_id in rows] == [first["question_id"]]
+
+        # Попытку завершил другой воркер: кэш этого процесса ещё считает её открытой
+        attempt = await session.get(Attempt, UUID(attempt_id))
+        attempt.status = AttemptStatus.submitted
+        await session.commit()
+
+    response = await client.put(url, json={"answers": [second]}, headers=student.headers)
+    assert response.status_code == 409
+    assert attempt_cache.get(UUID(attempt_id)).status == AttemptStatus.submitted
+
+
+async def test_late_timed_submit_expires_attempt(client, database, student, create_test):
+    test = await create_test(questions=2, time_limit_minutes=30)
+    attempt_id = (await client.post("/attempts/", json={"test_id": test["id"]}, headers=student.headers)).json()["id"]
+    async with database.session_factory() as session:
+        attempt = await session.get(Attempt, UUID(attempt_id))
+        attempt.deadline = datetime.now(timezone.utc) - timedelta(hours=1)
+        await session.commit()
+
+    response = await client.post(
+        f"/tests/tests/{test['id']}/submit", json={"answers": correct_answers(test)}, headers=student.headers
+    )
+    assert response.status_code == 200
+    attempt = (await client.get(f"/attempts/{attempt_id}", headers=student.headers)).json()
+    assert attempt["status"] == "expired"
+    assert attempt["result_id"] == response.json()["id"]
+
+
+async def test_start_race_with_finished_attempt(client, database, student, create_test, monkeypatch):
+    test = await create_test(questions=2)
+    await client.post("/attempts/", json={"test_id": test["id"]}, headers=student.headers)
+
+    # Проигравший запрос двойного клика: своей вставки не сделал, а чужую попытку уже не видит
+    async def no_active_attempt(*args):
+        return None
+
+    monkeypatch.setattr(attempts, "active_attempt", no_active_attempt)
+    published = event_broker.published
+
+    response = await client.post("/attempts/", json={"test_id": test["id"]}, headers=student.headers)
+    assert response.status_code == 409
+    assert event_broker.published == published
@@ -0,0 +1,33 @@
+from uuid import uuid4
+
+import pytest
+
+from app.services.events import EventBackend, EventBroker, LocalBackend, Subscription
+
+pytestmark = pytest.mark.anyio
+
+
+def test_backend_requires_publish():
+    with pytest.raises(TypeError):
+        EventBackend()
+
+
+async def test_close_ends_stream_with_full_queue():
+    # Отставший клиент при остановке воркера: маркер конца в очередь не влезает
+    broker = EventBroker(LocalBackend(), queue_size=2)
+    test_id = uuid4()
+    async with broker.subscribe(test_id) as subscription:
+        broker.publish(test_id, "result_submitted", {"n": 1})
+        broker.publish(test_id, "result_submitted", {"n": 2})
+        assert subscription.queue.full()
+
+        broker.close_streams()
+
+        assert subscription.closed
+        assert broker.stats()["subscribers"] == 0
+
+
+def test_close_wakes_idle_reader():
+    subscription = Subscription(uuid4(), queue_size=2)
+    subscription.close()
+    assert subscription.queue.get_nowait() is None
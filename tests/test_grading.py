@@ -0,0 +1,128 @@
+from uuid import uuid4
+
+import pytest
+
+from app.schemas import AnswerSubmission
+from app.services.grading import AnswerKey, AnswerKeyCache, GradingError
+from app.services import test_cache as snapshots
+from app.services.test_cache import test_cache
+
+
+def make_key(questions: int = 3, answers: int = 3, draw_count=None) -> AnswerKey:
+    """Ключ, где в каждом вопросе верен первый ответ; строки отсортированы, как в answer_key_query"""
+    rows = []
+    for question_id in sorted(uuid4() for _ in range(questions)):
+        answer_ids = sorted(uuid4() for _ in range(answers))
+        correct = answer_ids[0]
+        rows.extend((question_id, answer_id, answer_id == correct) for answer_id in answer_ids)
+    return AnswerKey.from_rows(rows, draw_count=draw_count)
+
+
+def submit(key: AnswerKey, picks: dict[int, int]) -> list[AnswerSubmission]:
+    """Ответы по позициям: {позиция вопроса: номер ответа}"""
+    return [
+        AnswerSubmission(question_id=key.questions[ordinal], answer_id=key.answers[ordinal][position])
+        for ordinal, position in picks.items()
+    ]
+
+
+def test_grade_scores_and_packs_choices():
+    key = make_key()
+    graded = key.grade(submit(key, {0: 0, 1: 2}))
+
+    assert graded.score == 1
+    assert list(graded.choices) == [1, 3, 0]
+    assert graded.correct == bytearray([0b001])
+
+
+def test_grade_rejects_repeated_answer():
+    key = make_key()
+    with pytest.raises(GradingError, match="Повторный ответ"):
+        key.grade(submit(key, {0: 0}) + submit(key, {0: 1}))
+
+
+@pytest.mark.parametrize(
+    "case, message",
+    [
+        ("foreign_question", "Вопрос не относится к тесту"),
+        ("unknown_answer", "Ответ не найден"),
+        ("answer_of_other_question", "Ответ не соответствует вопросу"),
+        ("not_drawn", "Вопрос не входит в ваш вариант"),
+    ],
+)
+def test_locate_errors(case, message):
+    key = make_key()
+    question_id, answer_id, drawn = key.questions[0], key.answers[0][0], None
+    if case == "foreign_question":
+        question_id = uuid4()
+    elif case == "unknown_answer":
+        answer_id = uuid4()
+    elif case == "answer_of_other_question":
+        answer_id = key.answers[1][0]
+    else:
+        drawn = frozenset({1, 2})
+
+    with pytest.raises(GradingError, match=message):
+        key.locate(question_id, answer_id, drawn)
+
+
+def test_locate_returns_positions():
+    key = make_key()
+    assert key.locate(key.questions[2], key.answers[2][1]) == (2, 1)
+    assert key.locate(key.questions[2], key.answers[2][1], frozenset({2})) == (2, 1)
+
+
+def test_layout_changes_with_answers():
+    # Сохранённые номера ответов сверяются по layout: лишний ответ меняет позиции
+    key = make_key()
+    rows = [
+        (question_id, answer_id, answer_id in key.correct[ordinal])
+        for ordinal, question_id in enumerate(key.questions)
+        for answer_id in key.answers[ordinal]
+    ]
+    assert AnswerKey.from_rows(rows).layout == key.layout
+
+    extra = sorted(rows + [(key.questions[0], uuid4(), False)], key=lambda row: (row[0], row[1]))
+    assert AnswerKey.from_rows(extra).layout != key.layout
+    assert AnswerKey.from_rows(rows[1:]).layout != key.layout
+
+
+@pytest.mark.anyio
+async def test_answer_key_cache_follows_test_version():
+    cache = AnswerKeyCache()
+    test_id, key = uuid4(), make_key()
+
+    await cache.set(test_id, key, test_cache.version(test_id))
+    assert await cache.get(test_id) is key
+
+    await test_cache.invalidate(test_id)
+    assert await cache.get(test_id) is None
+
+    # Ключ, собранный до изменения теста, в кэш не попадает
+    stale_version = test_cache.version(test_id) - 1
+    await cache.set(test_id, key, stale_version)
+    assert await cache.get(test_id) is None
+
+
+@pytest.mark.anyio
+async def test_answer_key_cache_sees_change_on_other_worker(snapshot_backend):
+    first, second = snapshots.TestSnapshotCache(workers=2), snapshots.TestSnapshotCache(workers=2)
+    first.backend = second.backend = snapshot_backend
+    cache = AnswerKeyCache(snapshots=first)
+    test_id, key = uuid4(), make_key()
+
+    await cache.set(test_id, key, await first.refresh_version(test_id))
+    assert await cache.get(test_id) is key
+
+    # Преподаватель исправил верный ответ, запрос пришёл на другой воркер
+    await second.invalidate(test_id)
+    assert await cache.get(test_id) is None
+
+
+@pytest.mark.anyio
+async def test_answer_key_cache_off_without_shared_version():
+    cache = AnswerKeyCache(snapshots=snapshots.TestSnapshotCache(workers=2))
+    test_id = uuid4()
+    await cache.set(test_id, make_key(), 0)
+    assert not cache.active
+    assert await cache.get(test_id) is None
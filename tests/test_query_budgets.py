@@ -0,0 +1,79 @@
+"""Бюджеты запросов для обработчиков, склонных к N+1.
+
+Число запросов не должно расти с числом вопросов и ответов теста:
+бюджет проверяется на тесте побольше, а порог N+1 ловит повторяющиеся
+запросы одной формы.
+"""
+import pytest
+from sqlalchemy import func, select
+
+from conftest import exam_payload
+
+from app.models import Answer, Question
+
+from app.services.token_cache import token_cache
+
+pytestmark = pytest.mark.anyio
+
+
+async def test_get_current_user_resolves_token_once(client, teacher, query_budget):
+    token_cache.clear()
+    # Владелец токена и срок действия — одним запросом
+    with query_budget(max_queries=1):
+        response = await client.get("/auth/me", headers=teacher.headers)
+    assert response.status_code == 200
+
+    # Дальше пользователь берётся из кэша токенов
+    with query_budget(max_queries=0):
+        response = await client.get("/auth/me", headers=teacher.headers)
+    assert response.status_code == 200
+
+
+async def test_create_test(client, teacher, query_budget):
+    # Токен уже в кэше: считаются только запросы обработчика
+    await client.get("/auth/me", headers=teacher.headers)
+    # По INSERT на таблицу и перечитывание теста с вопросами и ответами
+    with query_budget(max_queries=6):
+        response = await client.post("/tests/tests/", json=exam_payload(questions=20, answers=4), headers=teacher.headers)
+    assert response.status_code == 200
+    assert len(response.json()["questions"]) == 20
+
+
+async def test_delete_test(client, database, teacher, create_test, query_budget):
+    test = await create_test(questions=20)
+    # Права проверяются в самом DELETE, вопросы и ответы удаляет каскад
+    with query_budget(max_queries=1):
+        response = await client.delete(f"/tests/tests/{test['id']}", headers=teacher.headers)
+    assert response.status_code == 200
+
+    async with database.session_factory() as session:
+        assert await session.scalar(select(func.count()).select_from(Question)) == 0
+        assert await session.scalar(select(func.count()).select_from(Answer)) == 0
+
+
+async def test_delete_test_with_results(client, database, teacher, student, create_test, query_budget):
+    test = await create_test(questions=3)
+    url = f"/tests/tests/{test['id']}"
+    response = await client.post(f"{url}/submit", json={"answers": []}, headers=student.headers)
+    assert response.status_code == 200
+
+    # Результаты не удаляются каскадом: DELETE падает на внешнем ключе
+    with query_budget(max_queries=1):
+        response = await client.delete(url, headers=teacher.headers)
+    assert response.status_code == 409
+
+    async with database.session_factory() as session:
+        assert await session.scalar(select(func.count()).select_from(Question)) == 3
+
+
+async def test_update_question(client, teacher, create_test, query_budget):
+    test = await create_test(questions=20)
+    question_id = test["questions"][0]["id"]
+    with query_budget(max_queries=4):
+        response = await client.put(
+            f"/tests/tests/questions/{question_id}",
+            json={"text": "Новый текст"},
+            headers=teacher.headers,
+        )
+    assert response.status_code == 200
+    assert response.json()["text"] == "Новый текст"
@@ -0,0 +1,175 @@
+"""Планы горячих запросов: ни один не должен читать растущую таблицу целиком.
+
+Нужна PostgreSQL из APP_CONFIG__DATABASE__URL со схемой после миграций,
+без неё тесты пропускаются. Набор данных засевается внутри транзакции,
+по нему собирается статистика (ANALYZE), после чего для каждого запроса
+снимается EXPLAIN. Транзакция откатывается, база остаётся нетронутой.
+Seq Scan по отслеживаемой таблице значит, что индекс пропал или не подходит.
+"""
+import random
+import secrets
+from datetime import datetime, timedelta, timezone
+from uuid import UUID, uuid4
+
+import pytest
+from sqlalchemy import Executable, insert, select, text
+from sqlalchemy.ext.asyncio import AsyncConnection, create_async_engine
+
+from app import models
+from app.services.results import ResultFilters, results_page_query
+from app.services.statements import answer_key_query, student_snapshot_query, token_user_query
+
+pytestmark = pytest.mark.anyio
+
+# Таблицы, которые в рабочей базе растут без ограничений
+WATCHED_TABLES = {"test", "question", "answer", "result", "result_detail", "token"}
+
+TESTS = 5_000
+QUESTIONS = 5
+ANSWERS = 4
+TEACHERS = 50
+STUDENTS = 2_000
+RESULTS = 20_000
+
+
+async def seed(conn: AsyncConnection, rng: random.Random) -> dict:
+    suffix = secrets.token_hex(4)
+
+    users = [
+        {
+            "id": uuid4(),
+            "email": f"explain-{suffix}-{i}@example.com",
+            "username": f"explain_{suffix}_{i}",
+            "first_name": "Explain",
+            "last_name": "Check",
+            "password_hash": "-",
+            "role": models.Role.teacher if i < TEACHERS else models.Role.student,
+        }
+        for i in range(TEACHERS + STUDENTS)
+    ]
+    teachers = [user["id"] for user in users[:TEACHERS]]
+    students = [user["id"] for user in users[TEACHERS:]]
+
+    tests, questions, answers = [], [], []
+    for i in range(TESTS):
+        test_id = uuid4()
+        tests.append({"id": test_id, "title": f"Тест {i}", "author_id": rng.choice(teachers)})
+        for j in range(QUESTIONS):
+            question_id = uuid4()
+            questions.append({"id": question_id, "test_id": test_id, "text": f"Вопрос {j}"})
+            correct = rng.randrange(ANSWERS)
+            for k in range(ANSWERS):
+                answers.append({"id": uuid4(), "question_id": question_id, "text": f"Ответ {k}", "is_correct": k == correct})
+
+    now = datetime.now(timezone.utc)
+    results, details = [], []
+    for _ in range(RESULTS):
+        result_id, test = uuid4(), rng.choice(tests)
+        results.append({
+            "id": result_id,
+            "student_id": rng.choice(students),
+            "test_id": test["id"],
+            "score": rng.randrange(QUESTIONS + 1),
+            "created_at": now - timedelta(seconds=rng.randrange(90 * 24 * 3600)),
+        })
+        details.append({
+            "result_id": result_id,
+            "test_id": test["id"],
+            "layout": 0,
+            "choices": bytes(2 * QUESTIONS),
+            "correct": bytes((QUESTIONS + 7) // 8),
+        })
+
+    tokens = [
+        {"id": secrets.token_urlsafe(32), "user_id": user["id"], "created_at": now, "expires_at": now + timedelta(days=1)}
+        for user in users
+    ]
+
+    for model, rows in (
+        (models.User, users), (models.Test, tests), (models.Question, questions), (models.Answer, answers),
+        (models.Result, results), (models.ResultDetail, details), (models.Token, tokens),
+    ):
+        await conn.execute(insert(model), rows)
+
+    # Без свежей статистики планировщик считает таблицы пустыми
+    for table in ("user", *sorted(WATCHED_TABLES)):
+        await conn.execute(text(f'ANALYZE "{table}"'))
+
+    sample = rng.choice(tests)
+    return {
+        "token_id": tokens[-1]["id"],
+        "user_id": students[-1],
+        "author_id": sample["author_id"],
+        "test_id": sample["id"],
+        "question_ids": [question["id"] for question in questions if question["test_id"] == sample["id"]],
+    }
+
+
+def hot_queries(ids: dict) -> dict[str, Executable]:
+    """Запросы в той форме, в какой их выполняют обработчики"""
+    test_id: UUID = ids["test_id"]
+    return {
+        "token -> user (get_current_user)": token_user_query(ids["token_id"]),
+        "tokens by user": select(models.Token.id).where(models.Token.user_id == ids["user_id"]),
+        "answer key (submit)": answer_key_query(test_id),
+        "student snapshot (get_test)": student_snapshot_query(test_id),
+        "questions of test (selectinload)": select(models.Question).where(models.Question.test_id.in_([test_id])),
+        "answers of questions (selectinload)": select(models.Answer).where(models.Answer.question_id.in_(ids["question_ids"])),
+        "tests by author (list_tests)": select(models.Test).where(models.Test.author_id == ids["author_id"]).order_by(models.Test.id).limit(51),
+        "results of student (list_results)": results_page_query(ResultFilters(student_id=ids["user_id"]), 50),
+        "results of test (list_results)": results_page_query(ResultFilters(test_id=test_id), 50),
+        "latest results (list_results)": results_page_query(ResultFilters(), 50),
+        "choice matrix (item stats)": (
+            select(models.ResultDetail.result_id, models.ResultDetail.choices, models.ResultDetail.correct)
+            .where(models.ResultDetail.test_id == test_id)
+        ),
+    }
+
+
+# Имена запросов для параметризации, значения здесь не важны
+QUERY_NAMES = tuple(hot_queries({
+    "token_id": "-",
+    "user_id": uuid4(),
+    "author_id": uuid4(),
+    "test_id": uuid4(),
+    "question_ids": [],
+}))
+
+
+def scans(plan: dict) -> list[tuple[str, str]]:
+    """Все узлы чтения таблиц в плане: (тип узла, таблица)"""
+    found = []
+    if "Relation Name" in plan:
+        found.append((plan["Node Type"], plan["Relation Name"]))
+    for child in plan.get("Plans", ()):
+        found.extend(scans(child))
+    return found
+
+
+async def explain(conn: AsyncConnection, stmt: Executable) -> dict:
+    compiled = stmt.compile(dialect=conn.dialect, compile_kwargs={"render_postcompile": True})
+    result = await conn.exec_driver_sql(f"EXPLAIN (FORMAT JSON) {compiled}", compiled.params)
+    return result.scalar_one()[0]["Plan"]
+
+
+@pytest.fixture(scope="module")
+async def plans(postgres_url) -> dict[str, list[tuple[str, str]]]:
+    """Узлы чтения таблиц для каждого горячего запроса на засеянной базе"""
+    engine = create_async_engine(postgres_url)
+    try:
+        async with engine.connect() as conn:
+            transaction = await conn.begin()
+            try:
+                ids = await seed(conn, random.Random(1))
+                return {name: scans(await explain(conn, stmt)) for name, stmt in hot_queries(ids).items()}
+            finally:
+                await transaction.rollback()
+    finally:
+        await engine.dispose()
+
+
+@pytest.mark.parametrize("name", QUERY_NAMES)
+async def test_no_seq_scan_on_growing_tables(plans, name):
+    nodes = plans[name]
+    seq = sorted({table for node, table in nodes if node == "Seq Scan" and table in WATCHED_TABLES})
+    assert not seq, f"{name}: " + ", ".join(f"{node} on {table}" for node, table in nodes)
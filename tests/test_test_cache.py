@@ -0,0 +1,94 @@
+"""Снимки теста и ключи ответов сбрасываются при любом изменении теста"""
+from uuid import uuid4
+
+import pytest
+
+from app.services import test_cache
+
+pytestmark = pytest.mark.anyio
+
+
+async def test_update_test_refreshes_snapshots(client, teacher, student, create_test):
+    test = await create_test()
+    url = f"/tests/tests/{test['id']}"
+    for principal in (teacher, student):
+        assert (await client.get(url, headers=principal.headers)).json()["title"] == "Тест"
+
+    response = await client.put(url, json={"title": "Новое название"}, headers=teacher.headers)
+    assert response.status_code == 200
+
+    for principal in (teacher, student):
+        assert (await client.get(url, headers=principal.headers)).json()["title"] == "Новое название"
+
+
+async def test_update_question_refreshes_student_snapshot(client, teacher, student, create_test):
+    test = await create_test()
+    url = f"/tests/tests/{test['id']}"
+    question_id = test["questions"][0]["id"]
+    await client.get(url, headers=student.headers)
+
+    await client.put(f"/tests/tests/questions/{question_id}", json={"text": "Новый текст"}, headers=teacher.headers)
+
+    questions = {question["id"]: question for question in (await client.get(url, headers=student.headers)).json()["questions"]}
+    assert questions[question_id]["text"] == "Новый текст"
+
+
+async def test_delete_question_refreshes_snapshot_and_answer_key(client, teacher, student, create_test):
+    test = await create_test(questions=3)
+    url = f"/tests/tests/{test['id']}"
+    removed, *kept = test["questions"]
+    # Первая сдача кладёт ключ ответов в кэш
+    response = await client.post(f"{url}/submit", json={"answers": []}, headers=student.headers)
+    assert response.status_code == 200
+    await client.get(url, headers=student.headers)
+
+    response = await client.delete(f"/tests/tests/questions/{removed['id']}", headers=teacher.headers)
+    assert response.status_code == 200
+
+    snapshot = (await client.get(url, headers=student.headers)).json()
+    assert {question["id"] for question in snapshot["questions"]} == {question["id"] for question in kept}
+
+    answer = {"question_id": removed["id"], "answer_id": removed["answers"][0]["id"]}
+    response = await client.post(f"{url}/submit", json={"answers": [answer]}, headers=student.headers)
+    assert response.status_code == 400
+
+    answers = [
+        {"question_id": question["id"], "answer_id": next(a["id"] for a in question["answers"] if a["is_correct"])}
+        for question in kept
+    ]
+    response = await client.post(f"{url}/submit", json={"answers": answers}, headers=student.headers)
+    assert response.status_code == 200
+    assert response.json()["score"] == len(kept)
+
+
+async def test_delete_test_drops_snapshot(client, teacher, student, create_test):
+    test = await create_test()
+    url = f"/tests/tests/{test['id']}"
+    await client.get(url, headers=student.headers)
+
+    assert (await client.delete(url, headers=teacher.headers)).status_code == 200
+    assert (await client.get(url, headers=student.headers)).status_code == 404
+
+
+async def test_invalidation_reaches_other_workers(snapshot_backend):
+    # Два процесса с общим хранилищем: тест изменили на втором
+    first, second = test_cache.TestSnapshotCache(workers=2), test_cache.TestSnapshotCache(workers=2)
+    first.backend = second.backend = snapshot_backend
+    test_id = uuid4()
+
+    await first.set(test_id, b"old", await first.refresh_version(test_id))
+    assert await first.get(test_id) == b"old"
+    assert await second.get(test_id) == b"old"
+
+    await second.invalidate(test_id)
+    assert await first.get(test_id) is None
+    assert first.version(test_id) == second.version(test_id) == 1
+
+
+async def test_unshared_cache_expires_quickly():
+    # Без общего хранилища другие воркеры об изменении не узнают: снимок живёт недолго
+    cache = test_cache.TestSnapshotCache(ttl=60.0, workers=2, unshared_ttl=0.0)
+    test_id = uuid4()
+    await cache.set(test_id, b"snapshot", cache.version(test_id))
+    assert not cache.shared
+    assert await cache.get(test_id) is None
@@ -0,0 +1,86 @@
+import json
+from uuid import UUID, uuid4
+
+from app.services.variants import StudentLayout, drawn_questions, personalize
+
+
+def snapshot(questions: int = 6, answers: int = 4, **flags) -> tuple[UUID, bytes]:
+    """Снимок теста для студента в форме build_student_snapshot"""
+    test_id = uuid4()
+    payload = {
+        "id": str(test_id),
+        "title": "Тест",
+        "shuffle_questions": False,
+        "shuffle_answers": False,
+        "draw_count": None,
+        **flags,
+        "questions": [
+            {
+                "id": str(question_id),
+                "text": f"Вопрос {i}",
+                "answers": [{"id": str(uuid4()), "text": f"Ответ {j}"} for j in range(answers)],
+            }
+            for i, question_id in enumerate(sorted(uuid4() for _ in range(questions)))
+        ],
+    }
+    return test_id, json.dumps(payload, ensure_ascii=False).encode()
+
+
+def test_drawn_questions_is_stable():
+    # Вариант выводится из id без состояния: любой воркер и любой перезапуск
+    # должны выдать студенту тот же набор, иначе он сменится посреди экзамена
+    assert drawn_questions(UUID(int=1), UUID(int=2), 10, 4) == frozenset({1, 2, 5, 6})
+
+
+def test_drawn_questions_is_deterministic_per_student():
+    test_id = uuid4()
+    students = [uuid4() for _ in range(20)]
+    first = [drawn_questions(student_id, test_id, 10, 3) for student_id in students]
+
+    assert first == [drawn_questions(student_id, test_id, 10, 3) for student_id in students]
+    assert all(len(drawn) == 3 and drawn <= set(range(10)) for drawn in first)
+    assert len(set(first)) > 1
+
+
+def test_drawn_questions_without_draw():
+    student_id, test_id = uuid4(), uuid4()
+    assert drawn_questions(student_id, test_id, 5, None) is None
+    assert drawn_questions(student_id, test_id, 5, 5) is None
+    assert drawn_questions(student_id, test_id, 5, 8) is None
+
+
+def test_render_matches_drawn_questions():
+    # Студент видит ровно те вопросы, ответы на которые примет проверка
+    test_id, data = snapshot(questions=8, draw_count=3, shuffle_questions=True, shuffle_answers=True)
+    layout = StudentLayout.from_snapshot(test_id, data)
+    original = json.loads(data)["questions"]
+
+    for student_id in (uuid4() for _ in range(10)):
+        rendered = json.loads(layout.render(student_id))
+        drawn = drawn_questions(student_id, test_id, len(original), 3)
+        assert {question["id"] for question in rendered["questions"]} == {original[i]["id"] for i in drawn}
+        for question in rendered["questions"]:
+            source = next(item for item in original if item["id"] == question["id"])
+            assert sorted(answer["id"] for answer in question["answers"]) == sorted(answer["id"] for answer in source["answers"])
+        assert layout.render(student_id) == layout.render(student_id)
+
+
+def test_render_keeps_order_without_shuffle():
+    test_id, data = snapshot(questions=8, draw_count=4)
+    layout = StudentLayout.from_snapshot(test_id, data)
+    ids = [question["id"] for question in json.loads(data)["questions"]]
+
+    rendered = [question["id"] for question in json.loads(layout.render(uuid4()))["questions"]]
+    assert rendered == sorted(rendered, key=ids.index)
+
+
+def test_shuffle_varies_between_students():
+    test_id, data = snapshot(questions=8, shuffle_questions=True)
+    layout = StudentLayout.from_snapshot(test_id, data)
+    orders = {layout.render(uuid4()) for _ in range(10)}
+    assert len(orders) > 1
+
+
+def test_personalize_returns_plain_snapshot_as_is():
+    test_id, data = snapshot()
+    assert personalize(test_id, data, 0, uuid4()) is data